@@ -0,0 +1,65 @@
+"""Memory held by the catalogue: bytes per podcast and per episode, with regular entities, compact entities and
+compact entities whose episode texts live in an EpisodeStore. Counts include the entities' strings and
+collections, measured with tracemalloc. The store's memory-mapped file is page cache, not heap, so it is not
+counted. The last lines report what the reader's InternTable saved by sharing repeated values. Scaled data repeats
+every value of the bundled data once per copy, so it overstates how often values repeat in a real catalogue.
+
+Run from the project directory:  python -m benchmarks.bench_catalogue_memory --scale 10
+"""
+import argparse
+import gc
+import tempfile
+import tracemalloc
+from pathlib import Path
+
+from benchmarks.datasets import DATA_PATH, write_scaled_dataset
+from podcast.adapters.datareader.csvdatareader import CSVDataReader
+from podcast.adapters.episode_store import EpisodeStore
+
+
+def traced_bytes() -> int:
+    gc.collect()
+    return tracemalloc.get_traced_memory()[0]
+
+
+def measure(data_path: Path, compact: bool, with_store: bool):
+    episode_store = EpisodeStore() if with_store else None
+    tracemalloc.start()
+    start = traced_bytes()
+    reader = CSVDataReader(compact, episode_store)
+    reader.load_podcasts_authors_categories(data_path)
+    after_podcasts = traced_bytes()
+    for batch in reader.iter_episode_batches(data_path, workers=1):
+        reader.build_episodes(batch)
+    if episode_store is not None:
+        episode_store.seal()
+    distinct_values = len(reader.intern_table)
+    # The table goes away with the reader after a real ingest, only the catalogue is measured
+    reader.intern_table.clear()
+    after_episodes = traced_bytes()
+    tracemalloc.stop()
+    podcasts, episodes = len(reader.dataset_of_podcasts), len(reader.dataset_of_episodes)
+    return (podcasts, episodes, (after_podcasts - start) / podcasts, (after_episodes - after_podcasts) / episodes,
+            after_episodes - start, distinct_values, reader.intern_table)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--scale', type=int, default=1, help='copies of the bundled data to load')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        data_path = DATA_PATH if args.scale == 1 else write_scaled_dataset(Path(temp_dir), args.scale)
+        print(f"{'entities':<15} {'podcasts':>9} {'episodes':>9} {'B/podcast':>10} {'B/episode':>10} {'total':>10}")
+        for name, compact, with_store in (('regular', False, False), ('compact', True, False),
+                                          ('compact + store', True, True)):
+            podcasts, episodes, per_podcast, per_episode, total, distinct_values, intern_table = measure(
+                data_path, compact, with_store)
+            print(f"{name:<15} {podcasts:>9} {episodes:>9} {per_podcast:>10.0f} {per_episode:>10.0f} "
+                  f"{total / 2 ** 20:>7.2f} MB")
+        print(f"interned: {distinct_values} distinct values, {intern_table.repeats} repeats shared, "
+              f"{intern_table.saved_bytes / 2 ** 10:.0f} KiB saved")
+
+
+if __name__ == '__main__':
+    main()
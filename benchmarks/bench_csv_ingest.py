@@ -0,0 +1,54 @@
+"""Rows per second of the episode ingest: CSVDataReader.load_episodes against the streaming reader.
+
+Run from the project directory:  python -m benchmarks.bench_csv_ingest --scale 10 --workers 4
+"""
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks.datasets import DATA_PATH, write_scaled_dataset
+from podcast.adapters.datareader.csvdatareader import CSVDataReader
+
+
+def time_load_episodes(data_path: Path):
+    reader = CSVDataReader()
+    reader.load_podcasts_authors_categories(data_path)
+    start = time.perf_counter()
+    reader.load_episodes(data_path)
+    return len(reader.dataset_of_episodes), time.perf_counter() - start
+
+
+def time_streaming(data_path: Path, workers: int, build_episodes: bool):
+    reader = CSVDataReader()
+    reader.load_podcasts_authors_categories(data_path)
+    rows = 0
+    start = time.perf_counter()
+    for batch in reader.iter_episode_batches(data_path, workers):
+        if build_episodes:
+            reader.build_episodes(batch)
+        rows += len(batch)
+    return rows, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--scale', type=int, default=1, help='copies of the bundled data to ingest')
+    parser.add_argument('--workers', type=int, default=None, help='worker processes (default: cpu count)')
+    parser.add_argument('--repeat', type=int, default=3, help='runs per reader, the best one is reported')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        data_path = DATA_PATH if args.scale == 1 else write_scaled_dataset(Path(temp_dir), args.scale)
+        readers = {
+            'load_episodes': lambda: time_load_episodes(data_path),
+            'streaming rows': lambda: time_streaming(data_path, args.workers, build_episodes=False),
+            'streaming + build_episodes': lambda: time_streaming(data_path, args.workers, build_episodes=True),
+        }
+        for name, run in readers.items():
+            rows, seconds = min((run() for _ in range(args.repeat)), key=lambda result: result[1])
+            print(f"{name:<28} {rows:>9} rows {seconds:8.3f} s {rows / seconds:>12,.0f} rows/s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""Time to fill a fresh SQLite database: one merge and commit per entity against SqlAlchemyRepository.bulk_load.
+
+Run from the project directory:  python -m benchmarks.bench_database_populate --scale 1
+"""
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker, clear_mappers
+from sqlalchemy.pool import NullPool
+
+from benchmarks.datasets import DATA_PATH, write_scaled_dataset
+from podcast.adapters.database_repository import SqlAlchemyRepository
+from podcast.adapters.datareader.csvdatareader import CSVDataReader
+from podcast.adapters.orm import mapper_registry, map_model_to_tables
+
+
+def make_repository(database_file: Path) -> SqlAlchemyRepository:
+    clear_mappers()
+    engine = create_engine(f"sqlite:///{database_file}", connect_args={"check_same_thread": False},
+                           poolclass=NullPool)
+    mapper_registry.metadata.create_all(engine)
+    map_model_to_tables()
+    return SqlAlchemyRepository(sessionmaker(autocommit=False, autoflush=True, bind=engine))
+
+
+def read_catalogue(data_path: Path) -> CSVDataReader:
+    reader = CSVDataReader()
+    reader.load_podcasts_authors_categories(data_path)
+    reader.load_episodes(data_path)
+    return reader
+
+
+def populate_per_row(repo: SqlAlchemyRepository, reader: CSVDataReader):
+    for author in reader.dataset_of_authors.values():
+        repo.add_author(author)
+    for podcast in reader.dataset_of_podcasts:
+        repo.add_podcast(podcast)
+    for category in reader.dataset_of_categories.values():
+        repo.add_category(category)
+    for episode in reader.dataset_of_episodes:
+        repo.add_episode(episode)
+
+
+def populate_bulk(repo: SqlAlchemyRepository, reader: CSVDataReader):
+    repo.bulk_load(reader.dataset_of_authors.values(), reader.dataset_of_podcasts,
+                   reader.dataset_of_categories.values(), reader.dataset_of_episodes)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--scale', type=int, default=1, help='copies of the bundled data to load')
+    parser.add_argument('--skip-per-row', action='store_true', help='only time bulk_load')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        temp_path = Path(temp_dir)
+        data_path = DATA_PATH if args.scale == 1 else write_scaled_dataset(temp_path / 'data', args.scale)
+        strategies = {'bulk_load': populate_bulk}
+        if not args.skip_per_row:
+            strategies = {'per-row merge': populate_per_row, **strategies}
+
+        timings = {}
+        for name, populate in strategies.items():
+            # Domain objects have to be created after the mapping, so the repository comes first
+            repo = make_repository(temp_path / f"{name.replace(' ', '_')}.db")
+            reader = read_catalogue(data_path)
+            start = time.perf_counter()
+            populate(repo, reader)
+            timings[name] = time.perf_counter() - start
+            print(f"{name:<14} {timings[name]:8.3f} s  ({repo.get_number_of_podcasts()} podcasts, "
+                  f"{repo.get_number_of_episodes()} episodes)")
+            repo.close_session()
+        if len(timings) == 2:
+            print(f"speedup        {timings['per-row merge'] / timings['bulk_load']:8.1f} x")
+
+
+if __name__ == '__main__':
+    main()
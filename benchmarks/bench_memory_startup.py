@@ -0,0 +1,56 @@
+"""Time to fill a MemoryRepository: adding the entities one by one against MemoryRepository.bulk_load.
+The CSV files are read once up front, only filling the repository is timed.
+
+Run from the project directory:  python -m benchmarks.bench_memory_startup --scales 10 100
+"""
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks.datasets import DATA_PATH, write_scaled_dataset
+from podcast.adapters.datareader.csvdatareader import CSVDataReader
+from podcast.adapters.memory_repository import MemoryRepository
+from podcast.adapters.repository import AbstractRepository
+
+
+def read_catalogue(data_path: Path) -> CSVDataReader:
+    reader = CSVDataReader(compact=True)
+    reader.load_podcasts_authors_categories(data_path)
+    for batch in reader.iter_episode_batches(data_path):
+        reader.build_episodes(batch)
+    return reader
+
+
+def time_fill(bulk_load, reader: CSVDataReader) -> float:
+    repo = MemoryRepository()
+    start = time.perf_counter()
+    bulk_load(repo, reader.dataset_of_authors.values(), reader.dataset_of_podcasts,
+              reader.dataset_of_categories.values(), reader.dataset_of_episodes)
+    elapsed = time.perf_counter() - start
+    assert repo.get_number_of_episodes() == len(reader.dataset_of_episodes)
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--scales', type=int, nargs='+', default=[1, 10, 100], help='copies of the bundled data')
+    parser.add_argument('--skip-one-by-one', action='store_true', help='only time MemoryRepository.bulk_load')
+    args = parser.parse_args()
+    strategies = {'bulk_load': MemoryRepository.bulk_load}
+    if not args.skip_one_by_one:
+        strategies = {'one by one': AbstractRepository.bulk_load, **strategies}
+
+    print(f"{'scale':>5} {'podcasts':>9} {'episodes':>9} {'strategy':<11} {'fill':>10}")
+    for scale in args.scales:
+        with tempfile.TemporaryDirectory() as temp_dir:
+            data_path = DATA_PATH if scale == 1 else write_scaled_dataset(Path(temp_dir), scale)
+            reader = read_catalogue(data_path)
+        for name, bulk_load in strategies.items():
+            elapsed = time_fill(bulk_load, reader)
+            print(f"{scale:>5} {len(reader.dataset_of_podcasts):>9} {len(reader.dataset_of_episodes):>9} "
+                  f"{name:<11} {elapsed:>8.3f} s")
+
+
+if __name__ == '__main__':
+    main()
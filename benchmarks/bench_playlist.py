@@ -0,0 +1,73 @@
+"""Adding a whole podcast to a playlist and emptying it again: one call per episode against
+add_episodes_to_playlist and clear_playlist, on both repositories.
+
+Run from the project directory:  python -m benchmarks.bench_playlist --episodes 1000
+"""
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks.bench_database_populate import make_repository
+from podcast.adapters.memory_repository import MemoryRepository
+from podcast.domainmodel.model import Author, Podcast, Episode
+
+
+def make_catalogue(number_of_episodes: int):
+    author = Author(1, "Benchmark Author")
+    podcast = Podcast(1, author, "Benchmark Podcast")
+    episodes = [Episode(episode_id, podcast, f"Episode {episode_id}", length=60,
+                        date=f"2020-01-01 00:{episode_id // 60 % 60:02}:{episode_id % 60:02}")
+                for episode_id in range(1, number_of_episodes + 1)]
+    for episode in episodes:
+        podcast.add_episode(episode)
+    return author, podcast, episodes
+
+
+def per_episode(repo, username, podcast):
+    for episode in podcast.episodes:
+        repo.add_to_playlist(username, episode)
+    playlist = repo.get_users_playlist(username)
+    for episode in list(playlist.episodes):
+        repo.remove_from_playlist(username, episode)
+
+
+def batched(repo, username, podcast):
+    repo.add_episodes_to_playlist(username, [episode.id for episode in podcast.episodes])
+    repo.clear_playlist(username)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--episodes', type=int, default=1_000, help='episodes in the podcast')
+    parser.add_argument('--skip-per-episode', action='store_true', help='only time the batched calls')
+    args = parser.parse_args()
+    strategies = {'batched': batched}
+    if not args.skip_per_episode:
+        strategies = {'per-episode': per_episode, **strategies}
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        print(f"{'repository':<11} {'strategy':<12} {'add all + remove all':>21}")
+        for backend in ('memory', 'database'):
+            for name, strategy in strategies.items():
+                if backend == 'memory':
+                    repo = MemoryRepository()
+                else:
+                    repo = make_repository(Path(temp_dir) / f"{name}.db")
+                # Domain objects have to be created after the mapping, so the repository comes first
+                author, podcast, episodes = make_catalogue(args.episodes)
+                repo.bulk_load([author], [podcast], [], episodes)
+                repo.add_user('listener', 'Passw0rd')
+                podcast = repo.get_podcast(podcast.id)
+
+                start = time.perf_counter()
+                strategy(repo, 'listener', podcast)
+                elapsed = time.perf_counter() - start
+                assert len(repo.get_users_playlist('listener').episodes) == 0
+                print(f"{backend:<11} {name:<12} {elapsed * 1e3:>18.1f} ms")
+                if backend == 'database':
+                    repo.close_session()
+
+
+if __name__ == '__main__':
+    main()
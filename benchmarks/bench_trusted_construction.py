@@ -0,0 +1,82 @@
+"""Entities built per second from parsed CSV rows: the validated constructors and add_* methods against the
+trusted from_row constructors and plain collection appends of the compact entities.
+
+Run from the project directory:  python -m benchmarks.bench_trusted_construction --scale 10
+"""
+import argparse
+import os
+import time
+
+from benchmarks.datasets import DATA_PATH
+from podcast.adapters.datareader.csvdatareader import CSVDataReader, parse_episode_chunk
+from podcast.domainmodel.model import Author, Podcast, Episode, CompactAuthor, CompactPodcast, CompactEpisode
+
+
+def validated(author_class, podcast_class, episode_class):
+    def build(podcast_rows, episode_rows):
+        author = author_class(1, "Benchmark Author")
+        podcasts = {}
+        for podcast_id, title, image, description, website, itunes_id, language in podcast_rows:
+            podcast = podcast_class(podcast_id, author, title, image, description, website, itunes_id, language)
+            author.add_podcast(podcast)
+            podcasts[podcast_id] = podcast
+        for episode_id, podcast_id, title, url, length, description, date in episode_rows:
+            podcast = podcasts[podcast_id]
+            podcast.add_episode(episode_class(episode_id, podcast, title, url, description, length, date))
+    return build
+
+
+def trusted(podcast_rows, episode_rows):
+    author = CompactAuthor.from_row(1, "Benchmark Author")
+    podcasts = {}
+    for podcast_id, title, image, description, website, itunes_id, language in podcast_rows:
+        podcast = CompactPodcast.from_row(podcast_id, author, title, image, description, website, itunes_id,
+                                          language)
+        author.podcast_list.append(podcast)
+        podcasts[podcast_id] = podcast
+    for episode_id, podcast_id, title, url, length, description, date in episode_rows:
+        podcast = podcasts[podcast_id]
+        podcast.episodes.append(CompactEpisode.from_row(episode_id, podcast, title, url, description, length, date))
+
+
+def read_rows(scale: int):
+    reader = CSVDataReader()
+    podcast_rows = [(int(row[0]), row[1], row[2], row[3], row[6], int(row[8]), row[4])
+                    for row in reader.read_csv_file(str(DATA_PATH / "podcasts.csv"))]
+    episodes_filename = str(DATA_PATH / "episodes.csv")
+    with open(episodes_filename, 'rb') as episodes_file:
+        header_size = len(episodes_file.readline())
+    episode_rows = parse_episode_chunk(episodes_filename, header_size, os.path.getsize(episodes_filename))
+    # Copies get their own ids, like the scaled datasets
+    podcast_offset = max(row[0] for row in podcast_rows)
+    episode_offset = max(row[0] for row in episode_rows)
+    scaled_podcasts = [(row[0] + copy * podcast_offset, *row[1:]) for copy in range(scale) for row in podcast_rows]
+    scaled_episodes = [(row[0] + copy * episode_offset, row[1] + copy * podcast_offset, *row[2:])
+                       for copy in range(scale) for row in episode_rows]
+    return scaled_podcasts, scaled_episodes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--scale', type=int, default=1, help='copies of the bundled data to build')
+    parser.add_argument('--repeat', type=int, default=3, help='runs per strategy, the best one is reported')
+    args = parser.parse_args()
+    podcast_rows, episode_rows = read_rows(args.scale)
+    rows = len(podcast_rows) + len(episode_rows)
+
+    strategies = {
+        'validated': validated(Author, Podcast, Episode),
+        'validated compact': validated(CompactAuthor, CompactPodcast, CompactEpisode),
+        'trusted from_row': trusted,
+    }
+    for name, build in strategies.items():
+        seconds = float('inf')
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            build(podcast_rows, episode_rows)
+            seconds = min(seconds, time.perf_counter() - start)
+        print(f"{name:<18} {rows:>9} rows {seconds:8.3f} s {rows / seconds:>12,.0f} rows/s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,42 @@
+"""MemoryRepository.get_user latency as the number of registered users grows.
+
+Run from the project directory:  python -m benchmarks.bench_user_lookup --users 100000
+"""
+import argparse
+import random
+import timeit
+
+from podcast.adapters.memory_repository import MemoryRepository
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--users', type=int, default=100_000, help='largest number of registered users')
+    parser.add_argument('--lookups', type=int, default=10_000, help='get_user calls timed per size')
+    args = parser.parse_args()
+
+    sizes = sorted({size for size in (1_000, 10_000, args.users) if size <= args.users})
+    print(f"{'users':>9} {'get_user':>12} {'case-insensitive':>17} {'linear scan':>12}")
+    for size in sizes:
+        usernames = [f"user{number}" for number in range(size)]
+        repo = MemoryRepository()
+        case_insensitive_repo = MemoryRepository(case_insensitive_usernames=True)
+        for username in usernames:
+            repo.add_user(username, "Passw0rd")
+            case_insensitive_repo.add_user(username, "Passw0rd")
+        users = [repo.get_user(username) for username in usernames]
+        lookups = random.Random(size).choices(usernames, k=args.lookups)
+
+        indexed = timeit.timeit(lambda: [repo.get_user(name) for name in lookups], number=1)
+        case_insensitive = timeit.timeit(
+            lambda: [case_insensitive_repo.get_user(name.upper()) for name in lookups], number=1)
+        # The scan the index replaced, timed on a sample so large sizes stay quick
+        scan_lookups = lookups[:100]
+        scan = timeit.timeit(lambda: [next((user for user in users if user.username == name), None)
+                                      for name in scan_lookups], number=1)
+        print(f"{size:>9} {indexed / len(lookups) * 1e9:>9.0f} ns {case_insensitive / len(lookups) * 1e9:>14.0f} ns "
+              f"{scan / len(scan_lookups) * 1e9:>9.0f} ns")
+
+
+if __name__ == '__main__':
+    main()
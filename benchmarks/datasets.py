@@ -0,0 +1,36 @@
+import csv
+from pathlib import Path
+
+from utils import get_project_root
+
+DATA_PATH = get_project_root() / "podcast" / "adapters" / "data"
+
+
+def write_scaled_dataset(target_path: Path, factor: int, source_path: Path = DATA_PATH) -> Path:
+    """ Writes podcasts.csv and episodes.csv holding factor copies of the bundled data.
+    Each copy gets its own podcast and episode ids, so the result looks like a bigger catalogue.
+    """
+    target_path.mkdir(parents=True, exist_ok=True)
+    with open(source_path / "podcasts.csv", newline='', encoding='utf-8-sig') as podcasts_file:
+        podcast_rows = list(csv.reader(podcasts_file))
+    with open(source_path / "episodes.csv", newline='', encoding='utf-8-sig') as episodes_file:
+        episode_rows = list(csv.reader(episodes_file))
+
+    podcast_offset = max(int(row[0]) for row in podcast_rows[1:])
+    episode_offset = max(int(row[0]) for row in episode_rows[1:])
+
+    with open(target_path / "podcasts.csv", 'w', newline='', encoding='utf-8') as podcasts_file:
+        writer = csv.writer(podcasts_file)
+        writer.writerow(podcast_rows[0])
+        for copy in range(factor):
+            for row in podcast_rows[1:]:
+                writer.writerow([int(row[0]) + copy * podcast_offset, *row[1:]])
+
+    with open(target_path / "episodes.csv", 'w', newline='', encoding='utf-8') as episodes_file:
+        writer = csv.writer(episodes_file)
+        writer.writerow(episode_rows[0])
+        for copy in range(factor):
+            for row in episode_rows[1:]:
+                writer.writerow([int(row[0]) + copy * episode_offset, int(row[1]) + copy * podcast_offset,
+                                 *row[2:]])
+    return target_path
@@ -18,6 +18,7 @@ class Config:
 
     TESTING = environ.get('TESTING')
     REPOSITORY = environ.get("REPOSITORY")
+    SNAPSHOT_PATH = environ.get("SNAPSHOT_PATH")
 
     # Database configuration
     SQLALCHEMY_DATABASE_URI = environ.get('SQLALCHEMY_DATABASE_URI')
@@ -7,11 +7,13 @@ from sqlalchemy.orm import sessionmaker, clear_mappers
 from sqlalchemy.pool import NullPool
 
 import podcast.adapters.repository as repo
-from podcast.adapters import memory_repository, database_repository, repository_populate
+from podcast.adapters import memory_repository, database_repository, repository_populate, snapshot
 from podcast.adapters.database_repository import SqlAlchemyRepository
 from podcast.adapters.datareader.csvdatareader import CSVDataReader
+from podcast.adapters.episode_store import EpisodeStore
 from podcast.adapters.memory_repository import MemoryRepository
-from podcast.adapters.orm import mapper_registry, map_model_to_tables
+from podcast.adapters.orm import mapper_registry, map_model_to_tables, upgrade_schema
+from podcast.utilities.cache import FragmentCacheExtension, show_cache_stats
 
 
 def create_app(test_config=None):
@@ -36,7 +38,18 @@ def create_app(test_config=None):
         # Create the MemoryRepository implementation for a memory-based repository.
         repo.repo_instance = memory_repository.MemoryRepository()
         # Fill the content with the repository from the provided csv files (has to be done every time we start app!)
-        repository_populate.populate_data(repo.repo_instance, data_path)
+        # A binary snapshot of the catalogue lets later boots skip the csv files, as long as they have not changed.
+        # Episode texts are moved to a memory-mapped temporary file and read only when they are shown.
+        episode_store = EpisodeStore()
+        snapshot_path = app.config.get('SNAPSHOT_PATH')
+        if snapshot_path:
+            fingerprint = snapshot.source_fingerprint(data_path)
+            if not repo.repo_instance.load_snapshot(snapshot_path, fingerprint, episode_store):
+                repository_populate.populate_data(repo.repo_instance, data_path, compact=True,
+                                                  episode_store=episode_store)
+                repo.repo_instance.write_snapshot(snapshot_path, fingerprint)
+        else:
+            repository_populate.populate_data(repo.repo_instance, data_path, compact=True, episode_store=episode_store)
 
     elif app.config['REPOSITORY'] == 'database':
         # Configure database.
@@ -55,26 +68,40 @@ def create_app(test_config=None):
         # Create the SQLAlchemy DatabaseRepository instance for a sqlite3-based repository.
         repo.repo_instance = database_repository.SqlAlchemyRepository(session_factory)
 
-        if app.config['TESTING'] == 'True' or len(inspect(database_engine).get_table_names()) == 0:
+        table_names = inspect(database_engine).get_table_names()
+        if app.config['TESTING'] == 'True' or len(table_names) == 0:
             print("REPOPULATING DATABASE...")
             # For testing, or first-time use of the web application, reinitialise the database.
             clear_mappers()
             mapper_registry.metadata.create_all(database_engine)  # Conditionally create database tables.
-            for table in reversed(mapper_registry.metadata.sorted_tables):  # Remove any data from the tables.
-                with database_engine.connect() as conn:
+            with database_engine.begin() as conn:  # Remove any data from the tables.
+                for table in reversed(mapper_registry.metadata.sorted_tables):
                     conn.execute(table.delete())
 
             # Generate mappings that map domain model classes to the database tables.
             map_model_to_tables()
 
+            # populate_data hands the whole catalogue to SqlAlchemyRepository.bulk_load in one transaction.
             repository_populate.populate_data(repo.repo_instance, data_path)
             print("REPOPULATING DATABASE... FINISHED")
 
         else:
+            # Databases created by earlier versions gain the indexes and columns added since
+            upgrade_schema(database_engine)
             # Solely generate mappings that map domain model classes to the database tables.
             map_model_to_tables()
 
+    # {% cache %} tags in the templates, see FragmentCacheExtension
+    app.jinja_env.add_extension(FragmentCacheExtension)
+    if app.debug:
+        # Hit and miss counts of the caches of this process, as JSON
+        app.add_url_rule('/debug/cache-stats', 'cache_stats', show_cache_stats)
+
     with app.app_context():
+        # Every template gets the cached category navigation bar
+        from .utilities import utilities
+        app.context_processor(utilities.get_category_nav)
+
         # Register blueprints
         from .home import home
         app.register_blueprint(home.home_blueprint)
@@ -1,11 +1,17 @@
-from typing import List, Type
+from itertools import islice
+from typing import Iterable, List, Optional, Tuple, Type
 
-from sqlalchemy import asc, func
-from sqlalchemy.orm import scoped_session
+from sqlalchemy import and_, asc, column, func, literal, literal_column, or_, select, table
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import joinedload, scoped_session, selectinload
 from sqlalchemy.orm.exc import NoResultFound
 
-from podcast.adapters.repository import AbstractRepository
-from podcast.domainmodel.model import User, Podcast, Category, Episode, Author, Review, Playlist
+from podcast.adapters.orm import (authors_table, categories_table, data_versions_table, episode_table,
+                                  playlists_episodes_table, playlists_table, podcast_table, podcasts_categories_table,
+                                  reviews_table, users_table)
+from podcast.adapters.repository import AbstractRepository, Page, PodcastDetail, clamp_page
+from podcast.adapters.search_index import tokenize
+from podcast.domainmodel.model import User, Podcast, Category, Episode, Author, Review, Playlist, validate_rating
 
 
 class SessionContextManager:
@@ -43,19 +49,81 @@ class SessionContextManager:
 class SqlAlchemyRepository(AbstractRepository):
 
     def __init__(self, session_factory):
+        super().__init__()
         self._session_cm = SessionContextManager(session_factory)
+        # Number of podcasts, cached until podcasts are added through this repository
+        self.__number_of_podcasts = None
+        # Data versions read from the database since the session was last reset, see get_version
+        self.__versions_read = dict()
 
     def close_session(self):
         self._session_cm.close_current_session()
 
     def reset_session(self):
         self._session_cm.reset_session()
+        self.__versions_read.clear()
+
+    def get_version(self, kind: str) -> int:
+        # The versions are kept in the database, so every process serving it sees a change made by any of them.
+        # Each is read once per request, when it is first asked for after reset_session.
+        if kind not in self.__versions_read:
+            version = self._session_cm.session.scalar(
+                select(data_versions_table.c.version).where(data_versions_table.c.kind == kind))
+            self.__versions_read[kind] = version or 0
+        return self.__versions_read[kind]
+
+    def _data_changed(self, *kinds: str):
+        statement = sqlite_insert(data_versions_table).values([{'kind': kind, 'version': 1} for kind in kinds])
+        statement = statement.on_conflict_do_update(
+            index_elements=[data_versions_table.c.kind], set_={'version': data_versions_table.c.version + 1})
+        with self._session_cm as scm:
+            scm.session.execute(statement)
+            scm.commit()
+        for kind in kinds:
+            self.__versions_read.pop(kind, None)
+
+    # Functions for populating the repository
+    def bulk_load(self, authors: Iterable[Author], podcasts: Iterable[Podcast], categories: Iterable[Category],
+                  episodes: Iterable[Episode], batch_size: int = 1000):
+        # Plain Core executemany inserts in one transaction, instead of a merge and a commit per entity
+        podcasts = list(podcasts)
+        with self._session_cm as scm:
+            connection = scm.session.connection()
+            self.__insert_in_batches(connection, authors_table, (
+                {'author_id': author.id, 'name': author.name} for author in authors), batch_size)
+            self.__insert_in_batches(connection, categories_table, (
+                {'category_id': category.id, 'category_name': category.name} for category in categories), batch_size)
+            self.__insert_in_batches(connection, podcast_table, (
+                {'podcast_id': podcast.id, 'title': podcast.title, 'image_url': podcast.image,
+                 'description': podcast.description, 'language': podcast.language, 'website_url': podcast.website,
+                 'author_id': podcast.author.id if podcast.author else None, 'itunes_id': podcast.itunes_id,
+                 **{f'ratings_{rating}': reviews for rating, reviews in enumerate(podcast.rating_summary, start=1)}}
+                for podcast in podcasts), batch_size)
+            self.__insert_in_batches(connection, podcasts_categories_table, (
+                {'podcast_id': podcast.id, 'category_id': category.id}
+                for podcast in podcasts for category in podcast.categories), batch_size)
+            self.__insert_in_batches(connection, episode_table, (
+                {'episode_id': episode.id, 'podcast_id': episode.podcast.id if episode.podcast else None,
+                 'title': episode.title, 'audio_url': episode.url, 'description': episode.description,
+                 'pub_date': episode.date}
+                for episode in episodes), batch_size)
+            scm.commit()
+        self.__number_of_podcasts = None
+        self._data_changed('categories', 'catalogue')
+
+    @staticmethod
+    def __insert_in_batches(connection, table, rows, batch_size: int):
+        rows = iter(rows)
+        while batch := list(islice(rows, batch_size)):
+            connection.execute(table.insert(), batch)
 
     # Functions for Podcast
     def add_podcast(self, podcast: Podcast):
         with self._session_cm as scm:
             scm.session.merge(podcast)
             scm.commit()
+        self.__number_of_podcasts = None
+        self._data_changed('catalogue')
 
     def get_podcast(self, podcast_id: int) -> Podcast:
         podcast = None
@@ -67,27 +135,88 @@ class SqlAlchemyRepository(AbstractRepository):
             print(f'Podcast {podcast_id} was not found')
         return podcast
 
-    def get_podcasts_by_id(self, id_list: list) -> List[Podcast]:
+    def get_podcast_ids(self) -> List[int]:
         with self._session_cm as scm:
-            podcasts = scm.session.query(Podcast).filter(Podcast._id.in_(id_list)).all()
-            return podcasts
+            return list(scm.session.scalars(select(podcast_table.c.podcast_id)))
+
+    def get_podcasts_by_id(self, id_list: list) -> List[Podcast]:
+        return self._session_cm.session.query(Podcast).options(joinedload(Podcast._author)). \
+            filter(Podcast._id.in_(id_list)).order_by(func.lower(Podcast._title), Podcast._id).all()
 
     def get_podcasts_by_page(self, page_number: int, page_size: int) -> List[Podcast]:
         start_index = (page_number - 1) * page_size
-        end_index = start_index + page_size
-        return self._session_cm.session.query(Podcast).all()[start_index:end_index]
+        return self._session_cm.session.query(Podcast).order_by(func.lower(Podcast._title), Podcast._id). \
+            offset(start_index).limit(page_size).all()
+
+    def get_podcasts_after(self, after_podcast_id: int, page_size: int) -> List[Podcast]:
+        query = self._session_cm.session.query(Podcast)
+        if after_podcast_id is not None:
+            # Seek past the (lower(title), podcast_id) key of the anchor podcast, using ix_podcasts_title_key
+            anchor = select(func.lower(podcast_table.c.title).label('title_key'), podcast_table.c.podcast_id). \
+                where(podcast_table.c.podcast_id == after_podcast_id).subquery()
+            # The plain >= bound is what lets SQLite seek the index instead of scanning it
+            query = query.join(anchor, and_(func.lower(Podcast._title) >= anchor.c.title_key,
+                                            or_(func.lower(Podcast._title) > anchor.c.title_key,
+                                                Podcast._id > anchor.c.podcast_id)))
+        return query.order_by(func.lower(Podcast._title), Podcast._id).limit(page_size).all()
+
+    def get_page(self, page_number: int, page_size: int) -> Page:
+        start_index = (page_number - 1) * page_size
+        if self.__number_of_podcasts is not None:
+            return Page(self.get_podcasts_by_page(page_number, page_size), page_number, page_size,
+                        self.__number_of_podcasts)
+        # COUNT(*) OVER () returns the total along with the page rows, in the same round trip
+        rows = self._session_cm.session.query(Podcast, func.count().over()). \
+            order_by(func.lower(Podcast._title), Podcast._id).offset(start_index).limit(page_size).all()
+        if rows:
+            self.__number_of_podcasts = rows[0][1]
+        return Page([podcast for podcast, _ in rows], page_number, page_size, self.get_number_of_podcasts())
+
+    def get_podcast_detail(self, podcast_id: int, episode_page: int, username: str = None,
+                           page_size: int = 10) -> Optional[PodcastDetail]:
+        session = self._session_cm.session
+        # The podcast, its author and its number of episodes in one query and its categories in another, instead of
+        # a lazy load per relationship. Reviews are paged separately by get_podcast_reviews
+        number_of_episodes = select(func.count()).where(episode_table.c.podcast_id == podcast_table.c.podcast_id). \
+            correlate(podcast_table).scalar_subquery()
+        row = session.query(Podcast, number_of_episodes).options(
+            joinedload(Podcast._author),
+            selectinload(Podcast.categories)).filter(Podcast._id == podcast_id).one_or_none()
+        if row is None:
+            return None
+        podcast, total_episodes = row
+
+        episode_page = clamp_page(episode_page, total_episodes, page_size)
+        episodes = session.query(Episode).filter(episode_table.c.podcast_id == podcast_id). \
+            order_by(Episode._date, Episode._id).offset((episode_page - 1) * page_size).limit(page_size).all()
+
+        episodes_in_playlist = set()
+        if username is not None and episodes:
+            statement = select(playlists_episodes_table.c.episode_id). \
+                join(playlists_table, playlists_table.c.playlist_id == playlists_episodes_table.c.playlist_id). \
+                join(users_table, users_table.c.user_id == playlists_table.c.owner_id). \
+                where(users_table.c.user_name == username,
+                      playlists_episodes_table.c.episode_id.in_([episode.id for episode in episodes]))
+            episodes_in_playlist = set(session.scalars(statement))
+        return PodcastDetail(podcast, episodes, episode_page, page_size, total_episodes, episodes_in_playlist)
 
     def get_number_of_podcasts(self) -> int:
-        num_podcasts = self._session_cm.session.query(Podcast).count()
-        return num_podcasts
+        if self.__number_of_podcasts is None:
+            self.__number_of_podcasts = self._session_cm.session.query(Podcast).count()
+        return self.__number_of_podcasts
 
     def get_podcasts_ids_for_category(self, category_name: str) -> List[int]:
-        podcasts = self._session_cm.session.query(Podcast).all()
-        matching_podcast_ids = []
-        for podcast in podcasts:
-            if any(category.name == category_name for category in podcast.categories):
-                matching_podcast_ids.append(podcast.id)
-        return matching_podcast_ids
+        statement = self.__podcast_ids_in_categories(categories_table.c.category_name == category_name).order_by(
+            func.lower(podcast_table.c.title), podcast_table.c.podcast_id)
+        return list(self._session_cm.session.scalars(statement))
+
+    @staticmethod
+    def __podcast_ids_in_categories(category_condition):
+        # podcast_categories joined to its categories and podcasts, the caller adds the ordering it needs
+        return select(podcasts_categories_table.c.podcast_id). \
+            join(categories_table, categories_table.c.category_id == podcasts_categories_table.c.category_id). \
+            join(podcast_table, podcast_table.c.podcast_id == podcasts_categories_table.c.podcast_id). \
+            where(category_condition)
 
     # Functions for pagination
     def has_next_page(self, current_page: int, page_size: int) -> bool:
@@ -116,26 +245,27 @@ class SqlAlchemyRepository(AbstractRepository):
         with self._session_cm as scm:
             scm.session.merge(category)
             scm.commit()
+        self._data_changed('categories', 'catalogue')
 
     # Functions for Episode
     def add_episode(self, episode: Episode):
         with self._session_cm as scm:
             scm.session.merge(episode)
             scm.commit()
+        self._data_changed('catalogue')
 
     def get_number_of_episodes(self) -> int:
         return self._session_cm.session.query(Episode).count()
 
     def get_episode(self, episode_id: int) -> Episode:
-        if episode_id <= self.get_number_of_episodes():
-            return self._session_cm.session.query(Episode).filter(Episode._id == episode_id).one()
-        return None
+        return self._session_cm.session.get(Episode, episode_id)
 
     # Functions for Author
     def add_author(self, author: Author):
         with self._session_cm as scm:
             scm.session.merge(author)
             scm.commit()
+        self._data_changed('catalogue')
 
     # Functions for User
     def add_user(self, username: str, password: str):
@@ -186,6 +316,62 @@ class SqlAlchemyRepository(AbstractRepository):
                 scm.session.merge(user.playlist)  # Merge to update the playlist in the database
                 scm.commit()
 
+    def add_episodes_to_playlist(self, username: str, episode_ids: Iterable[int]) -> int:
+        episode_ids = list(dict.fromkeys(episode_ids))
+        with self._session_cm as scm:
+            playlist_id = self.__playlist_id(scm.session, username, create=True)
+            in_playlist = select(playlists_episodes_table.c.episode_id). \
+                where(playlists_episodes_table.c.playlist_id == playlist_id)
+            addable = set(scm.session.scalars(select(episode_table.c.episode_id).where(
+                episode_table.c.episode_id.in_(episode_ids), episode_table.c.episode_id.not_in(in_playlist))))
+            # One multi-row insert, in the order the ids were given
+            rows = [{'playlist_id': playlist_id, 'episode_id': episode_id}
+                    for episode_id in episode_ids if episode_id in addable]
+            if rows:
+                scm.session.execute(playlists_episodes_table.insert(), rows)
+            scm.commit()
+        return len(rows)
+
+    def add_podcast_to_playlist(self, username: str, podcast_id: int) -> int:
+        with self._session_cm as scm:
+            if scm.session.get(Podcast, podcast_id) is None:
+                raise ValueError(f"Podcast {podcast_id} is not found!")
+            playlist_id = self.__playlist_id(scm.session, username, create=True)
+            in_playlist = select(playlists_episodes_table.c.episode_id). \
+                where(playlists_episodes_table.c.playlist_id == playlist_id)
+            # Only the ids are read, by the database itself, in the podcast's timeline order
+            episodes = select(literal(playlist_id), episode_table.c.episode_id). \
+                where(episode_table.c.podcast_id == podcast_id, episode_table.c.episode_id.not_in(in_playlist)). \
+                order_by(episode_table.c.pub_date, episode_table.c.episode_id)
+            result = scm.session.execute(
+                playlists_episodes_table.insert().from_select(['playlist_id', 'episode_id'], episodes))
+            scm.commit()
+        return result.rowcount
+
+    def clear_playlist(self, username: str):
+        with self._session_cm as scm:
+            playlist_id = self.__playlist_id(scm.session, username)
+            if playlist_id is not None:
+                scm.session.execute(playlists_episodes_table.delete().
+                                    where(playlists_episodes_table.c.playlist_id == playlist_id))
+            scm.commit()
+
+    @staticmethod
+    def __playlist_id(session, username: str, create: bool = False) -> Optional[int]:
+        # The id of the user's playlist, None if there is none and create is False
+        row = session.execute(select(users_table.c.user_id, playlists_table.c.playlist_id).
+                              outerjoin(playlists_table, playlists_table.c.owner_id == users_table.c.user_id).
+                              where(users_table.c.user_name == username)).first()
+        if row is None:
+            raise ValueError(f"User {username} is not found!")
+        user_id, playlist_id = row
+        if playlist_id is None and create:
+            # Playlists share their owner's id, as User.create_playlist does
+            playlist_id = user_id
+            session.execute(playlists_table.insert().values(playlist_id=playlist_id, name="My Playlist",
+                                                            owner_id=user_id))
+        return playlist_id
+
     def get_users_playlist(self, username: str):
         user = self.get_user(username)
         return user.playlist
@@ -200,24 +386,35 @@ class SqlAlchemyRepository(AbstractRepository):
 
     # Functions for Review
     def add_review(self, podcast: Podcast, user: User, rating: int, description: str):
+        validate_rating(rating)
         user = self.get_user(user._username)
-        reviews = self._session_cm.session.query(Review).all()
-        user_reviews = []
-        for review in reviews:
-            if (review._reviewer._id == user._id):
-                user_reviews.append(review)
-        review_id = len(reviews) + 1
-        for review in user_reviews:
-            if review.podcast.id == podcast.id:
-                raise ValueError(
-                    f'You already reviewed this podcast. Please try another one!')  # Olivia's code from database repository
+        session = self._session_cm.session
+        # Two indexed queries instead of loading every review in the table
+        already_reviewed = session.query(reviews_table.c.review_id).filter(
+            reviews_table.c.user_id == user._id, reviews_table.c.podcast_id == podcast.id).first() is not None
+        if already_reviewed:
+            raise ValueError(
+                f'You already reviewed this podcast. Please try another one!')  # Olivia's code from database repository
+        review_id = (session.query(func.max(reviews_table.c.review_id)).scalar() or 0) + 1
         new_review = Review(review_id, podcast, user, rating, description)
         with self._session_cm as scm:
             scm.session.add(new_review)
+            scm.session.execute(self.__rating_count_update(podcast.id, rating, 1))
             scm.commit()
+        self._data_changed('catalogue')
         user.add_review(new_review)
         podcast.add_review(new_review)
 
+    def get_podcast_reviews(self, podcast_id: int, offset: int = 0,
+                            limit: int = None) -> Tuple[List[Review], int]:
+        session = self._session_cm.session
+        # Served by ix_reviews_podcast_rating, only the requested page is loaded
+        total = session.query(Review).filter(reviews_table.c.podcast_id == podcast_id).count()
+        reviews = session.query(Review).options(joinedload(Review._reviewer)). \
+            filter(reviews_table.c.podcast_id == podcast_id).order_by(Review._rating.desc(), Review._id). \
+            offset(offset).limit(limit).all()
+        return reviews, total
+
     def get_users_reviews(self, username: str):
         user = self.get_user(username)
         if not user:
@@ -232,44 +429,77 @@ class SqlAlchemyRepository(AbstractRepository):
     def delete_review(self, review_id: int):
         review_to_be_deleted = self._session_cm.session.query(Review).filter(Review._id == review_id).one()
         with self._session_cm as scm:
+            scm.session.execute(self.__rating_count_update(review_to_be_deleted.podcast.id,
+                                                           review_to_be_deleted.rating, -1))
             scm.session.delete(review_to_be_deleted)
             scm.commit()
+        self._data_changed('catalogue')
 
-    # Functions for search - get podcasts by title, author, language or category
-    def get_podcasts_by_title(self, title_string: str) -> List[Podcast]:
-        try:
-            searched_podcasts = self._session_cm.session.query(Podcast). \
-                filter(func.lower(Podcast._title).like(f"%{title_string.lower()}%")).all()
-        except NoResultFound:
-            print(f'Title {title_string} was not found')
-            return []
-        return searched_podcasts
+    @staticmethod
+    def __rating_count_update(podcast_id: int, rating: int, change: int):
+        # Adjusts the podcast's running rating counts in SQL, in the transaction that adds or deletes the review
+        column = podcast_table.c[f'ratings_{rating}']
+        return podcast_table.update().where(podcast_table.c.podcast_id == podcast_id).values({column: column + change})
 
-    def get_podcasts_by_author(self, author_name: str) -> List[Podcast]:
-        try:
-            searched_podcasts = self._session_cm.session.query(Podcast).join(Author). \
-                filter(func.lower(Author._name).like(f"%{author_name.lower()}%")).all()
-        except NoResultFound:
-            return []
-        return searched_podcasts
-
-    def get_podcasts_by_category(self, category_string: str) -> List[Podcast]:
-        try:
-            searched_podcasts = self._session_cm.session.query(Podcast).all()
-            podcasts = []
-            for podcast in searched_podcasts:
-                for category in podcast.categories:
-                    if category_string.lower() in category.name.lower():
-                        podcasts.append(podcast)
-        except NoResultFound:
-            return []
-        return podcasts
-
-    def get_podcasts_by_language(self, language_string: str) -> List[Podcast]:
-        try:
-            searched_podcasts = self._session_cm.session.query(Podcast). \
-                filter(func.lower(Podcast._language).like(f"%{language_string.lower()}%")).all()
-
-        except NoResultFound:
-            return []
-        return searched_podcasts
+    # Functions for search - get podcasts by title, author, language or category
+    def get_podcasts_by_title(self, title_string: str, offset: int = 0,
+                              limit: int = None) -> Tuple[List[Podcast], int]:
+        query = self._session_cm.session.query(Podcast). \
+            filter(func.lower(Podcast._title).like(f"%{title_string.lower()}%"))
+        return self.__page_of_podcasts(query, offset, limit)
+
+    def get_podcasts_by_author(self, author_name: str, offset: int = 0,
+                               limit: int = None) -> Tuple[List[Podcast], int]:
+        query = self._session_cm.session.query(Podcast).join(Author). \
+            filter(func.lower(Author._name).like(f"%{author_name.lower()}%"))
+        return self.__page_of_podcasts(query, offset, limit)
+
+    def get_podcasts_by_category(self, category_string: str, offset: int = 0,
+                                 limit: int = None) -> Tuple[List[Podcast], int]:
+        matching_ids = self.__podcast_ids_in_categories(
+            func.lower(categories_table.c.category_name).like(f"%{category_string.lower()}%"))
+        query = self._session_cm.session.query(Podcast).filter(Podcast._id.in_(matching_ids))
+        return self.__page_of_podcasts(query, offset, limit)
+
+    def get_podcasts_by_language(self, language_string: str, offset: int = 0,
+                                 limit: int = None) -> Tuple[List[Podcast], int]:
+        query = self._session_cm.session.query(Podcast). \
+            filter(func.lower(Podcast._language).like(f"%{language_string.lower()}%"))
+        return self.__page_of_podcasts(query, offset, limit)
+
+    @staticmethod
+    def __page_of_podcasts(query, offset: int, limit: int) -> Tuple[List[Podcast], int]:
+        # Only one page of podcasts is loaded, COUNT(*) OVER () adds the number of matches to each of its rows
+        rows = query.add_columns(func.count().over()).order_by(func.lower(Podcast._title), Podcast._id). \
+            offset(offset).limit(limit).all()
+        if not rows:
+            # An offset past the last match returns no rows, and so no total either
+            return [], query.count() if offset else 0
+        return [podcast for podcast, _ in rows], rows[0][1]
+
+    # Functions for full text search, served by the FTS5 indexes podcasts_fts and episodes_fts (see orm.py)
+    def search_podcasts(self, query: str, offset: int = 0, limit: int = None) -> Tuple[List[Podcast], int]:
+        return self.__full_text_search(Podcast, Podcast._id, 'podcasts_fts', query, offset, limit)
+
+    def search_episodes(self, query: str, offset: int = 0, limit: int = None) -> Tuple[List[Episode], int]:
+        return self.__full_text_search(Episode, Episode._id, 'episodes_fts', query, offset, limit)
+
+    def __full_text_search(self, entity, id_attribute, fts_name: str, query: str, offset: int, limit: int):
+        # Every token is quoted, so FTS5 operators and punctuation in the query are matched as plain words
+        tokens = tokenize(query)
+        if not tokens:
+            return [], 0
+        fts_table = table(fts_name, column('rowid'))
+        matches = literal_column(fts_name).op('MATCH')(' AND '.join(f'"{token}"' for token in tokens))
+        # bm25() only works in the query reading the FTS table, so the ranking is a subquery of its own
+        ranked = select(fts_table.c.rowid.label('id'), func.bm25(literal_column(fts_name)).label('rank')). \
+            where(matches).subquery()
+        rows = self._session_cm.session.query(entity, func.count().over()). \
+            join(ranked, ranked.c.id == id_attribute). \
+            order_by(ranked.c.rank, id_attribute).offset(offset).limit(limit).all()
+        if not rows:
+            # An offset past the last match returns no rows, and so no total either
+            total = self._session_cm.session.query(func.count()).select_from(fts_table).filter(matches).scalar() \
+                if offset else 0
+            return [], total
+        return [item for item, _ in rows], rows[0][1]
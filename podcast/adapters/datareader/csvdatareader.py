@@ -1,22 +1,115 @@
 import csv
+import io
+import mmap
+import os
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from podcast.domainmodel.model import Podcast, Episode, Category, Author, Review, User
+from typing import Iterator, List, Tuple
+
+from podcast.adapters.episode_store import EpisodeStore, add_episode_view, episode_view_from_row
+from podcast.adapters.interning import InternTable
+from podcast.domainmodel.model import Podcast, Episode, Category, Author, Review, User, CompactAuthor, \
+    CompactCategory, CompactPodcast, CompactEpisode, validate_non_empty_string
+
+# Smallest byte range worth shipping to another process, smaller files are parsed in-process
+MIN_CHUNK_BYTES = 256 * 1024
+
+EpisodeRow = Tuple[int, int, str, str, int, str, str]
+
+# The columns the reader expects, checked once per file before any row is read
+PODCAST_COLUMNS = ['id', 'title', 'image', 'description', 'language', 'categories', 'website', 'author', 'itunes_id']
+EPISODE_COLUMNS = ['id', 'podcast_id', 'title', 'audio', 'audio_length', 'description', 'pub_date']
+
+
+def check_columns(filename: str, column_names: List[str], expected_columns: List[str]):
+    if [name.strip() for name in column_names] != expected_columns:
+        raise ValueError(f"{filename} has the columns {column_names}, expected {expected_columns}.")
+
+
+def check_title(kind: str, row_id, title: str):
+    """ The one check every row gets, even when its entity is built without validation. """
+    if not title:
+        raise ValueError(f"{kind} {row_id} has an empty title.")
+
+
+def split_csv_into_chunks(filename: str, number_of_chunks: int) -> List[Tuple[int, int]]:
+    """ Splits the data rows of a CSV file into roughly equal (start, end) byte ranges.
+    Every boundary falls on a newline outside of a quoted field, so each range holds whole records.
+    """
+    with open(filename, 'rb') as csv_file, mmap.mmap(csv_file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        size = len(data)
+        data_start = data.find(b'\n') + 1 if size else 0
+        if data_start == 0:
+            return []
+        chunk_size = max(1, (size - data_start) // max(1, number_of_chunks))
+        boundaries = [data_start]
+        quotes_before = data[:data_start].count(b'"')
+        position = data_start
+        for chunk_number in range(1, number_of_chunks):
+            target = max(data_start + chunk_number * chunk_size, boundaries[-1])
+            newline = data.find(b'\n', target)
+            # Move on to the next newline until we are not inside a quoted (multi-line) field
+            while newline != -1:
+                quotes_before += data[position:newline].count(b'"')
+                position = newline
+                if quotes_before % 2 == 0:
+                    break
+                newline = data.find(b'\n', newline + 1)
+            if newline == -1 or newline + 1 >= size:
+                break
+            boundaries.append(newline + 1)
+        boundaries.append(size)
+    return [(start, end) for start, end in zip(boundaries, boundaries[1:]) if start < end]
+
+
+def parse_episode_chunk(filename: str, start: int, end: int) -> List[EpisodeRow]:
+    """ Parses and validates the episode records in the byte range [start, end) of episodes.csv.
+    Runs inside worker processes, so it only returns plain tuples.
+    """
+    with open(filename, 'rb') as csv_file:
+        csv_file.seek(start)
+        text = csv_file.read(end - start).decode('utf-8')
+    rows = []
+    for row in csv.reader(io.StringIO(text, newline='')):
+        if not row:
+            continue
+        episode_id, podcast_id, title, audio, audio_length, description, pub_date = row
+        title = title.strip()
+        check_title("Episode", episode_id, title)
+        rows.append((int(episode_id), int(podcast_id), title, audio.strip(), int(audio_length),
+                     description.strip(), pub_date.strip()[0:-3]))
+    return rows
 
 
 class CSVDataReader:
-    def __init__(self):
+    def __init__(self, compact: bool = False, episode_store: EpisodeStore = None):
+        # Compact entities and episode views take less memory, but only MemoryRepository can hold them.
+        # They are built by the trusted from_row constructors, the files' columns are checked instead.
+        self.__trusted = compact
+        self.__episode_store = episode_store
+        # Values repeating across rows are shared by every entity that holds them
+        self.__intern = InternTable()
+        if compact:
+            self.__author, self.__category, self.__podcast, self.__episode = (
+                CompactAuthor.from_row, CompactCategory.from_row, CompactPodcast.from_row, CompactEpisode.from_row)
+        else:
+            self.__author, self.__category, self.__podcast, self.__episode = Author, Category, Podcast, Episode
         self.__dataset_of_podcasts = list()
+        # Episodes are joined to their podcasts by id, which need not be dense or in file order
+        self.__podcasts_by_id = dict()
         self.__dataset_of_episodes = list()
         self.__dataset_of_authors = dict()
         self.__dataset_of_categories = dict()
         self.__dataset_of_reviews = list()
 
-    def read_csv_file(self, filename: str):
+    def read_csv_file(self, filename: str, expected_columns: List[str] = None):
         with open(filename, 'r', newline='', encoding='utf-8-sig') as csv_file:
             reader = csv.reader(csv_file)
 
             # Read column names of the CSV file
             column_names = next(reader)
+            if expected_columns is not None:
+                check_columns(filename, column_names, expected_columns)
 
             # Read remaining rows from the CSV file
             for row in reader:
@@ -25,9 +118,10 @@ class CSVDataReader:
 
     def load_podcasts_authors_categories(self, data_path: Path):
         podcasts_filename = str(data_path / "podcasts.csv")
-        for data_row in self.read_csv_file(podcasts_filename):
+        for data_row in self.read_csv_file(podcasts_filename, PODCAST_COLUMNS):
             podcast_id = int(data_row[0])
             podcast_title = data_row[1]
+            check_title("Podcast", podcast_id, podcast_title)
             image = data_row[2]
             description = data_row[3]
             language = data_row[4]
@@ -35,44 +129,107 @@ class CSVDataReader:
             website = data_row[6]
             podcast_author = self.add_or_get_author(data_row[7])
             itunes_id = int(data_row[8])
-            new_podcast = Podcast(podcast_id, podcast_author, podcast_title, image, description, website,
-                                  itunes_id, language)
+            # Only the language repeats, image and website urls are nearly all unique
+            new_podcast = self.__podcast(podcast_id, podcast_author, podcast_title, image, description, website,
+                                         itunes_id, self.__intern(language))
 
             # add podcast to author's podcast list
-            podcast_author.add_podcast(new_podcast)
+            if self.__trusted:
+                podcast_author.podcast_list.append(new_podcast)
+            else:
+                podcast_author.add_podcast(new_podcast)
 
             # add podcast to categories
             for category in categories:
                 podcast_category = self.add_or_get_category(category)
-                new_podcast.add_category(podcast_category)
+                if self.__trusted:
+                    new_podcast.categories.append(podcast_category)
+                else:
+                    new_podcast.add_category(podcast_category)
 
             # add podcast to the list for future access
             self.__dataset_of_podcasts.append(new_podcast)
+            self.__podcasts_by_id[podcast_id] = new_podcast
 
     def load_episodes(self, data_path: Path):
         episodes_filename = str(data_path / "episodes.csv")
-        for data_row in self.read_csv_file(episodes_filename):
+        for data_row in self.read_csv_file(episodes_filename, EPISODE_COLUMNS):
             episode_id = int(data_row[0])
             podcast_id = int(data_row[1])
             title = data_row[2]
+            check_title("Episode", episode_id, title)
             audio = data_row[3]
             audio_length = int(data_row[4])
             description = data_row[5]
             pub_date = data_row[6]
             pub_date_sliced = pub_date[0:-3]
             podcast = self.get_podcast_by_id(podcast_id)
-            new_episode = Episode(episode_id, podcast, title, audio, description, audio_length, pub_date_sliced)
-            if podcast is not None:
-                podcast.add_episode(new_episode)
+            new_episode = self.__new_episode(episode_id, podcast, title, audio, description, audio_length,
+                                             pub_date_sliced)
+            self.__link_episode(podcast, new_episode)
             self.__dataset_of_episodes.append(new_episode)
 
+    def iter_episode_batches(self, data_path: Path, workers: int = None,
+                             batch_size: int = 1000) -> Iterator[List[EpisodeRow]]:
+        """ Streams validated episode rows from episodes.csv in file order, batch_size rows at a time.
+        The file is split into byte-range chunks which are parsed by a pool of worker processes.
+        """
+        episodes_filename = str(data_path / "episodes.csv")
+        with open(episodes_filename, newline='', encoding='utf-8-sig') as csv_file:
+            check_columns(episodes_filename, next(csv.reader(csv_file)), EPISODE_COLUMNS)
+        workers = workers or os.cpu_count() or 1
+        number_of_chunks = max(1, min(workers, os.path.getsize(episodes_filename) // MIN_CHUNK_BYTES))
+        chunks = split_csv_into_chunks(episodes_filename, number_of_chunks)
+        if len(chunks) <= 1:
+            parsed_chunks = (parse_episode_chunk(episodes_filename, start, end) for start, end in chunks)
+            yield from self.__batched(parsed_chunks, batch_size)
+            return
+        with ProcessPoolExecutor(max_workers=min(workers, len(chunks))) as executor:
+            parsed_chunks = executor.map(parse_episode_chunk, [episodes_filename] * len(chunks),
+                                         *zip(*chunks))
+            yield from self.__batched(parsed_chunks, batch_size)
+
+    def build_episodes(self, rows: List[EpisodeRow]) -> List[Episode]:
+        """ Turns a batch of rows from iter_episode_batches into Episodes linked to their podcasts. """
+        new_episodes = []
+        for episode_id, podcast_id, title, audio, audio_length, description, pub_date in rows:
+            podcast = self.get_podcast_by_id(podcast_id)
+            new_episode = self.__new_episode(episode_id, podcast, title, audio, description, audio_length, pub_date)
+            self.__link_episode(podcast, new_episode)
+            new_episodes.append(new_episode)
+        self.__dataset_of_episodes.extend(new_episodes)
+        return new_episodes
+
+    def __new_episode(self, episode_id: int, podcast: Podcast, title: str, audio: str, description: str,
+                      audio_length: int, pub_date: str) -> Episode:
+        # Lengths repeat, publication dates are nearly all unique
+        audio_length = self.__intern(audio_length)
+        if self.__episode_store is not None:
+            new_view = episode_view_from_row if self.__trusted else add_episode_view
+            return new_view(self.__episode_store, episode_id, podcast, title, audio, description, audio_length,
+                            pub_date)
+        return self.__episode(episode_id, podcast, title, audio, description, audio_length, pub_date)
+
+    def __link_episode(self, podcast: Podcast, episode: Episode):
+        if podcast is None:
+            return
+        if self.__trusted:
+            podcast.episodes.append(episode)
+        else:
+            podcast.add_episode(episode)
+
+    @staticmethod
+    def __batched(parsed_chunks, batch_size: int):
+        for rows in parsed_chunks:
+            for start in range(0, len(rows), batch_size):
+                yield rows[start:start + batch_size]
 
     def add_or_get_author(self, author_name) -> Author:
         if not author_name:
             author_name = "Unknown"
         if author_name not in self.__dataset_of_authors:
             author_id = len(self.__dataset_of_authors) + 1
-            author = Author(author_id, author_name)
+            author = self.__author(author_id, author_name)
             self.__dataset_of_authors[author_name] = author
         else:
             author = self.__dataset_of_authors[author_name]
@@ -80,15 +237,20 @@ class CSVDataReader:
 
     def add_or_get_category(self, category_name: str) -> Category:
         if category_name not in self.__dataset_of_categories:
+            validate_non_empty_string(category_name, "Category name")
             category_id = len(self.__dataset_of_categories) + 1
-            category = Category(category_id, category_name)
+            category = self.__category(category_id, category_name)
             self.__dataset_of_categories[category_name] = category
         else:
             category = self.__dataset_of_categories[category_name]
         return category
 
     def get_podcast_by_id(self, podcast_id: int) -> Podcast:
-        return self.__dataset_of_podcasts[podcast_id - 1] if podcast_id < len(self.__dataset_of_podcasts) else None
+        return self.__podcasts_by_id.get(podcast_id)
+
+    @property
+    def intern_table(self) -> InternTable:
+        return self.__intern
 
     @property
     def dataset_of_podcasts(self):
@@ -0,0 +1,177 @@
+import bisect
+import mmap
+import os
+import tempfile
+from array import array
+from collections import Counter
+from typing import Callable, Dict, Optional
+
+from podcast.adapters.search_index import tokenize
+from podcast.domainmodel.model import Episode, Podcast, compact_variant, parse_timestamp, validate_non_empty_string, \
+    validate_non_negative_int
+
+TITLE, URL, DESCRIPTION = range(3)
+
+
+class EpisodeStore:
+    """ Episode titles, urls and descriptions kept in a file instead of in memory. Texts are appended at ingest,
+    once the store is sealed the file is memory-mapped and read on demand. Sealing also writes the full text index
+    of the episodes to the file, see StoredSearchIndex. Only offsets into the file stay in memory. Without a path
+    the file is an anonymous temporary file.
+    """
+
+    def __init__(self, path=None):
+        self.__file = open(path, 'w+b') if path is not None else tempfile.TemporaryFile()
+        self.__offsets = array('q', [0])  # text n is data[offsets[n]:offsets[n + 1]]
+        self.__episode_ids = array('q')  # episode id of each slot
+        self.__data: Optional[mmap.mmap] = None
+        self.search_index: Optional[StoredSearchIndex] = None
+
+    def __len__(self) -> int:
+        return (len(self.__offsets) - 1) // 3
+
+    def append(self, episode_id: int, title: str, url: str, description: str) -> int:
+        """ Stores the texts of an episode and returns its slot in the store. """
+        if self.__data is not None:
+            raise ValueError("The episode store is sealed.")
+        end = self.__offsets[-1]
+        for text in (title, url, description):
+            encoded = text.encode('utf-8')
+            self.__file.write(encoded)
+            end += len(encoded)
+            self.__offsets.append(end)
+        self.__episode_ids.append(episode_id)
+        return len(self) - 1
+
+    def seal(self):
+        """ Ends the ingest, indexes the episodes and maps the file, texts can no longer be appended. """
+        if self.__data is not None:
+            return
+        self.search_index = self.__write_search_index()
+        self.__file.flush()
+        if self.__file.tell() > 0:
+            self.__data = mmap.mmap(self.__file.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            # An empty file cannot be mapped
+            self.__data = b''
+
+    def __write_search_index(self) -> 'StoredSearchIndex':
+        # The postings are gathered in memory only while sealing. The titles and descriptions are indexed like
+        # the episodes_fts table of the database, an episode id that is stored twice is indexed once.
+        postings: Dict[str, array] = dict()  # token -> episode id, term frequency, episode id, ...
+        document_lengths: Dict[int, int] = dict()
+        for slot, episode_id in enumerate(self.__episode_ids):
+            if episode_id in document_lengths:
+                continue
+            tokens = tokenize(self.text(slot, TITLE)) + tokenize(self.text(slot, DESCRIPTION))
+            for token, frequency in Counter(tokens).items():
+                postings.setdefault(token, array('q')).extend((episode_id, frequency))
+            document_lengths[episode_id] = len(tokens)
+
+        self.__file.seek(0, os.SEEK_END)
+        tokens = sorted(postings)
+        posting_offsets = array('q', [self.__file.tell()])
+        for token in tokens:
+            self.__file.write(postings[token].tobytes())
+            posting_offsets.append(self.__file.tell())
+        token_offsets = array('q', [self.__file.tell()])
+        for token in tokens:
+            self.__file.write(token.encode('utf-8'))
+            token_offsets.append(self.__file.tell())
+        document_ids = array('q', sorted(document_lengths))
+        return StoredSearchIndex(self.__read, token_offsets, posting_offsets, document_ids,
+                                 array('q', (document_lengths[episode_id] for episode_id in document_ids)))
+
+    def __read(self, start: int, end: int) -> bytes:
+        if self.__data is None:
+            # Read back during the ingest
+            self.__file.flush()
+            return os.pread(self.__file.fileno(), end - start, start)
+        return self.__data[start:end]
+
+    def text(self, slot: int, field: int) -> str:
+        index = slot * 3 + field
+        return self.__read(self.__offsets[index], self.__offsets[index + 1]).decode('utf-8')
+
+    def close(self):
+        if isinstance(self.__data, mmap.mmap):
+            self.__data.close()
+        self.__file.close()
+
+
+class StoredSearchIndex:
+    """ The full text index of the episodes of an EpisodeStore, written to its file when it is sealed. Tokens are
+    stored in sorted order and found by binary search, with the postings of each token next to each other. Only
+    their offsets and the length of each episode, sixteen bytes per episode, stay in memory. It can be searched
+    along with an InvertedIndex through search_indexes.
+    """
+
+    def __init__(self, read: Callable[[int, int], bytes], token_offsets: array, posting_offsets: array,
+                 document_ids: array, document_lengths: array):
+        self.__read = read
+        self.__token_offsets = token_offsets
+        self.__posting_offsets = posting_offsets
+        self.__document_ids = document_ids  # sorted
+        self.__document_lengths = document_lengths
+        self.__total_length = sum(document_lengths)
+
+    def __len__(self) -> int:
+        return len(self.__document_ids)
+
+    @property
+    def total_length(self) -> int:
+        return self.__total_length
+
+    def __token(self, number: int) -> str:
+        return self.__read(self.__token_offsets[number], self.__token_offsets[number + 1]).decode('utf-8')
+
+    def postings(self, token: str) -> Dict[int, int]:
+        number_of_tokens = len(self.__token_offsets) - 1
+        number = bisect.bisect_left(range(number_of_tokens), token, key=self.__token)
+        if number == number_of_tokens or self.__token(number) != token:
+            return dict()
+        postings = array('q', self.__read(self.__posting_offsets[number], self.__posting_offsets[number + 1]))
+        return dict(zip(postings[0::2], postings[1::2]))
+
+    def document_length(self, episode_id: int) -> Optional[int]:
+        number = bisect.bisect_left(self.__document_ids, episode_id)
+        if number == len(self.__document_ids) or self.__document_ids[number] != episode_id:
+            return None
+        return self.__document_lengths[number]
+
+
+def _stored_text(field: int) -> property:
+    return property(lambda episode: episode._store.text(episode._slot, field))
+
+
+def _init_episode_view(self, store: EpisodeStore, slot: int, episode_id: int, podcast: Podcast, length: int,
+                       date: str):
+    self._store = store
+    self._slot = slot
+    self._id = episode_id
+    self._podcast = podcast
+    self._length = length
+    self._date = date
+    self._timestamp = parse_timestamp(date)
+
+
+# A read only Episode whose texts are read from an EpisodeStore whenever they are shown
+EpisodeView = compact_variant(Episode, '_store', '_slot', '_id', '_podcast', '_length', '_date', '_timestamp',
+                              name='EpisodeView', __module__=__name__, __init__=_init_episode_view,
+                              title=_stored_text(TITLE), url=_stored_text(URL),
+                              description=_stored_text(DESCRIPTION))
+
+
+def add_episode_view(store: EpisodeStore, episode_id: int, podcast: Podcast, title: str, url: str,
+                     description: str, length: int, date: str) -> Episode:
+    """ Moves the texts of an episode into store and returns a view of it, validated like a new Episode. """
+    validate_non_negative_int(episode_id)
+    validate_non_negative_int(length)
+    validate_non_empty_string(title, "Episode title")
+    return episode_view_from_row(store, episode_id, podcast, title.strip(), url, description, length, date)
+
+
+def episode_view_from_row(store: EpisodeStore, episode_id: int, podcast: Podcast, title: str, url: str,
+                          description: str, length: int, date: str) -> Episode:
+    """ Like add_episode_view, for values already checked against the schema, nothing is validated. """
+    return EpisodeView(store, store.append(episode_id, title, url, description), episode_id, podcast, length, date)
@@ -0,0 +1,40 @@
+import sys
+from typing import Dict, Hashable, TypeVar
+
+Value = TypeVar('Value', bound=Hashable)
+
+
+class InternTable:
+    """ Hands out one shared object per distinct value, so a catalogue holds a value that repeats across rows,
+    such as a language or an episode length, only once. Unlike sys.intern it works for any
+    hashable value, and the table is dropped along with the reader that filled it.
+    """
+
+    def __init__(self):
+        self.__values: Dict[Hashable, Hashable] = dict()
+        self.__repeats = 0
+        self.__saved_bytes = 0
+
+    def __call__(self, value: Value) -> Value:
+        shared = self.__values.setdefault(value, value)
+        if shared is not value:
+            self.__repeats += 1
+            self.__saved_bytes += sys.getsizeof(value)
+        return shared
+
+    def clear(self):
+        """ Lets go of the values once the ingest is over, the counts are kept. """
+        self.__values.clear()
+
+    def __len__(self) -> int:
+        return len(self.__values)
+
+    @property
+    def repeats(self) -> int:
+        """ How many values were replaced by a shared one. """
+        return self.__repeats
+
+    @property
+    def saved_bytes(self) -> int:
+        """ The size of the replaced values, which the catalogue no longer holds. """
+        return self.__saved_bytes
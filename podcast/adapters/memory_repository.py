@@ -1,46 +1,146 @@
 import bisect
-from typing import List
+import heapq
+from typing import Iterable, List, Optional, Tuple
 
-from podcast.adapters.repository import AbstractRepository
-from podcast.domainmodel.model import Author, Podcast, Episode, Category, User, Review, Playlist
+from podcast.adapters import snapshot
+from podcast.adapters.episode_store import EpisodeStore, EpisodeView
+from podcast.adapters.repository import AbstractRepository, Page, PodcastDetail, clamp_page
+from podcast.adapters.search_index import InvertedIndex, search_indexes
+from podcast.domainmodel.model import Author, Podcast, Episode, Category, User, Review, Playlist, validate_rating
+
+
+def podcast_sort_key(podcast: Podcast):
+    # Same order as SqlAlchemyRepository's ORDER BY lower(title), podcast_id
+    return podcast.title.lower(), podcast.id
 
 
 class MemoryRepository(AbstractRepository):
-    def __init__(self):
+    def __init__(self, case_insensitive_usernames: bool = False):
+        super().__init__()
         self.__podcasts = list()
         self.__episodes = list()
+        self.__episodes_by_id = dict()
         self.__authors = dict()
         self.__categories = dict()
         self.__podcasts_by_id = dict()
+        self.__podcast_ids_by_category = dict()
         self.__users = list()
+        self.__users_by_name = dict()
+        self.__case_insensitive_usernames = case_insensitive_usernames
         self.__reviews = list()
+        # Full text indexes, built on the first search and kept up to date afterwards. Episodes kept in an
+        # EpisodeStore are searched through the index the store wrote when it was sealed, the episode index only
+        # holds the others.
+        self.__podcast_search_index = None
+        self.__episode_search_index = None
+        self.__episode_store_indexes = None
 
     def add_podcast(self, podcast: Podcast):
-        if podcast not in self.__podcasts:
+        if podcast.id not in self.__podcasts_by_id:
             self.__podcasts_by_id[podcast.id] = podcast
-            bisect.insort(self.__podcasts, podcast, key=lambda p: p.title.lower())
+            bisect.insort(self.__podcasts, podcast, key=podcast_sort_key)
+            # Keep the category -> podcast ids index in the same (title) order as self.__podcasts
+            for category in podcast.categories:
+                podcast_ids = self.__podcast_ids_by_category.setdefault(category.name, [])
+                bisect.insort(podcast_ids, podcast.id, key=self.__podcast_id_sort_key)
+            if self.__podcast_search_index is not None:
+                self.__podcast_search_index.add(podcast.id, podcast.title, podcast.description)
+            self._data_changed('catalogue')
+
+    def write_snapshot(self, path, fingerprint: bytes):
+        catalogue = snapshot.Catalogue(list(self.__authors.values()),
+                                       sorted(self.__podcasts_by_id.values(), key=lambda p: p.id),
+                                       list(self.__categories.values()), list(self.__episodes))
+        snapshot.write_snapshot(path, fingerprint, catalogue)
+
+    def load_snapshot(self, path, fingerprint: bytes, episode_store: EpisodeStore = None) -> bool:
+        catalogue = snapshot.read_snapshot(path, fingerprint, compact=True, episode_store=episode_store)
+        if catalogue is None:
+            return False
+        self.bulk_load(catalogue.authors, catalogue.podcasts, catalogue.categories, catalogue.episodes)
+        return True
+
+    def bulk_load(self, authors: Iterable[Author], podcasts: Iterable[Podcast], categories: Iterable[Category],
+                  episodes: Iterable[Episode]):
+        """ Adds a whole catalogue in linear time plus one sort. Entities are deduplicated by id, and the
+        podcasts end up in the order add_podcast would have given them.
+        """
+        for author in authors:
+            self.__authors[author.name] = author
+        for category in categories:
+            self.__categories[category.name] = category
+
+        new_podcasts = []
+        for podcast in podcasts:
+            if podcast.id not in self.__podcasts_by_id:
+                self.__podcasts_by_id[podcast.id] = podcast
+                new_podcasts.append(podcast)
+        # Sorting is stable, so podcasts with the same key keep the order add_podcast's insort gives them
+        self.__podcasts = sorted(self.__podcasts + new_podcasts, key=podcast_sort_key)
+        self.__podcast_ids_by_category = dict()
+        for podcast in self.__podcasts:
+            for category in podcast.categories:
+                self.__podcast_ids_by_category.setdefault(category.name, []).append(podcast.id)
+
+        for episode in episodes:
+            if episode.id not in self.__episodes_by_id:
+                self.__episodes_by_id[episode.id] = episode
+                self.__episodes.append(episode)
+
+        # The search indexes are rebuilt on the next search
+        self.__podcast_search_index = None
+        self.__episode_search_index = None
+        self._data_changed('categories', 'catalogue')
 
     def get_podcast(self, podcast_id: int) -> Podcast:
-        return self.__podcasts_by_id.get(podcast_id) if podcast_id <= len(self.__podcasts) else None
+        return self.__podcasts_by_id.get(podcast_id)
+
+    def get_podcast_ids(self) -> List[int]:
+        return list(self.__podcasts_by_id)
 
     def get_podcasts_by_id(self, id_list: list) -> List[Podcast]:
-        podcasts = [self.get_podcast(podcast_id) for podcast_id in id_list]
-        return sorted(podcasts, key=lambda p: p.title.lower())
+        podcasts = (self.__podcasts_by_id.get(podcast_id) for podcast_id in id_list)
+        return sorted((podcast for podcast in podcasts if podcast is not None), key=podcast_sort_key)
 
     def get_podcasts_by_page(self, page_number: int, page_size: int) -> List[Podcast]:
         start_index = (page_number - 1) * page_size
         end_index = start_index + page_size
         return self.__podcasts[start_index:end_index]
 
+    def get_podcasts_after(self, after_podcast_id: int, page_size: int) -> List[Podcast]:
+        if after_podcast_id is None:
+            return self.__podcasts[:page_size]
+        after_podcast = self.__podcasts_by_id.get(after_podcast_id)
+        if after_podcast is None:
+            return []
+        start_index = bisect.bisect_right(self.__podcasts, podcast_sort_key(after_podcast), key=podcast_sort_key)
+        return self.__podcasts[start_index:start_index + page_size]
+
+    def get_page(self, page_number: int, page_size: int) -> Page:
+        return Page(self.get_podcasts_by_page(page_number, page_size), page_number, page_size, len(self.__podcasts))
+
+    def get_podcast_detail(self, podcast_id: int, episode_page: int, username: str = None,
+                           page_size: int = 10) -> Optional[PodcastDetail]:
+        podcast = self.__podcasts_by_id.get(podcast_id)
+        if podcast is None:
+            return None
+        # podcast.episodes is kept in publication order by Podcast.add_episode
+        episode_page = clamp_page(episode_page, len(podcast.episodes), page_size)
+        start_index = (episode_page - 1) * page_size
+        episodes = podcast.episodes[start_index:start_index + page_size]
+        user = self.get_user(username)
+        playlist = user.playlist if user is not None else None
+        episodes_in_playlist = {episode.id for episode in episodes if playlist and episode in playlist.episodes}
+        return PodcastDetail(podcast, episodes, episode_page, page_size, len(podcast.episodes), episodes_in_playlist)
+
     def get_number_of_podcasts(self) -> int:
         return len(self.__podcasts)
 
     def get_podcasts_ids_for_category(self, category_name: str) -> List[int]:
-        matching_podcast_ids = []
-        for podcast in self.__podcasts:
-            if any(category.name == category_name for category in podcast.categories):
-                matching_podcast_ids.append(podcast.id)
-        return matching_podcast_ids
+        return list(self.__podcast_ids_by_category.get(category_name, []))
+
+    def __podcast_id_sort_key(self, podcast_id: int):
+        return podcast_sort_key(self.__podcasts_by_id[podcast_id])
 
     def has_next_page(self, current_page: int, page_size: int) -> bool:
         total_podcasts = self.get_number_of_podcasts()
@@ -65,56 +165,96 @@ class MemoryRepository(AbstractRepository):
         return sorted_categories
 
     def add_episode(self, episode: Episode):
-        if episode not in self.__episodes:
+        if episode.id not in self.__episodes_by_id:
             self.__episodes.append(episode)
+            self.__episodes_by_id[episode.id] = episode
+            if self.__episode_search_index is not None:
+                self.__index_episode(episode)
+            self._data_changed('catalogue')
 
     def get_number_of_episodes(self) -> int:
         return len(self.__episodes)
 
     def get_episode(self, episode_id: int) -> Episode:
-        return self.__episodes[episode_id - 1] if episode_id <= len(self.__episodes) else None
+        return self.__episodes_by_id.get(episode_id)
 
     def add_author(self, author: Author):
         self.__authors[author.name] = author
+        self._data_changed('catalogue')
 
     def add_category(self, category: Category):
         self.__categories[category.name] = category
+        self._data_changed('categories', 'catalogue')
 
     def add_user(self, username: str, password: str):
         new_user = User((len(self.__users) + 1), username, password)
         self.__users.append(new_user)
+        # The first user registered under a name keeps it
+        self.__users_by_name.setdefault(self.__username_key(new_user.username), new_user)
 
     def get_user(self, username) -> User:
-        return next((user for user in self.__users if user.username == username), None)
-
-    def get_podcasts_by_category(self, category_query: str):
-        podcasts = []
-        for podcast in self.__podcasts:
-            for category in podcast.categories:
-                if category_query.lower() in category.name.lower():
-                    podcasts.append(podcast)
-        return podcasts
-
-    def get_podcasts_by_title(self, title: str):
-        podcasts = []
-        for podcast in self.__podcasts:
-            if title.lower() in podcast.title.lower():
-                podcasts.append(podcast)
-        return podcasts
-
-    def get_podcasts_by_author(self, author: str) -> list:
-        podcasts = []
-        for podcast in self.__podcasts:
-            if author.lower() in podcast.author.name.lower():
-                podcasts.append(podcast)
-        return podcasts
-
-    def get_podcasts_by_language(self, language: str) -> list:
-        podcasts = []
-        for podcast in self.__podcasts:
-            if language.lower() in podcast.language.lower():
-                podcasts.append(podcast)
-        return podcasts
+        if username is None:
+            return None
+        return self.__users_by_name.get(self.__username_key(username))
+
+    def __username_key(self, username: str) -> str:
+        return username.casefold() if self.__case_insensitive_usernames else username
+
+    def get_podcasts_by_category(self, category_query: str, offset: int = 0,
+                                 limit: int = None) -> Tuple[List[Podcast], int]:
+        # Only the category names are scanned, the matching podcast id lists are merged in title order
+        matching_id_lists = [podcast_ids for category_name, podcast_ids in self.__podcast_ids_by_category.items()
+                             if category_query.lower() in category_name.lower()]
+        podcast_ids = list(dict.fromkeys(heapq.merge(*matching_id_lists, key=self.__podcast_id_sort_key)))
+        page = self.__slice(podcast_ids, offset, limit)
+        return [self.__podcasts_by_id[podcast_id] for podcast_id in page], len(podcast_ids)
+
+    def get_podcasts_by_title(self, title: str, offset: int = 0, limit: int = None) -> Tuple[List[Podcast], int]:
+        title = title.lower()
+        return self.__podcasts_matching(lambda podcast: title in podcast.title.lower(), offset, limit)
+
+    def get_podcasts_by_author(self, author: str, offset: int = 0, limit: int = None) -> Tuple[List[Podcast], int]:
+        author = author.lower()
+        return self.__podcasts_matching(lambda podcast: author in podcast.author.name.lower(), offset, limit)
+
+    def get_podcasts_by_language(self, language: str, offset: int = 0,
+                                 limit: int = None) -> Tuple[List[Podcast], int]:
+        language = language.lower()
+        return self.__podcasts_matching(lambda podcast: language in podcast.language.lower(), offset, limit)
+
+    def __podcasts_matching(self, condition, offset: int, limit: int) -> Tuple[List[Podcast], int]:
+        matches = [podcast for podcast in self.__podcasts if condition(podcast)]
+        return self.__slice(matches, offset, limit), len(matches)
+
+    @staticmethod
+    def __slice(items: list, offset: int, limit: int) -> list:
+        return items[offset:] if limit is None else items[offset:offset + limit]
+
+    def search_podcasts(self, query: str, offset: int = 0, limit: int = None) -> Tuple[List[Podcast], int]:
+        if self.__podcast_search_index is None:
+            self.__podcast_search_index = InvertedIndex()
+            for podcast in self.__podcasts:
+                self.__podcast_search_index.add(podcast.id, podcast.title, podcast.description)
+        podcast_ids, total = self.__podcast_search_index.search(query, offset, limit)
+        return [self.__podcasts_by_id[podcast_id] for podcast_id in podcast_ids], total
+
+    def search_episodes(self, query: str, offset: int = 0, limit: int = None) -> Tuple[List[Episode], int]:
+        if self.__episode_search_index is None:
+            self.__episode_search_index = InvertedIndex()
+            self.__episode_store_indexes = []
+            for episode in self.__episodes:
+                self.__index_episode(episode)
+        indexes = [self.__episode_search_index, *self.__episode_store_indexes]
+        episode_ids, total = search_indexes(indexes, query, offset, limit)
+        return [self.__episodes_by_id[episode_id] for episode_id in episode_ids], total
+
+    def __index_episode(self, episode: Episode):
+        # Reads no text for a view of a sealed store, the store has already indexed it
+        if type(episode) is EpisodeView and episode._store.search_index is not None:
+            if not any(index is episode._store.search_index for index in self.__episode_store_indexes):
+                self.__episode_store_indexes.append(episode._store.search_index)
+        else:
+            self.__episode_search_index.add(episode.id, episode.title, episode.description)
 
     def add_to_playlist(self, username: str, episode: Episode):
         user = self.get_user(username)
@@ -132,6 +272,28 @@ class MemoryRepository(AbstractRepository):
             raise ValueError("Playlist does not exist!")
         user.playlist.delete_episode(episode)
 
+    def add_episodes_to_playlist(self, username: str, episode_ids: Iterable[int]) -> int:
+        playlist = self.get_users_playlist(username)
+        number_of_episodes = len(playlist.episodes)
+        for episode_id in episode_ids:
+            episode = self.__episodes_by_id.get(episode_id)
+            if episode is not None:
+                playlist.add_episode(episode)
+        return len(playlist.episodes) - number_of_episodes
+
+    def add_podcast_to_playlist(self, username: str, podcast_id: int) -> int:
+        podcast = self.__podcasts_by_id.get(podcast_id)
+        if podcast is None:
+            raise ValueError(f"Podcast {podcast_id} is not found!")
+        return self.add_episodes_to_playlist(username, (episode.id for episode in podcast.episodes))
+
+    def clear_playlist(self, username: str):
+        user = self.get_user(username)
+        if not user:
+            raise ValueError(f"User {username} is not found!")
+        if user.playlist is not None:
+            user.playlist.clear()
+
     def get_users_playlist(self, username: str):
         user = self.get_user(username)
         if not user:
@@ -146,6 +308,7 @@ class MemoryRepository(AbstractRepository):
         return playlist.episodes
 
     def add_review(self, podcast: Podcast, user: User, rating: int, description: str):
+        validate_rating(rating)
         for review in user.reviews:
             if review.podcast.id == podcast.id:
                 raise ValueError(f'You already reviewed this podcast. Please try another one!')
@@ -153,6 +316,16 @@ class MemoryRepository(AbstractRepository):
         self.__reviews.append(new_review)
         user.add_review(new_review)
         podcast.add_review(new_review)
+        self._data_changed('catalogue')
+
+    def get_podcast_reviews(self, podcast_id: int, offset: int = 0,
+                            limit: int = None) -> Tuple[List[Review], int]:
+        podcast = self.__podcasts_by_id.get(podcast_id)
+        if podcast is None:
+            return [], 0
+        # podcast.reviews is kept in rating order by Podcast.add_review
+        end = None if limit is None else offset + limit
+        return podcast.reviews[offset:end], len(podcast.reviews)
 
     def get_users_reviews(self, username: str):
         user = self.get_user(username)
@@ -166,3 +339,4 @@ class MemoryRepository(AbstractRepository):
                 review.reviewer.remove_review(review)
                 review.podcast.remove_review(review)
                 self.__reviews.remove(review)
+                self._data_changed('catalogue')
@@ -1,9 +1,38 @@
+from functools import partial
+
 from sqlalchemy import (
-    Table, Column, Integer, String, ForeignKey, Text
+    Table, Column, Integer, String, ForeignKey, Text, Index, func, DDL, event, inspect, text, type_coerce
 )
-from sqlalchemy.orm import registry, relationship
+from sqlalchemy.orm import column_property, composite, registry, relationship
+from sqlalchemy.types import TypeDecorator
+
+from podcast.domainmodel.model import (Podcast, Author, Category, User, Review, Episode, Playlist, RatingSummary,
+                                       IndexedCollection, episode_timeline_key, format_timestamp, parse_timestamp,
+                                       review_rating_key)
+
+class PublicationDate(TypeDecorator):
+    """ Stores the 'YYYY-MM-DD HH:MM:SS' date strings of the domain model as epoch seconds, so they sort and
+    compare as numbers. Strings that are not ISO dates are stored unchanged and sort after every real date.
+    """
+    impl = Integer
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        timestamp = parse_timestamp(value)
+        return value if timestamp is None else timestamp
+
+    def process_result_value(self, value, dialect):
+        return format_timestamp(value) if isinstance(value, int) else value
+
+
+class EpochSeconds(TypeDecorator):
+    """ Reads a PublicationDate column as the epoch seconds it holds, None for a date that is not an ISO date. """
+    impl = Integer
+    cache_ok = True
+
+    def process_result_value(self, value, dialect):
+        return value if isinstance(value, int) else None
 
-from podcast.domainmodel.model import Podcast, Author, Category, User, Review, Episode, Playlist
 
 # Global variable giving access to the MetaData (schema) information of the database
 mapper_registry = registry()
@@ -23,9 +52,14 @@ podcast_table = Table(
     Column('language', String(255), nullable=True),
     Column('website_url', String(255), nullable=True),
     Column('author_id', ForeignKey('authors.author_id')),
-    Column('itunes_id', Integer, nullable=True)
+    Column('itunes_id', Integer, nullable=True),
+    # Number of reviews per rating, kept up to date by the repository whenever a review is added or deleted
+    *(Column(f'ratings_{rating}', Integer, nullable=False, default=0, server_default='0') for rating in range(1, 6))
 )
 
+# Podcasts are listed in (lower case title, id) order, this index serves both offset and keyset pages
+Index('ix_podcasts_title_key', func.lower(podcast_table.c.title), podcast_table.c.podcast_id)
+
 # Episodes should have links to its podcast through its foreign keys
 episode_table = Table(
     'episodes', mapper_registry.metadata,
@@ -34,9 +68,12 @@ episode_table = Table(
     Column('title', Text, nullable=True),
     Column('audio_url', Text, nullable=True),
     Column('description', String(255), nullable=True),
-    Column('pub_date', Text, nullable=True)
+    Column('pub_date', PublicationDate, nullable=True)
 )
 
+# A podcast's episodes are read as a timeline, this index serves them in order and pages them
+Index('ix_episodes_podcast_pub_date', episode_table.c.podcast_id, episode_table.c.pub_date)
+
 categories_table = Table(
     'categories', mapper_registry.metadata,
     Column('category_id', Integer, primary_key=True, autoincrement=True),
@@ -47,8 +84,8 @@ categories_table = Table(
 podcasts_categories_table = Table(
     'podcast_categories', mapper_registry.metadata,
     Column('id', Integer, primary_key=True, autoincrement=True),
-    Column('podcast_id', ForeignKey('podcasts.podcast_id')),
-    Column('category_id', ForeignKey('categories.category_id'))
+    Column('podcast_id', ForeignKey('podcasts.podcast_id'), index=True),
+    Column('category_id', ForeignKey('categories.category_id'), index=True)
     # Do we need to show podcast name and category name as well??
 )
 
@@ -63,6 +100,8 @@ reviews_table = Table(
     Column('comment', String(225), nullable=True),
 )
 
+Index('ix_reviews_podcast_rating', reviews_table.c.podcast_id, reviews_table.c.rating.desc(), reviews_table.c.review_id)
+
 users_table = Table(
     'users', mapper_registry.metadata,
     Column('user_id', Integer, primary_key=True, autoincrement=True),
@@ -85,6 +124,109 @@ playlists_episodes_table = Table(
     Column('episode_id', ForeignKey('episodes.episode_id')),
 )
 
+# How often each kind of data has changed, shared by every process serving the database, see
+# SqlAlchemyRepository.get_version
+data_versions_table = Table(
+    'data_versions', mapper_registry.metadata,
+    Column('kind', String(32), primary_key=True),
+    Column('version', Integer, nullable=False),
+)
+
+
+def full_text_search_ddl(fts_name: str, table: Table, id_column: str):
+    """ Returns the statements creating the FTS5 index fts_name over the title and description of table, and
+    the triggers keeping it in sync. It is an external content index, the text is only stored in table.
+    """
+    table_name = table.name
+    insert = f"INSERT INTO {fts_name}(rowid, title, description) " \
+             f"VALUES (new.{id_column}, new.title, new.description);"
+    delete = f"INSERT INTO {fts_name}({fts_name}, rowid, title, description) " \
+             f"VALUES ('delete', old.{id_column}, old.title, old.description);"
+    return [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts_name} USING fts5("
+        f"title, description, content='{table_name}', content_rowid='{id_column}')",
+        f"CREATE TRIGGER IF NOT EXISTS {fts_name}_insert AFTER INSERT ON {table_name} BEGIN {insert} END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts_name}_delete AFTER DELETE ON {table_name} BEGIN {delete} END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts_name}_update AFTER UPDATE ON {table_name} BEGIN {delete} {insert} END",
+    ]
+
+
+def rating_counts_ddl():
+    """ Returns the statements adding the rating count columns to a podcasts table created without them,
+    counted from the reviews it already holds.
+    """
+    statements = []
+    for rating in range(1, 6):
+        statements.append(f"ALTER TABLE podcasts ADD COLUMN ratings_{rating} INTEGER NOT NULL DEFAULT 0")
+        statements.append(f"UPDATE podcasts SET ratings_{rating} = (SELECT count(*) FROM reviews "
+                          f"WHERE reviews.podcast_id = podcasts.podcast_id AND reviews.rating = {rating})")
+    return statements
+
+
+def episode_dates_ddl():
+    """ Returns the statements converting the publication dates of an episodes table created with text dates to
+    epoch seconds. SQLite cannot change the type of a column, so the rows are copied into a new table which then
+    replaces the old one. Dates SQLite cannot read keep their text, as PublicationDate would store them.
+    """
+    return [
+        "CREATE TABLE episodes_new (episode_id INTEGER NOT NULL, podcast_id INTEGER, title TEXT, audio_url TEXT, "
+        "description VARCHAR(255), pub_date INTEGER, PRIMARY KEY (episode_id), "
+        "FOREIGN KEY(podcast_id) REFERENCES podcasts (podcast_id))",
+        "INSERT INTO episodes_new (episode_id, podcast_id, title, audio_url, description, pub_date) "
+        "SELECT episode_id, podcast_id, title, audio_url, description, "
+        "coalesce(CAST(strftime('%s', pub_date) AS INTEGER), pub_date) FROM episodes",
+        "DROP TABLE episodes",
+        "ALTER TABLE episodes_new RENAME TO episodes",
+    ]
+
+
+def upgrade_schema(engine):
+    """ Brings a database created by an earlier version of the application up to the current schema: converts
+    text episode dates to epoch seconds and adds the full text indexes, the rating counts, the data versions and any
+    missing index.
+    """
+    inspector = inspect(engine)
+    table_names = inspector.get_table_names()
+    episode_columns = {column['name']: column for column in inspector.get_columns('episodes')}
+    dates_as_text = not isinstance(episode_columns['pub_date']['type'], Integer)
+    if dates_as_text:
+        # Databases created before dates were stored as epoch seconds have their episodes table rebuilt.
+        with engine.begin() as conn:
+            for statement in episode_dates_ddl():
+                conn.execute(text(statement))
+    missing_full_text_indexes = [fts_name for fts_name, _, _ in FULL_TEXT_INDEXES if fts_name not in table_names]
+    if dates_as_text or missing_full_text_indexes:
+        # Databases created before the full text indexes existed gain them. A rebuilt episodes table gets its
+        # full text triggers back, its index still holds the same rows.
+        mapper_registry.metadata.create_all(engine)
+        with engine.begin() as conn:
+            for fts_name in missing_full_text_indexes:
+                # A new index starts out empty, it indexes the rows the table already holds
+                conn.execute(text(f"INSERT INTO {fts_name}({fts_name}) VALUES ('rebuild')"))
+    if 'ratings_1' not in {column['name'] for column in inspector.get_columns('podcasts')}:
+        # Databases created before the rating counts existed gain them, counted from their reviews.
+        with engine.begin() as conn:
+            for statement in rating_counts_ddl():
+                conn.execute(text(statement))
+    # Databases created before the data versions were shared between processes gain them
+    data_versions_table.create(engine, checkfirst=True)
+    # Read from sqlite_master, reflection skips expression indexes such as ix_podcasts_title_key
+    with engine.begin() as conn:
+        index_names = set(conn.scalars(text("SELECT name FROM sqlite_master WHERE type = 'index'")))
+        for table in mapper_registry.metadata.sorted_tables:
+            for index in table.indexes:
+                if index.name not in index_names:
+                    index.create(conn)
+
+
+# The full text indexes are SQLite specific, they are created and dropped along with the other tables
+FULL_TEXT_INDEXES = (('podcasts_fts', podcast_table, 'podcast_id'), ('episodes_fts', episode_table, 'episode_id'))
+for fts_name, fts_table, fts_id_column in FULL_TEXT_INDEXES:
+    for statement in full_text_search_ddl(fts_name, fts_table, fts_id_column):
+        event.listen(mapper_registry.metadata, 'after_create', DDL(statement).execute_if(dialect='sqlite'))
+    event.listen(mapper_registry.metadata, 'before_drop',
+                 DDL(f"DROP TABLE IF EXISTS {fts_name}").execute_if(dialect='sqlite'))
+
 
 def map_model_to_tables():
     mapper_registry.map_imperatively(Author, authors_table, properties={
@@ -105,10 +247,15 @@ def map_model_to_tables():
         '_language': podcast_table.c.language,
         '_website': podcast_table.c.website_url,
         '_itunes_id': podcast_table.c.itunes_id,
+        '_rating_summary': composite(RatingSummary, *(podcast_table.c[f'ratings_{rating}'] for rating in range(1, 6))),
         '_author': relationship(Author),
-        'episodes': relationship(Episode, back_populates='_podcast'),
-        'categories': relationship(Category, secondary=podcasts_categories_table),
-        'reviews': relationship(Review, back_populates='_podcast')
+        'episodes': relationship(Episode, back_populates='_podcast',
+                                 order_by=[episode_table.c.pub_date, episode_table.c.episode_id],
+                                 collection_class=partial(IndexedCollection, key=episode_timeline_key)),
+        'categories': relationship(Category, secondary=podcasts_categories_table,
+                                   collection_class=IndexedCollection),
+        'reviews': relationship(Review, back_populates='_podcast',
+                                collection_class=partial(IndexedCollection, key=review_rating_key))
     })
 
     mapper_registry.map_imperatively(Episode, episode_table, properties={
@@ -118,6 +265,8 @@ def map_model_to_tables():
         '_url': episode_table.c.audio_url,
         '_description': episode_table.c.description,
         '_date': episode_table.c.pub_date,
+        # Episode.timestamp straight from the stored epoch seconds, without parsing the date again
+        '_timestamp': column_property(type_coerce(episode_table.c.pub_date, EpochSeconds)),
     })
 
     mapper_registry.map_imperatively(Review, reviews_table, properties={
@@ -133,13 +282,13 @@ def map_model_to_tables():
         '_name': playlists_table.c.name,
         '_owner': relationship(User, back_populates='_playlist', foreign_keys=[playlists_table.c.owner_id],
                                viewonly=True),
-        '_episodes': relationship(Episode, secondary=playlists_episodes_table)
+        '_episodes': relationship(Episode, secondary=playlists_episodes_table, collection_class=IndexedCollection)
     })
 
     mapper_registry.map_imperatively(User, users_table, properties={
         '_id': users_table.c.user_id,
         '_username': users_table.c.user_name,
         '_password': users_table.c.password,
-        '_reviews': relationship(Review, back_populates='_reviewer'),
+        '_reviews': relationship(Review, back_populates='_reviewer', collection_class=IndexedCollection),
         '_playlist': relationship(Playlist, back_populates='_owner', uselist=False)  # one-to-one relationship
     })
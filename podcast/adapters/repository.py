@@ -1,5 +1,6 @@
 import abc
-from typing import List
+from collections import Counter
+from typing import Iterable, List, NamedTuple, Optional, Set, Tuple
 
 from podcast.domainmodel.model import Author, Podcast, Category, Episode, User, Playlist, Review
 
@@ -11,7 +12,79 @@ class RepositoryException(Exception):
         print(f"RepositoryException: {message}")
 
 
+class Page(NamedTuple):
+    """ One page of Podcasts together with the navigation information for it. """
+    podcasts: List[Podcast]
+    page_number: int
+    page_size: int
+    total: int
+
+    @property
+    def has_next(self) -> bool:
+        return self.page_number * self.page_size < self.total
+
+    @property
+    def has_previous(self) -> bool:
+        return self.page_number > 1
+
+    @property
+    def next_page(self) -> int:
+        return self.page_number + 1 if self.has_next else self.page_number
+
+    @property
+    def previous_page(self) -> int:
+        return self.page_number - 1 if self.has_previous else self.page_number
+
+    @property
+    def last_page(self) -> int:
+        return (self.total + self.page_size - 1) // self.page_size
+
+
+class PodcastDetail(NamedTuple):
+    """ Everything the podcast description page shows: the Podcast with its author, categories and reviews
+    loaded, one page of its Episodes in publication order, and which of those are in the user's playlist.
+    """
+    podcast: Podcast
+    episodes: List[Episode]
+    episode_page: int
+    page_size: int
+    total_episodes: int
+    episodes_in_playlist: Set[int]
+
+    @property
+    def total_pages(self) -> int:
+        return (self.total_episodes + self.page_size - 1) // self.page_size
+
+    @property
+    def next_episode_page(self) -> Optional[int]:
+        return self.episode_page + 1 if self.episode_page * self.page_size < self.total_episodes else None
+
+    @property
+    def prev_episode_page(self) -> Optional[int]:
+        return self.episode_page - 1 if self.episode_page > 1 else None
+
+
+def clamp_page(page_number: int, total: int, page_size: int) -> int:
+    """ Returns page_number limited to the pages that hold total items, there is always at least one page. """
+    last_page = max((total + page_size - 1) // page_size, 1)
+    return min(max(page_number, 1), last_page)
+
+
 class AbstractRepository(abc.ABC):
+    def __init__(self):
+        # How often each kind of data has changed, see get_version
+        self.__versions = Counter()
+
+    def get_version(self, kind: str) -> int:
+        """ Returns a counter for one kind of data in the repository: 'categories', or 'catalogue' for anything
+        shown to visitors (podcasts, episodes, authors, categories and reviews). It changes whenever that data is
+        changed through this repository, so values derived from it can be cached until then.
+        """
+        return self.__versions[kind]
+
+    def _data_changed(self, *kinds: str):
+        for kind in kinds:
+            self.__versions[kind] += 1
 
     @abc.abstractmethod
     def add_podcast(self, podcast: Podcast):
@@ -25,6 +98,11 @@ class AbstractRepository(abc.ABC):
         """
         raise NotImplementedError
 
+    @abc.abstractmethod
+    def get_podcast_ids(self) -> List[int]:
+        """ Returns the ids of all Podcasts in the repository, in no particular order. """
+        raise NotImplementedError
+
     @abc.abstractmethod
     def get_podcasts_by_id(self, id_list: list) -> List[Podcast]:
         """ Returns a list of Podcasts, whose ids match those in id_list, from the repository.
@@ -34,10 +112,34 @@ class AbstractRepository(abc.ABC):
 
     @abc.abstractmethod
     def get_podcasts_by_page(self, page: int, page_size: int) -> List[Podcast]:
-        """ Returns a list of Podcasts for the specified page.
+        """ Returns a list of Podcasts for the specified page, ordered by lower case title and then id.
         The list should contain up to page_size podcasts. """
         raise NotImplementedError
 
+    @abc.abstractmethod
+    def get_podcasts_after(self, after_podcast_id: int, page_size: int) -> List[Podcast]:
+        """ Returns up to page_size Podcasts that follow the Podcast with id after_podcast_id, in the same
+        (title, id) order as get_podcasts_by_page. This is keyset pagination, deep pages cost the same as the
+        first one. If after_podcast_id is None, the first page is returned, if it is unknown, an empty list.
+        """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def get_page(self, page_number: int, page_size: int) -> Page:
+        """ Returns the Page page_number of Podcasts, in the order of get_podcasts_by_page, along with the total
+        number of Podcasts, so a page view needs one call instead of one per navigation flag.
+        """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def get_podcast_detail(self, podcast_id: int, episode_page: int, username: str = None,
+                           page_size: int = 10) -> Optional[PodcastDetail]:
+        """ Returns the PodcastDetail of the Podcast with id podcast_id, with episode_page of its Episodes ordered by
+        publication date. episode_page is moved into the range of existing pages, episodes_in_playlist holds
+        the ids of page Episodes in the playlist of username. If there is no such Podcast, returns None.
+        """
+        raise NotImplementedError
+
     @abc.abstractmethod
     def get_number_of_podcasts(self) -> int:
         """ Returns the total number of Podcasts in the repository. """
@@ -104,6 +206,21 @@ class AbstractRepository(abc.ABC):
         """ Adds a Category to the repository. """
         raise NotImplementedError
 
+    def bulk_load(self, authors: Iterable[Author], podcasts: Iterable[Podcast], categories: Iterable[Category],
+                  episodes: Iterable[Episode]):
+        """ Adds a whole catalogue of Authors, Podcasts, Categories and Episodes to the repository.
+        Episodes may be a lazy iterable, it is only consumed once. Repositories can override this
+        with a faster path than adding the entities one by one.
+        """
+        for author in authors:
+            self.add_author(author)
+        for podcast in podcasts:
+            self.add_podcast(podcast)
+        for category in categories:
+            self.add_category(category)
+        for episode in episodes:
+            self.add_episode(episode)
+
     @abc.abstractmethod
     def add_user(self, username: str, password: str):
         """ Adds a User to the repository. """
@@ -117,22 +234,39 @@ class AbstractRepository(abc.ABC):
         raise NotImplementedError
 
     @abc.abstractmethod
-    def get_podcasts_by_category(self, category_query: str) -> list:
-        """ Returns a list of podcasts based on the category inputted """
+    def get_podcasts_by_category(self, category_query: str, offset: int = 0,
+                                 limit: int = None) -> Tuple[List[Podcast], int]:
+        """ Returns the podcasts in a category whose name contains category_query, from offset up to limit of them,
+        and the total number of matches. Like all the searches below, podcasts are ordered by title and then id.
+        """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def get_podcasts_by_title(self, title: str, offset: int = 0, limit: int = None) -> Tuple[List[Podcast], int]:
+        """ Returns a page of podcasts whose title contains title, and the total number of matches. """
         raise NotImplementedError
 
     @abc.abstractmethod
-    def get_podcasts_by_title(self, title: str) -> list:
-        """ Returns a list of podcasts based on the title inputted """
+    def get_podcasts_by_author(self, author: str, offset: int = 0, limit: int = None) -> Tuple[List[Podcast], int]:
+        """ Returns a page of podcasts whose author name contains author, and the total number of matches. """
         raise NotImplementedError
 
     @abc.abstractmethod
-    def get_podcasts_by_author(self, author: str) -> list:
-        """ Returns a list of podcasts based on the author inputted """
+    def get_podcasts_by_language(self, language: str, offset: int = 0,
+                                 limit: int = None) -> Tuple[List[Podcast], int]:
+        """ Returns a page of podcasts whose language contains language, and the total number of matches. """
         raise NotImplementedError
 
-    def get_podcasts_by_language(self, language: str) -> list:
-        """Returns a list of podcast based on the language inputted"""
+    @abc.abstractmethod
+    def search_podcasts(self, query: str, offset: int = 0, limit: int = None) -> Tuple[List[Podcast], int]:
+        """ Full text search over the title and description of Podcasts. Returns the Podcasts containing every
+        word of query, best BM25 match first, from offset up to limit of them, and the total number of matches.
+        """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def search_episodes(self, query: str, offset: int = 0, limit: int = None) -> Tuple[List[Episode], int]:
+        """ Full text search over the title and description of Episodes, like search_podcasts. """
         raise NotImplementedError
 
     @abc.abstractmethod
@@ -145,6 +279,27 @@ class AbstractRepository(abc.ABC):
         """ Removes an Episode from the playlist with the given username. """
         raise NotImplementedError
 
+    @abc.abstractmethod
+    def add_episodes_to_playlist(self, username: str, episode_ids: Iterable[int]) -> int:
+        """ Adds the Episodes with the given ids to the playlist of username in one operation, creating the
+        playlist if the user has none. Unknown ids and Episodes already in the playlist are skipped.
+        Returns the number of Episodes added.
+        """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def add_podcast_to_playlist(self, username: str, podcast_id: int) -> int:
+        """ Adds every Episode of the Podcast with id podcast_id to the playlist of username in one operation,
+        in publication order, like add_episodes_to_playlist but without loading the Episodes. Returns the number
+        of Episodes added, raises ValueError if there is no such Podcast.
+        """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def clear_playlist(self, username: str):
+        """ Removes every Episode from the playlist of username in one operation. """
+        raise NotImplementedError
+
     @abc.abstractmethod
     def get_episodes_in_playlist(self, playlist: Playlist):
         """ Returns all Episodes in the given playlist. """
@@ -161,6 +316,14 @@ class AbstractRepository(abc.ABC):
         Update User and Podcast's reviews list """
         raise NotImplementedError
 
+    @abc.abstractmethod
+    def get_podcast_reviews(self, podcast_id: int, offset: int = 0,
+                            limit: int = None) -> Tuple[List[Review], int]:
+        """ Returns the Reviews of the Podcast with id podcast_id, highest rating first and then by id, from offset
+        up to limit of them, and the total number of its Reviews. Returns no Reviews for an unknown podcast_id.
+        """
+        raise NotImplementedError
+
     @abc.abstractmethod
     def get_users_reviews(self, username: str) -> List[Review]:
         """ Returns user's reviews list with the given username. '"""
@@ -2,30 +2,30 @@ from pathlib import Path
 
 from podcast.adapters.repository import AbstractRepository
 from podcast.adapters.datareader.csvdatareader import CSVDataReader
+from podcast.adapters.episode_store import EpisodeStore
 
 
-def populate_data(repo: AbstractRepository, data_path: Path):
-    reader = CSVDataReader()
+def populate_data(repo: AbstractRepository, data_path: Path, workers: int = None, compact: bool = False,
+                  episode_store: EpisodeStore = None):
+    """ Fills repo from the CSV files in data_path. For a MemoryRepository, pass compact for compact entities
+    and an episode_store to keep the episode texts out of memory.
+    """
+    reader = CSVDataReader(compact, episode_store)
     reader.load_podcasts_authors_categories(data_path)
-    reader.load_episodes(data_path)
 
     podcasts = reader.dataset_of_podcasts
     authors = reader.dataset_of_authors
     categories = reader.dataset_of_categories
-    episodes = reader.dataset_of_episodes
     reviews = reader.dataset_of_reviews
 
-    for author in authors.values():
-        repo.add_author(author)
+    # Episodes are streamed in batches, so the repository is filled while the rest of the file is still parsed
+    def episodes():
+        for batch in reader.iter_episode_batches(data_path, workers):
+            yield from reader.build_episodes(batch)
 
-    for podcast in podcasts:
-        repo.add_podcast(podcast)
-
-    for category in categories.values():
-        repo.add_category(category)
-
-    for episode in episodes:
-        repo.add_episode(episode)
+    repo.bulk_load(authors.values(), podcasts, categories.values(), episodes())
+    if episode_store is not None:
+        episode_store.seal()
 
     for review in reviews:
         repo.add_review(review.content, review.rating, review.podcast, review.reviewer)
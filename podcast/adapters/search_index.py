@@ -0,0 +1,116 @@
+import heapq
+import math
+import re
+import unicodedata
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+# Tokens are runs of letters and digits, lower cased with their diacritics removed. This follows the unicode61
+# tokenizer of SQLite FTS5, so both repositories match the same documents for a query.
+TOKEN_PATTERN = re.compile(r'[^\W_]+')
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    if not text:
+        return []
+    decomposed = unicodedata.normalize('NFKD', text)
+    stripped = ''.join(character for character in decomposed if not unicodedata.combining(character))
+    return TOKEN_PATTERN.findall(stripped.lower())
+
+
+class InvertedIndex:
+    """ Maps tokens to the documents containing them. Documents are ids with one or more text fields, a query
+    matches the documents that contain all of its tokens and ranks them with Okapi BM25, the way FTS5 does.
+    """
+
+    def __init__(self):
+        self.__postings: Dict[str, Dict[int, int]] = dict()  # token -> {document id: term frequency}
+        self.__document_tokens: Dict[int, Tuple[str, ...]] = dict()
+        self.__document_lengths: Dict[int, int] = dict()
+        self.__total_length = 0
+
+    def __len__(self) -> int:
+        return len(self.__document_lengths)
+
+    @property
+    def total_length(self) -> int:
+        return self.__total_length
+
+    def postings(self, token: str) -> Dict[int, int]:
+        """ Returns the ids of the documents containing token, with the number of times they contain it. """
+        return self.__postings.get(token, dict())
+
+    def document_length(self, document_id: int) -> Optional[int]:
+        return self.__document_lengths.get(document_id)
+
+    def add(self, document_id: int, *fields: Optional[str]):
+        self.remove(document_id)
+        tokens = [token for field in fields for token in tokenize(field)]
+        frequencies = Counter(tokens)
+        for token, frequency in frequencies.items():
+            self.__postings.setdefault(token, dict())[document_id] = frequency
+        self.__document_tokens[document_id] = tuple(frequencies)
+        self.__document_lengths[document_id] = len(tokens)
+        self.__total_length += len(tokens)
+
+    def remove(self, document_id: int):
+        if document_id not in self.__document_lengths:
+            return
+        for token in self.__document_tokens.pop(document_id):
+            postings = self.__postings[token]
+            del postings[document_id]
+            if not postings:
+                del self.__postings[token]
+        self.__total_length -= self.__document_lengths.pop(document_id)
+
+    def search(self, query: str, offset: int = 0, limit: int = None) -> Tuple[List[int], int]:
+        """ Returns the ids of the documents matching query, best match first, from offset up to limit of them,
+        along with the total number of matches. Ties are broken by id.
+        """
+        return search_indexes([self], query, offset, limit)
+
+
+# The Okapi BM25 parameters, the ones FTS5 uses
+K1 = 1.2
+B = 0.75
+
+
+def search_indexes(indexes: list, query: str, offset: int = 0, limit: int = None) -> Tuple[List[int], int]:
+    """ Searches indexes holding different documents as if they were one, see InvertedIndex.search. An index is
+    anything with a length, total_length, postings(token) and document_length(document_id), such as an
+    InvertedIndex or the index of an EpisodeStore.
+    """
+    terms = list(dict.fromkeys(tokenize(query)))
+    postings = []
+    for term in terms:
+        posting = dict()
+        for index in indexes:
+            posting.update(index.postings(term))
+        postings.append(posting)
+    if not postings or not all(postings):
+        return [], 0
+    postings.sort(key=len)
+    candidates = set(postings[0]).intersection(*postings[1:])
+
+    number_of_documents = sum(len(index) for index in indexes)
+    average_length = sum(index.total_length for index in indexes) / number_of_documents
+    weights = [(posting, max(math.log((number_of_documents - len(posting) + 0.5) / (len(posting) + 0.5)), 1e-6))
+               for posting in postings]
+
+    def document_length(document_id: int) -> int:
+        return next(length for index in indexes if (length := index.document_length(document_id)) is not None)
+
+    def rank_key(document_id: int):
+        length_norm = K1 * (1 - B + B * document_length(document_id) / average_length)
+        score = 0.0
+        for posting, idf in weights:
+            frequency = posting[document_id]
+            score += idf * frequency * (K1 + 1) / (frequency + length_norm)
+        return -score, document_id
+
+    # Only the requested page is ordered, not every match
+    if limit is None:
+        ranked = sorted(candidates, key=rank_key)[offset:]
+    else:
+        ranked = heapq.nsmallest(offset + limit, candidates, key=rank_key)[offset:]
+    return ranked, len(candidates)
@@ -0,0 +1,214 @@
+import hashlib
+import os
+import struct
+import sys
+from array import array
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional
+
+from podcast.adapters.episode_store import EpisodeStore, add_episode_view, episode_view_from_row
+from podcast.adapters.interning import InternTable
+from podcast.domainmodel.model import Author, Podcast, Category, Episode, CompactAuthor, CompactPodcast, \
+    CompactCategory, CompactEpisode
+
+# Binary layout: a header followed by named sections. Every section is a typed column (an array of ids,
+# string table indexes or offsets), strings are stored once in a shared table. Bump SNAPSHOT_VERSION whenever
+# the layout or the meaning of a section changes, older snapshots are then rebuilt from the CSV files.
+SNAPSHOT_MAGIC = b'PODSNAP\x00'
+SNAPSHOT_VERSION = 1
+
+_HEADER = struct.Struct('<8sHB32sI')  # magic, version, byte order, source fingerprint, number of sections
+_SECTION = struct.Struct('<4scBQ')  # name, array typecode, item size, number of bytes
+_BYTE_ORDERS = {'little': 0, 'big': 1}
+_NONE = -1
+
+
+class Catalogue(NamedTuple):
+    authors: List[Author]
+    podcasts: List[Podcast]
+    categories: List[Category]
+    episodes: List[Episode]
+
+
+def source_fingerprint(data_path: Path) -> bytes:
+    """ Returns a SHA-256 digest of podcasts.csv and episodes.csv, used to detect stale snapshots. """
+    digest = hashlib.sha256()
+    for filename in ("podcasts.csv", "episodes.csv"):
+        with open(Path(data_path) / filename, 'rb') as csv_file:
+            while block := csv_file.read(1 << 20):
+                digest.update(block)
+        digest.update(b'\x00')
+    return digest.digest()
+
+
+class StringTable:
+    def __init__(self):
+        self.__indexes = dict()
+        self.__strings = list()
+
+    def add(self, value: Optional[str]) -> int:
+        if value is None:
+            return _NONE
+        index = self.__indexes.get(value)
+        if index is None:
+            index = len(self.__strings)
+            self.__indexes[value] = index
+            self.__strings.append(value)
+        return index
+
+    def to_sections(self) -> Dict[str, array]:
+        offsets = array('q', [0])
+        end = 0
+        for value in self.__strings:
+            end += len(value)
+            offsets.append(end)
+        return {'strs': array('B', ''.join(self.__strings).encode('utf-8')), 'soff': offsets}
+
+    @staticmethod
+    def from_sections(sections: Dict[str, array]) -> List[Optional[str]]:
+        text = sections['strs'].tobytes().decode('utf-8')
+        offsets = sections['soff']
+        # Index -1 (_NONE) resolves to the trailing None
+        return [text[start:end] for start, end in zip(offsets, offsets[1:])] + [None]
+
+
+def write_snapshot(path, fingerprint: bytes, catalogue: Catalogue):
+    """ Writes the catalogue to path. The file is replaced atomically, so concurrent readers never see
+    a half written snapshot.
+    """
+    strings = StringTable()
+    sections = {
+        'auid': array('i', (author.id for author in catalogue.authors)),
+        'aunm': array('i', (strings.add(author.name) for author in catalogue.authors)),
+        'caid': array('i', (category.id for category in catalogue.categories)),
+        'canm': array('i', (strings.add(category.name) for category in catalogue.categories)),
+        'poid': array('i', (podcast.id for podcast in catalogue.podcasts)),
+        'poau': array('i', (podcast.author.id if podcast.author else _NONE for podcast in catalogue.podcasts)),
+        'poti': array('i', (strings.add(podcast.title) for podcast in catalogue.podcasts)),
+        'poim': array('i', (strings.add(podcast.image) for podcast in catalogue.podcasts)),
+        'pode': array('i', (strings.add(podcast.description) for podcast in catalogue.podcasts)),
+        'pola': array('i', (strings.add(podcast.language) for podcast in catalogue.podcasts)),
+        'powe': array('i', (strings.add(podcast.website) for podcast in catalogue.podcasts)),
+        'poit': array('q', (_NONE if podcast.itunes_id is None else podcast.itunes_id
+                            for podcast in catalogue.podcasts)),
+        'pcof': array('i', [0]),
+        'pcid': array('i'),
+        'epid': array('i', (episode.id for episode in catalogue.episodes)),
+        'eppo': array('i', (episode.podcast.id if episode.podcast else _NONE for episode in catalogue.episodes)),
+        'epti': array('i', (strings.add(episode.title) for episode in catalogue.episodes)),
+        'epur': array('i', (strings.add(episode.url) for episode in catalogue.episodes)),
+        'epde': array('i', (strings.add(episode.description) for episode in catalogue.episodes)),
+        'eple': array('q', (episode.length for episode in catalogue.episodes)),
+        'epda': array('i', (strings.add(episode.date) for episode in catalogue.episodes)),
+    }
+    # Categories of podcast n are pcid[pcof[n]:pcof[n + 1]]
+    for podcast in catalogue.podcasts:
+        sections['pcid'].extend(category.id for category in podcast.categories)
+        sections['pcof'].append(len(sections['pcid']))
+    sections.update(strings.to_sections())
+
+    path = Path(path)
+    temporary_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    with open(temporary_path, 'wb') as snapshot_file:
+        snapshot_file.write(_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, _BYTE_ORDERS[sys.byteorder],
+                                         fingerprint, len(sections)))
+        for name, column in sections.items():
+            data = column.tobytes()
+            snapshot_file.write(_SECTION.pack(name.encode('ascii'), column.typecode.encode('ascii'),
+                                              column.itemsize, len(data)))
+            snapshot_file.write(data)
+    os.replace(temporary_path, path)
+
+
+def read_snapshot(path, fingerprint: bytes, compact: bool = False,
+                  episode_store: EpisodeStore = None) -> Optional[Catalogue]:
+    """ Returns the catalogue stored at path, fully linked and made of compact entities if compact is set.
+    Given an episode_store, the episode texts are moved into it and the episodes are views. Returns None if there
+    is no snapshot, or if it was written by another snapshot version, on another byte order or from different
+    CSV files.
+    """
+    try:
+        with open(path, 'rb') as snapshot_file:
+            data = snapshot_file.read()
+        sections = _read_sections(data, fingerprint)
+        if sections is None:
+            return None
+        return _build_catalogue(sections, compact, episode_store)
+    except (OSError, struct.error, ValueError, KeyError, IndexError, UnicodeDecodeError):
+        return None
+
+
+def _read_sections(data: bytes, fingerprint: bytes) -> Optional[Dict[str, array]]:
+    magic, version, byte_order, snapshot_fingerprint, number_of_sections = _HEADER.unpack_from(data, 0)
+    if (magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION or byte_order != _BYTE_ORDERS[sys.byteorder]
+            or snapshot_fingerprint != fingerprint):
+        return None
+    sections = dict()
+    position = _HEADER.size
+    for _ in range(number_of_sections):
+        name, typecode, itemsize, length = _SECTION.unpack_from(data, position)
+        position += _SECTION.size
+        column = array(typecode.decode('ascii'))
+        if column.itemsize != itemsize or position + length > len(data):
+            return None
+        column.frombytes(data[position:position + length])
+        sections[name.decode('ascii')] = column
+        position += length
+    return sections
+
+
+def _build_catalogue(sections: Dict[str, array], compact: bool, episode_store: Optional[EpisodeStore]) -> Catalogue:
+    strings = StringTable.from_sections(sections)
+    # The header checks above stand in for per-field validation, so compact entities use the trusted constructors
+    if compact:
+        new_author, new_category, new_podcast, new_episode = (CompactAuthor.from_row, CompactCategory.from_row,
+                                                              CompactPodcast.from_row, CompactEpisode.from_row)
+        new_view = episode_view_from_row
+    else:
+        new_author, new_category, new_podcast, new_episode = Author, Category, Podcast, Episode
+        new_view = add_episode_view
+
+    authors_by_id = {author_id: new_author(author_id, strings[name])
+                     for author_id, name in zip(sections['auid'], sections['aunm'])}
+    categories_by_id = {category_id: new_category(category_id, strings[name])
+                        for category_id, name in zip(sections['caid'], sections['canm'])}
+
+    podcasts = []
+    category_offsets = sections['pcof']
+    category_ids = sections['pcid']
+    podcast_columns = zip(sections['poid'], sections['poau'], sections['poti'], sections['poim'],
+                          sections['pode'], sections['powe'], sections['poit'], sections['pola'])
+    for index, (podcast_id, author_id, title, image, description, website, itunes_id, language) in enumerate(
+            podcast_columns):
+        author = authors_by_id.get(author_id)
+        podcast = new_podcast(podcast_id, author, strings[title], strings[image], strings[description],
+                              strings[website], None if itunes_id == _NONE else itunes_id, strings[language])
+        # Every entity was built here, so they are linked without the type checks of add_podcast and the like
+        if author is not None:
+            author.podcast_list.append(podcast)
+        podcast.categories.extend(categories_by_id[category_id]
+                                  for category_id in category_ids[category_offsets[index]:category_offsets[index + 1]])
+        podcasts.append(podcast)
+
+    podcasts_by_id = {podcast.id: podcast for podcast in podcasts}
+    episodes = []
+    episode_columns = zip(sections['epid'], sections['eppo'], sections['epti'], sections['epur'],
+                          sections['epde'], sections['eple'], sections['epda'])
+    # Strings are shared through the string table already, lengths are read back as new ints
+    intern = InternTable()
+    for episode_id, podcast_id, title, url, description, length, date in episode_columns:
+        podcast = podcasts_by_id.get(podcast_id)
+        length = intern(length)
+        if episode_store is not None:
+            episode = new_view(episode_store, episode_id, podcast, strings[title], strings[url],
+                               strings[description], length, strings[date])
+        else:
+            episode = new_episode(episode_id, podcast, strings[title], strings[url], strings[description],
+                                  length, strings[date])
+        if podcast is not None:
+            podcast.episodes.append(episode)
+        episodes.append(episode)
+
+    if episode_store is not None:
+        episode_store.seal()
+    return Catalogue(list(authors_by_id.values()), podcasts, list(categories_by_id.values()), episodes)
@@ -8,7 +8,6 @@ from wtforms.validators import DataRequired, Length, ValidationError
 
 import podcast.adapters.repository as repo
 import podcast.authentication.services as services
-import podcast.utilities.utilities as utilities
 
 # Configure Blueprint.
 authentication_blueprint = Blueprint(
@@ -38,8 +37,7 @@ def register():
         title='Register',
         form=form,
         username_error=username_error,
-        password_error=password_error,
-        categories=utilities.get_categories()['categories']
+        password_error=password_error
     )
 
 
@@ -77,8 +75,7 @@ def login():
         title='Login',
         username_error=username_error,
         password_error=password_error,
-        form=form,
-        categories=utilities.get_categories()['categories']
+        form=form
     )
 
 
@@ -2,12 +2,13 @@ from flask import Blueprint, render_template, request
 
 import podcast.adapters.repository as repository
 import podcast.browse.services as services
-import podcast.utilities.utilities as utilities
+from podcast.utilities.cache import page_cache
 
 browse_blueprint = Blueprint('browse_bp', __name__)
 
 
 @browse_blueprint.route('/browse', methods=['GET'])
+@page_cache.cached()
 def show_podcasts():
     # Extract query parameters for page number and category
     page_number = request.args.get('page_number', default=1, type=int)
@@ -27,9 +28,3 @@ def show_podcasts():
 
     # Render the catalogue page with the retrieved data
     return render_template('description/catalogue.html', **pagination_data)
-
-
-# Register a template context processor function which runs before rendering the template
-@browse_blueprint.context_processor
-def inject_categories():
-    return utilities.get_categories()
@@ -1,5 +1,5 @@
 from better_profanity import profanity
-from flask import Blueprint, render_template, request, redirect, url_for, flash
+from flask import Blueprint, abort, render_template, request, redirect, url_for, flash, session
 from flask_wtf import FlaskForm
 from wtforms import SelectField
 from wtforms import TextAreaField, HiddenField, SubmitField
@@ -9,41 +9,43 @@ import podcast.adapters.repository as repository
 import podcast.description.services as services
 import podcast.utilities.utilities as utilities
 from podcast.authentication.authentication import login_required
+from podcast.utilities.cache import page_cache
 
 description_blueprint = Blueprint('description_bp', __name__)
 
 
 @description_blueprint.route('/description', methods=['GET'])
+@page_cache.cached()
 def show_description():
     podcast_id = request.args.get('podcast_id', default=1, type=int)
-    form = ReviewForm()
-    # Ensure podcast_id is within valid range
-    if podcast_id > 1000:
-        podcast_id = 1000
-    if podcast_id < 1:
-        podcast_id = 1
+    # Only logged in users see the review form. Building it puts a CSRF token into the session, which would keep
+    # the page of an anonymous visitor out of the page cache
+    form = ReviewForm() if 'username' in session else None
     episode_page = request.args.get('episode_page', default=1, type=int)
-    podcast = services.get_podcast_by_id(repository.repo_instance, podcast_id)
-    all_episodes = sorted(podcast.episodes, key=lambda ep: ep.date)
-    paginated_episodes, next_episode_page, prev_episode_page, total_pages = (
-        utilities.get_episodes_pagination(all_episodes, episode_page))
-    categories = utilities.get_categories()['categories']
-    reviews = podcast.reviews
-    average_rating = utilities.calculate_average_rating(reviews)
-    playlist = services.get_playlist(repository.repo_instance)
-    episodes_in_playlist = utilities.get_episodes_in_playlist(paginated_episodes, playlist)
+    review_page = request.args.get('review_page', default=1, type=int)
+    return render_description(podcast_id, episode_page, form, review_page)
+
+
+def render_description(podcast_id: int, episode_page: int, form, review_page: int = 1):
+    # One repository call loads the podcast, its reviews and the episode page, see get_podcast_detail
+    detail = services.get_podcast_detail(repository.repo_instance, podcast_id, episode_page)
+    if detail is None:
+        abort(404)
+    reviews, review_page, total_review_pages = services.get_review_page(repository.repo_instance, podcast_id,
+                                                                        review_page)
     return render_template(
         'description/podcastDescription.html',
-        podcast=podcast,
-        episodes=paginated_episodes,
-        categories=categories,
-        episode_page=episode_page,
-        next_episode_page=next_episode_page,
-        prev_episode_page=prev_episode_page,
-        total_pages=total_pages,
-        episodes_in_playlist=episodes_in_playlist,
-        average_rating=average_rating,
+        podcast=detail.podcast,
+        episodes=detail.episodes,
+        episode_page=detail.episode_page,
+        next_episode_page=detail.next_episode_page,
+        prev_episode_page=detail.prev_episode_page,
+        total_pages=detail.total_pages,
+        episodes_in_playlist=detail.episodes_in_playlist,
+        rating_summary=detail.podcast.rating_summary,
         podcast_reviews=reviews,
+        review_page=review_page,
+        total_review_pages=total_review_pages,
         form=form
     )
 
@@ -78,11 +80,8 @@ def remove_from_playlist():
 @login_required
 def add_all_to_playlist():
     podcast_id = request.form.get('podcast_id', type=int)
-    podcast = services.get_podcast_by_id(repository.repo_instance, podcast_id)
-    all_episodes = podcast.episodes
     try:
-        for episode in all_episodes:
-            services.add_to_playlist(repository.repo_instance, episode)
+        services.add_podcast_to_playlist(repository.repo_instance, podcast_id)
         flash(f'All episodes in the podcast added to playlist successfully!', "success")
     except Exception as error:
         flash(str(error), "error")
@@ -115,30 +114,8 @@ def add_review():
 
     # If form validation fails, render the form with errors
     flash('There was an error with your review submission.', 'error')
-    podcast = services.get_podcast_by_id(repository.repo_instance, podcast_id)
     episode_page = request.args.get('episode_page', default=1, type=int)
-    all_episodes = sorted(podcast.episodes, key=lambda ep: ep.date)
-    paginated_episodes, next_episode_page, prev_episode_page, total_pages = (
-        utilities.get_episodes_pagination(all_episodes, episode_page))
-    categories = utilities.get_categories()['categories']
-    reviews = podcast.reviews
-    average_rating = utilities.calculate_average_rating(reviews)
-    playlist = services.get_playlist(repository.repo_instance)
-    episodes_in_playlist = utilities.get_episodes_in_playlist(paginated_episodes, playlist)
-    return render_template(
-        'description/podcastDescription.html',
-        podcast=podcast,
-        episodes=paginated_episodes,
-        categories=categories,
-        episode_page=episode_page,
-        next_episode_page=next_episode_page,
-        prev_episode_page=prev_episode_page,
-        total_pages=total_pages,
-        episodes_in_playlist=episodes_in_playlist,
-        average_rating=average_rating,
-        podcast_reviews=reviews,
-        form=form
-    )
+    return render_description(int(podcast_id), episode_page, form)
 
 
 class ProfanityFree:
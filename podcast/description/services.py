@@ -1,5 +1,5 @@
 import podcast.utilities.utilities as utilities
-from podcast.adapters.repository import AbstractRepository
+from podcast.adapters.repository import AbstractRepository, clamp_page
 from podcast.domainmodel.model import Episode, Playlist, User, Podcast
 
 
@@ -8,6 +8,22 @@ def get_podcast_by_id(repository: AbstractRepository, podcast_id: int):
     return podcast
 
 
+def get_podcast_detail(repository: AbstractRepository, podcast_id: int, episode_page: int):
+    return repository.get_podcast_detail(podcast_id, episode_page, utilities.get_username())
+
+
+def get_review_page(repository: AbstractRepository, podcast_id: int, review_page: int, page_size: int = 10):
+    """ Returns review_page of the podcast's reviews, moved into the range of existing pages, along with that page
+    number and the number of pages.
+    """
+    review_page = max(review_page, 1)
+    reviews, total = repository.get_podcast_reviews(podcast_id, (review_page - 1) * page_size, page_size)
+    if not reviews and total:
+        review_page = clamp_page(review_page, total, page_size)
+        reviews, total = repository.get_podcast_reviews(podcast_id, (review_page - 1) * page_size, page_size)
+    return reviews, review_page, max((total + page_size - 1) // page_size, 1)
+
+
 def get_episode_by_id(repository: AbstractRepository, episode_id: int):
     return repository.get_episode(episode_id)
 
@@ -17,6 +33,11 @@ def add_to_playlist(repository: AbstractRepository, episode: Episode):
     repository.add_to_playlist(username, episode)
 
 
+def add_podcast_to_playlist(repository: AbstractRepository, podcast_id: int):
+    username = utilities.get_username()
+    return repository.add_podcast_to_playlist(username, podcast_id)
+
+
 def get_playlist(repository: AbstractRepository):
     username = utilities.get_username()
     user = repository.get_user(username)
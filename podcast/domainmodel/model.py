@@ -1,5 +1,10 @@
 from __future__ import annotations
 
+import bisect
+from abc import ABCMeta
+from datetime import datetime, timezone
+from typing import Callable, Iterable, NamedTuple, Optional
+
 
 def validate_non_negative_int(value):
     if not isinstance(value, int) or value < 0:
@@ -11,13 +16,164 @@ def validate_non_empty_string(value, field_name="value"):
         raise ValueError(f"{field_name} must be a non-empty string.")
 
 
-class Author:
+def validate_rating(rating):
+    if not isinstance(rating, int) or not 1 <= rating <= 5:
+        raise ValueError("Rating must be an integer from 1 to 5.")
+
+
+def parse_timestamp(date) -> Optional[int]:
+    """ Returns the epoch seconds of an ISO date such as '2017-12-01 10:03:18', which is read as UTC unless it
+    carries an offset. Returns None for anything else, e.g. 'Unspecified'.
+    """
+    try:
+        moment = datetime.fromisoformat(date)
+    except (TypeError, ValueError):
+        return None
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return int(moment.timestamp())
+
+
+def format_timestamp(timestamp: int) -> str:
+    """ Returns the epoch seconds timestamp as a 'YYYY-MM-DD HH:MM:SS' UTC date. """
+    return datetime.fromtimestamp(timestamp, timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+
+
+def episode_timeline_key(episode: Episode):
+    """ Orders episodes by publication time and then id, episodes without a valid date go last. """
+    timestamp = episode.timestamp
+    return timestamp is None, timestamp or 0, episode.id
+
+
+def review_rating_key(review: Review):
+    """ Orders reviews by rating, highest first, and then id. """
+    return -review.rating, review.id
+
+
+class IndexedCollection:
+    """ An ordered collection of distinct, hashable items. Membership tests, appends and removals take constant
+    time, iterating, indexing and slicing work as they do on a list. Given a key, items are kept sorted by it
+    instead of by insertion, an item's key must not change while it is in the collection.
+    """
+
+    def __init__(self, items: Iterable = (), key: Callable = None):
+        self.__key = key
+        self.__members = dict()  # item -> None, in insertion order
+        self.__sequence = list()  # the items in order, None after an unkeyed removal until it is next needed
+        self.extend(items)
+
+    def append(self, item):
+        if item in self.__members:
+            return
+        self.__members[item] = None
+        if self.__key is not None:
+            bisect.insort(self.__sequence, item, key=self.__key)
+        elif self.__sequence is not None:
+            self.__sequence.append(item)
+
+    def extend(self, items: Iterable):
+        for item in items:
+            self.append(item)
+
+    def remove(self, item):
+        if item not in self.__members:
+            raise ValueError(f"{item!r} is not in the collection.")
+        del self.__members[item]
+        if self.__key is None:
+            # Rebuilt from the members once it is needed again, so removing many items stays linear overall
+            self.__sequence = None
+            return
+        index = bisect.bisect_left(self.__sequence, self.__key(item), key=self.__key)
+        if index < len(self.__sequence) and self.__sequence[index] == item:
+            del self.__sequence[index]
+        else:
+            self.__sequence.remove(item)
+
+    def clear(self):
+        self.__members.clear()
+        self.__sequence = list()
+
+    def __ordered(self) -> list:
+        if self.__sequence is None:
+            self.__sequence = list(self.__members)
+        return self.__sequence
+
+    def __contains__(self, item) -> bool:
+        return item in self.__members
+
+    def __len__(self) -> int:
+        return len(self.__members)
+
+    def __iter__(self):
+        return iter(self.__ordered())
+
+    def __reversed__(self):
+        return reversed(self.__ordered())
+
+    def __getitem__(self, index):
+        return self.__ordered()[index]
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, IndexedCollection):
+            return self.__ordered() == other.__ordered()
+        if isinstance(other, list):
+            return self.__ordered() == other
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        return repr(self.__ordered())
+
+
+class RatingSummary(NamedTuple):
+    """ Running review statistics of a podcast, the number of reviews for each rating from 1 to 5. It is
+    immutable, adding or removing a rating returns a new summary.
+    """
+    one: int = 0
+    two: int = 0
+    three: int = 0
+    four: int = 0
+    five: int = 0
+
+    @property
+    def review_count(self) -> int:
+        return sum(self)
+
+    @property
+    def rating_sum(self) -> int:
+        return sum(rating * reviews for rating, reviews in enumerate(self, start=1))
+
+    @property
+    def average_rating(self) -> float:
+        return self.rating_sum / self.review_count if self.review_count else 0
+
+    def with_rating(self, rating: int) -> RatingSummary:
+        return self.__changed(rating, 1)
+
+    def without_rating(self, rating: int) -> RatingSummary:
+        return self.__changed(rating, -1)
+
+    def __changed(self, rating: int, change: int) -> RatingSummary:
+        validate_rating(rating)
+        counts = list(self)
+        counts[rating - 1] += change
+        if counts[rating - 1] < 0:
+            raise ValueError(f"There is no review with a rating of {rating} to remove.")
+        return RatingSummary(*counts)
+
+    def __composite_values__(self):
+        # Lets the ORM map the summary onto one column per rating
+        return tuple(self)
+
+
+class Author(metaclass=ABCMeta):
     def __init__(self, author_id: int, name: str):
         validate_non_negative_int(author_id)
         validate_non_empty_string(name, "Author name")
         self._id = author_id
         self._name = name.strip()
-        self.podcast_list = []
+        self.podcast_list = IndexedCollection()
 
     @property
     def id(self) -> int:
@@ -59,7 +215,7 @@ class Author:
         return hash(self.id)
 
 
-class Podcast:
+class Podcast(metaclass=ABCMeta):
     def __init__(self, podcast_id: int, author: Author, title: str = "Untitled", image: str = None,
                  description: str = "", website: str = "", itunes_id: int = None, language: str = "Unspecified"):
         validate_non_negative_int(podcast_id)
@@ -72,9 +228,12 @@ class Podcast:
         self._language = language
         self._website = website
         self._itunes_id = itunes_id
-        self.categories = []
-        self.episodes = []
-        self.reviews = []
+        self.categories = IndexedCollection()
+        # Episodes are kept as a timeline, so pages of it are plain slices
+        self.episodes = IndexedCollection(key=episode_timeline_key)
+        # Reviews are kept in rating order, so pages of them are plain slices
+        self.reviews = IndexedCollection(key=review_rating_key)
+        self._rating_summary = RatingSummary()
 
     @property
     def id(self) -> int:
@@ -136,6 +295,10 @@ class Podcast:
         validate_non_empty_string(new_website, "Podcast website")
         self._website = new_website
 
+    @property
+    def rating_summary(self) -> RatingSummary:
+        return self._rating_summary
+
     def add_category(self, category: Category):
         if not isinstance(category, Category):
             raise TypeError("Expected a Category instance.")
@@ -160,11 +323,12 @@ class Podcast:
         if not isinstance(review, Review):
             raise TypeError("Expected a Review instance.")
         if review not in self.reviews:
+            self._rating_summary = self._rating_summary.with_rating(review.rating)
             self.reviews.append(review)
-            self.reviews = sorted(self.reviews, key=lambda rev: rev.rating, reverse=True)
 
     def remove_review(self, review: Review):
         if review in self.reviews:
+            self._rating_summary = self._rating_summary.without_rating(review.rating)
             self.reviews.remove(review)
 
     def __repr__(self):
@@ -184,7 +348,7 @@ class Podcast:
         return hash(self.id)
 
 
-class Category:
+class Category(metaclass=ABCMeta):
     def __init__(self, category_id: int, name: str):
         validate_non_negative_int(category_id)
         validate_non_empty_string(name, "Category name")
@@ -229,9 +393,9 @@ class User:
         self._id = user_id
         self._username = username.strip()
         self._password = password
-        self._subscription_list = []
+        self._subscription_list = IndexedCollection()
         self._playlist = None
-        self._reviews = []
+        self._reviews = IndexedCollection()
 
     @property
     def id(self) -> int:
@@ -350,19 +514,21 @@ class PodcastSubscription:
         return hash((self.id, self.owner, self.podcast))
 
 
-class Episode:
+class Episode(metaclass=ABCMeta):
     def __init__(self, episode_id: int, podcast: Podcast, title: str = "Untitled", url: str = "",
                  description: str = "", length: int = None, date: str = "Unspecified"):
         validate_non_negative_int(episode_id)
         validate_non_negative_int(length)
         self._id = episode_id
-        self._podcast = podcast
         validate_non_empty_string(title, "Episode title")
         self._title = title.strip()
         self._url = url
         self._description = description
         self._length = length
         self._date = date
+        self._timestamp = parse_timestamp(date)
+        # Set last, a mapped podcast files the episode under its timestamp as soon as it is set
+        self._podcast = podcast
 
     @property
     def id(self) -> int:
@@ -417,6 +583,14 @@ class Episode:
     def date(self, new_date: str):
         validate_non_empty_string(new_date, "Episode published date")
         self._date = new_date.strip()
+        self._timestamp = parse_timestamp(self._date)
+
+    @property
+    def timestamp(self) -> Optional[int]:
+        """ The publication date in epoch seconds, None if the date is not a valid ISO date. It is parsed once,
+        when the date is set, as it orders the episodes of a podcast.
+        """
+        return self._timestamp
 
     def __repr__(self):
         return f"<Episode {self.id}: '{self.title}' in Podcast: {self.podcast.title}>"
@@ -439,10 +613,11 @@ class Review:
     def __init__(self, review_id: int, podcast_reviewed: Podcast, reviewer: User, rating: int, description: str):
         validate_non_negative_int(review_id)
         self._id = review_id
-        self._podcast = podcast_reviewed
         self._reviewer = reviewer
         self._rating = rating
         self._content = description
+        # Set last, a mapped podcast files the review under its rating as soon as it is set
+        self._podcast = podcast_reviewed
 
     @property
     def id(self) -> int:
@@ -479,7 +654,15 @@ class Review:
     @rating.setter
     def rating(self, new_rating: int):
         validate_non_negative_int(new_rating)
+        # A review of a podcast is taken out and put back, so its rating summary and order follow the new rating
+        podcast = self._podcast
+        reviewed = isinstance(podcast, Podcast) and self in podcast.reviews
+        if reviewed:
+            validate_rating(new_rating)
+            podcast.remove_review(self)
         self._rating = new_rating
+        if reviewed:
+            podcast.add_review(self)
 
     @content.setter
     def content(self, new_review: str):
@@ -515,7 +698,7 @@ class Playlist:
         self._id = playlist_id
         self._owner = playlist_owner
         self._name = playlist_name
-        self._episodes = []
+        self._episodes = IndexedCollection()
 
     @property
     def id(self) -> int:
@@ -573,3 +756,82 @@ class Playlist:
             self._episodes.remove(to_delete)
         else:
             raise ValueError("Episode not found.")
+
+    def clear(self):
+        # Removed one by one, through the remover the ORM records for a mapped playlist
+        for episode in reversed(list(self._episodes)):
+            self._episodes.remove(episode)
+
+
+def compact_variant(cls: ABCMeta, *fields: str, name: str = None, **overrides) -> type:
+    """ Returns a variant of a catalogue class that keeps the given fields in slots instead of an instance
+    dictionary. It shares every method and property of cls that overrides does not replace, passes isinstance
+    checks for it and compares equal to its instances. The ORM cannot map slotted classes, so only
+    MemoryRepository holds compact entities.
+    """
+    members = {member_name: member for member_name, member in vars(cls).items()
+               if member_name not in ('__dict__', '__weakref__', '__qualname__', '__abstractmethods__', '_abc_impl')}
+    members.update(overrides, __slots__=fields + ('__weakref__',))
+    variant = type(name or f"Compact{cls.__name__}", (), members)
+    cls.register(variant)
+    return variant
+
+
+# Trusted constructors of the compact variants, for ingest code that has checked its source against the schema
+# once. They take the arguments of the regular constructors and skip every validation. The ORM sets up its state
+# in __init__, so mapped classes cannot be built this way and the regular entities have no from_row.
+
+def _author_from_row(cls, author_id: int, name: str):
+    author = cls.__new__(cls)
+    author._id = author_id
+    author._name = name
+    author.podcast_list = IndexedCollection()
+    return author
+
+
+def _category_from_row(cls, category_id: int, name: str):
+    category = cls.__new__(cls)
+    category._id = category_id
+    category._name = name
+    return category
+
+
+def _podcast_from_row(cls, podcast_id: int, author: Author, title: str, image: str, description: str, website: str,
+                      itunes_id: int, language: str):
+    podcast = cls.__new__(cls)
+    podcast._id = podcast_id
+    podcast._author = author
+    podcast._title = title
+    podcast._image = image
+    podcast._description = description
+    podcast._language = language
+    podcast._website = website
+    podcast._itunes_id = itunes_id
+    podcast.categories = IndexedCollection()
+    podcast.episodes = IndexedCollection(key=episode_timeline_key)
+    podcast.reviews = IndexedCollection(key=review_rating_key)
+    podcast._rating_summary = RatingSummary()
+    return podcast
+
+
+def _episode_from_row(cls, episode_id: int, podcast: Podcast, title: str, url: str, description: str, length: int,
+                      date: str):
+    episode = cls.__new__(cls)
+    episode._id = episode_id
+    episode._podcast = podcast
+    episode._title = title
+    episode._url = url
+    episode._description = description
+    episode._length = length
+    episode._date = date
+    episode._timestamp = parse_timestamp(date)
+    return episode
+
+
+CompactAuthor = compact_variant(Author, '_id', '_name', 'podcast_list', from_row=classmethod(_author_from_row))
+CompactCategory = compact_variant(Category, '_id', '_name', from_row=classmethod(_category_from_row))
+CompactPodcast = compact_variant(Podcast, '_id', '_author', '_title', '_image', '_description', '_language',
+                                 '_website', '_itunes_id', 'categories', 'episodes', 'reviews', '_rating_summary',
+                                 from_row=classmethod(_podcast_from_row))
+CompactEpisode = compact_variant(Episode, '_id', '_podcast', '_title', '_url', '_description', '_length', '_date',
+                                 '_timestamp', from_row=classmethod(_episode_from_row))
@@ -0,0 +1,61 @@
+import itertools
+import threading
+import time
+import weakref
+from typing import Callable, List, Optional
+
+from podcast.adapters.repository import AbstractRepository
+
+
+class HomeFeed:
+    """ A small rotating pool of precomputed home page feeds. Each request takes the next feed of the pool
+    without touching the repository. Once the pool is older than refresh_interval seconds, a background
+    thread builds a new one while the current pool keeps being served.
+    """
+
+    def __init__(self, build_pool: Callable[[AbstractRepository, int], List[list]], pool_size: int = 8,
+                 refresh_interval: float = 60.0):
+        self.__build_pool = build_pool
+        self.__pool_size = pool_size
+        self.__refresh_interval = refresh_interval
+        self.__lock = threading.Lock()
+        self.__repository = None  # weak reference to the repository the pool was built from
+        self.__feeds = itertools.cycle([])
+        self.__built_at = 0.0
+        self.__refresh_thread: Optional[threading.Thread] = None
+
+    def next_feed(self, repository: AbstractRepository) -> list:
+        with self.__lock:
+            built_for_repository = self.__repository is not None and self.__repository() is repository
+            stale = time.monotonic() - self.__built_at >= self.__refresh_interval
+            if built_for_repository and stale and self.__refresh_thread is None:
+                self.__refresh_thread = threading.Thread(target=self.__refresh_in_background, args=(repository,),
+                                                         daemon=True)
+                self.__refresh_thread.start()
+        if not built_for_repository:
+            # The first request, or a new repository, has to wait for a pool
+            self.refresh(repository)
+        with self.__lock:
+            return next(self.__feeds, [])
+
+    def refresh(self, repository: AbstractRepository):
+        feeds = self.__build_pool(repository, self.__pool_size)
+        with self.__lock:
+            self.__repository = weakref.ref(repository)
+            self.__feeds = itertools.cycle(feeds)
+            self.__built_at = time.monotonic()
+
+    def __refresh_in_background(self, repository: AbstractRepository):
+        try:
+            self.refresh(repository)
+        finally:
+            with self.__lock:
+                # A failed refresh is retried after another interval, the old pool is served meanwhile
+                self.__built_at = time.monotonic()
+                self.__refresh_thread = None
+
+    def wait_for_refresh(self):
+        """ Waits for a background refresh that is in progress, if any. """
+        thread = self.__refresh_thread
+        if thread is not None:
+            thread.join()
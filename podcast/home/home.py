@@ -1,14 +1,17 @@
 from flask import Blueprint, render_template
 import podcast.adapters.repository as repository
 import podcast.home.services as services
-import podcast.utilities.utilities as utilities
+from podcast.utilities.cache import page_cache
 
 home_blueprint = Blueprint(
     'home_bp', __name__)
 
+# Seconds an anonymous visitor may be shown the same feed, so the rotating feeds still rotate
+HOME_PAGE_MAX_AGE = 10
+
 
 @home_blueprint.route('/', methods=['GET'])
+@page_cache.cached(max_age=HOME_PAGE_MAX_AGE)
 def home():
-    list_of_podcasts = services.get_random_podcasts_info(repository.repo_instance)
-    categories = utilities.get_categories()['categories']
-    return render_template('index.html', list_of_podcasts=list_of_podcasts, categories=categories)
+    list_of_podcasts = services.get_home_feed(repository.repo_instance)
+    return render_template('index.html', list_of_podcasts=list_of_podcasts)
@@ -1,25 +1,38 @@
 import random
+from typing import List
 
 from podcast.adapters.repository import AbstractRepository
+from podcast.home.feed import HomeFeed
 
 
 def get_random_podcasts_info(repository: AbstractRepository, number_of_podcasts: int = 12):
     """ Randomly choose 12 podcasts to display on the home page """
-    total_podcasts = repository.get_number_of_podcasts()
-    # Randomly select podcast IDs
-    podcast_ids = random.sample(range(1, total_podcasts + 1), number_of_podcasts)
+    return build_feed_pool(repository, 1, number_of_podcasts)[0]
 
-    # Retrieve the podcasts and collect the required information
-    podcast_dicts = []
 
-    for podcast_id in podcast_ids:
-        podcast = repository.get_podcast(podcast_id)
-        podcast_dict = {
+def build_feed_pool(repository: AbstractRepository, number_of_feeds: int, number_of_podcasts: int = 12) -> List[list]:
+    """ Returns number_of_feeds random selections of podcasts for the home page, sampled from the ids that
+    actually exist. All of their podcasts are fetched with one batched repository call.
+    """
+    podcast_ids = repository.get_podcast_ids()
+    samples = [random.sample(podcast_ids, min(number_of_podcasts, len(podcast_ids))) for _ in range(number_of_feeds)]
+    podcasts = repository.get_podcasts_by_id(list({podcast_id for sample in samples for podcast_id in sample}))
+    podcasts_by_id = {podcast.id: podcast for podcast in podcasts}
+
+    feeds = []
+    for sample in samples:
+        feeds.append([{
             "id": podcast_id,
-            "title": podcast.title,
-            "image_url": podcast.image,
-            "author_name": podcast.author.name
-        }
-        podcast_dicts.append(podcast_dict)
+            "title": podcasts_by_id[podcast_id].title,
+            "image_url": podcasts_by_id[podcast_id].image,
+            "author_name": podcasts_by_id[podcast_id].author.name
+        } for podcast_id in sample])
+    return feeds
+
+
+# The home page is the busiest page, its feeds are precomputed for the whole process
+home_feed = HomeFeed(build_feed_pool)
+
 
-    return podcast_dicts
+def get_home_feed(repository: AbstractRepository):
+    return home_feed.next_feed(repository)
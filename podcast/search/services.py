@@ -1,12 +1,41 @@
+import math
+
 from podcast.adapters.repository import AbstractRepository
 
 
-def get_podcasts_filtered(repository: AbstractRepository, search_field, search_query):
+def get_podcasts_filtered(repository: AbstractRepository, search_field, search_query, offset: int = 0,
+                          limit: int = None):
+    """ Returns the results of the search from offset up to limit of them, and the total number of results. """
     if search_field == 'category':
-        return repository.get_podcasts_by_category(search_query)
+        return repository.get_podcasts_by_category(search_query, offset, limit)
     elif search_field == 'title':
-        return repository.get_podcasts_by_title(search_query)
+        return repository.get_podcasts_by_title(search_query, offset, limit)
     elif search_field == 'language':
-        return repository.get_podcasts_by_language(search_query)
+        return repository.get_podcasts_by_language(search_query, offset, limit)
+    elif search_field == 'keyword':
+        return repository.search_podcasts(search_query, offset, limit)
+    elif search_field == 'episode':
+        return repository.search_episodes(search_query, offset, limit)
     else:
-        return repository.get_podcasts_by_author(search_query)
+        return repository.get_podcasts_by_author(search_query, offset, limit)
+
+
+def get_search_results(repository: AbstractRepository, search_field, search_query, page_number: int,
+                       page_size: int = 10):
+    # Only the requested page is loaded, the repository counts the other results
+    results, total = get_podcasts_filtered(repository, search_field, search_query,
+                                           (page_number - 1) * page_size, page_size)
+
+    total_pages = math.ceil(total / page_size)
+    has_next = page_number < total_pages
+    has_previous = page_number > 1
+    return {
+        'results': results,
+        'result_type': 'episodes' if search_field == 'episode' else 'podcasts',
+        'current_page': page_number,
+        'total_pages': total_pages,
+        'has_next': has_next,
+        'has_previous': has_previous,
+        'next_page': page_number + 1 if has_next else None,
+        'previous_page': page_number - 1 if has_previous else None
+    }
@@ -20,6 +20,10 @@ def remove_from_playlist(repository: AbstractRepository, episode: Episode):
         repository.remove_from_playlist(username, episode)
 
 
+def clear_playlist(repository: AbstractRepository):
+    repository.clear_playlist(utilities.get_username())
+
+
 def get_episode_by_id(repository: AbstractRepository, episode_id: int):
     return repository.get_episode(episode_id)
 
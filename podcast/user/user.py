@@ -22,11 +22,9 @@ def show_user_playlist():
     episode_page = request.args.get('episode_page', default=1, type=int)
     paginated_episodes, next_episode_page, prev_episode_page, total_pages = (
         utilities.get_episodes_pagination(episodes_in_playlist, episode_page))
-    categories = utilities.get_categories()['categories']
     return render_template(
         'user/playlist.html',
         episodes=paginated_episodes,
-        categories=categories,
         episode_page=episode_page,
         next_episode_page=next_episode_page,
         prev_episode_page=prev_episode_page,
@@ -53,13 +51,8 @@ def remove_from_playlist():
 @login_required
 def remove_all_from_playlist():
     try:
-        playlist = services.get_users_playlist(repository.repo_instance)
-        if playlist:
-            for episode in list(playlist.episodes):
-                services.remove_from_playlist(repository.repo_instance, episode)
-            flash("All episodes removed from playlist successfully!", "success")
-        else:
-            flash("Playlist not found for the user.", "error")
+        services.clear_playlist(repository.repo_instance)
+        flash("All episodes removed from playlist successfully!", "success")
     except Exception as error:
         flash(str(error), "error")
     return redirect(url_for("user_bp.show_user_playlist"))
@@ -84,13 +77,11 @@ def show_user_reviews():
     start = (page - 1) * reviews_per_page
     end = start + reviews_per_page
     paginated_reviews = user_reviews[start:end]
-    categories = utilities.get_categories()['categories']
     return render_template(
         'user/profile.html',
         user_reviews=paginated_reviews,
         current_page=page,
-        pages_count=pages_count,
-        categories=categories
+        pages_count=pages_count
     )
 
 
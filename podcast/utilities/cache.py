@@ -0,0 +1,247 @@
+import functools
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from typing import Callable, Dict, NamedTuple, Optional
+
+from flask import current_app, jsonify, make_response, request, session
+from jinja2 import nodes
+from jinja2.ext import Extension
+
+import podcast.adapters.repository as repository
+from podcast.adapters.repository import AbstractRepository
+
+
+class CacheStats(NamedTuple):
+    hits: int
+    misses: int
+    evictions: int = 0
+
+
+# Every cache of the process by name, see get_cache_stats
+_caches: Dict[str, object] = dict()
+
+
+class VersionedCache:
+    """ Holds one value computed from a repository for the whole process. It is recomputed only when another
+    repository is used or when the repository's version of the kind of data it depends on has changed.
+    """
+
+    def __init__(self, name: str, kind: str, compute: Callable[[AbstractRepository], object]):
+        self.__kind = kind
+        self.__compute = compute
+        self.__lock = threading.Lock()
+        self.__repository = None  # weak reference, so a cache never keeps a repository alive
+        self.__version = None
+        self.__value = None
+        self.__hits = 0
+        self.__misses = 0
+        _caches[name] = self
+
+    def get(self, repository: AbstractRepository):
+        version = repository.get_version(self.__kind)
+        with self.__lock:
+            if self.__repository is not None and self.__repository() is repository and self.__version == version:
+                self.__hits += 1
+                return self.__value
+            self.__misses += 1
+        # Computed outside the lock, two requests that miss together both compute the same value
+        value = self.__compute(repository)
+        with self.__lock:
+            self.__repository = weakref.ref(repository)
+            self.__version = version
+            self.__value = value
+        return value
+
+    def clear(self):
+        with self.__lock:
+            self.__repository = None
+            self.__value = None
+
+    @property
+    def stats(self) -> CacheStats:
+        return CacheStats(self.__hits, self.__misses)
+
+
+class CatalogueLruCache:
+    """ Values rendered from the catalogue of a repository, evicted least recently used first once they take up
+    more than max_bytes. All values belong to one repository at one catalogue version, asking for another one
+    drops them all.
+    """
+
+    def __init__(self, name: str, max_bytes: int):
+        self.__max_bytes = max_bytes
+        self.__lock = threading.Lock()
+        self.__values: OrderedDict = OrderedDict()  # key -> value, least recently used first
+        self.__size = 0
+        self.__repository = None  # weak reference to the repository the values were rendered from
+        self.__version = None
+        self.__hits = 0
+        self.__misses = 0
+        self.__evictions = 0
+        _caches[name] = self
+
+    def _size_of(self, value) -> int:
+        return len(value)
+
+    def _is_fresh(self, value) -> bool:
+        return True
+
+    def get(self, repo: AbstractRepository, version: int, key):
+        with self.__lock:
+            if self.__repository is None or self.__repository() is not repo or self.__version != version:
+                # Values of another repository or an older catalogue are never served again
+                self.__values.clear()
+                self.__size = 0
+                self.__repository = weakref.ref(repo)
+                self.__version = version
+            value = self.__values.get(key)
+            if value is not None and not self._is_fresh(value):
+                self.__remove(key)
+                value = None
+            if value is None:
+                self.__misses += 1
+                return None
+            self.__values.move_to_end(key)
+            self.__hits += 1
+            return value
+
+    def put(self, version: int, key, value):
+        size = self._size_of(value)
+        if size > self.__max_bytes:
+            return
+        with self.__lock:
+            if version != self.__version:
+                return
+            if key in self.__values:
+                self.__remove(key)
+            self.__values[key] = value
+            self.__size += size
+            while self.__size > self.__max_bytes:
+                self.__remove(next(iter(self.__values)))
+                self.__evictions += 1
+
+    def __remove(self, key):
+        self.__size -= self._size_of(self.__values.pop(key))
+
+    def clear(self):
+        with self.__lock:
+            self.__values.clear()
+            self.__size = 0
+            self.__repository = None
+
+    @property
+    def size(self) -> int:
+        return self.__size
+
+    @property
+    def stats(self) -> CacheStats:
+        return CacheStats(self.__hits, self.__misses, self.__evictions)
+
+
+class CachedPage(NamedTuple):
+    body: bytes
+    status: int
+    content_type: str
+    expires: Optional[float]
+
+
+class PageCache(CatalogueLruCache):
+    """ Rendered pages of anonymous GET requests for the whole process. Pages are keyed on the endpoint, the
+    sorted query arguments and the repository's catalogue version, any change to the catalogue drops them all.
+    """
+
+    def __init__(self, name: str, max_bytes: int = 32 * 1024 * 1024):
+        super().__init__(name, max_bytes)
+
+    def _size_of(self, page: CachedPage) -> int:
+        return len(page.body)
+
+    def _is_fresh(self, page: CachedPage) -> bool:
+        return page.expires is None or page.expires > time.monotonic()
+
+    def cached(self, max_age: float = None):
+        """ Decorates a view so anonymous GET requests are answered from the cache. Requests of logged in users,
+        or with flashed messages waiting, always run the view, as do responses that change the session.
+        Pages expire after max_age seconds if it is given.
+        """
+        def decorator(view):
+            @functools.wraps(view)
+            def cached_view(*args, **kwargs):
+                if request.method != 'GET' or self.__personal():
+                    return view(*args, **kwargs)
+                repo = repository.repo_instance
+                version = repo.get_version('catalogue')
+                key = (request.endpoint, tuple(sorted(request.args.items(multi=True))), version)
+                page = self.get(repo, version, key)
+                if page is not None:
+                    return current_app.response_class(page.body, status=page.status, content_type=page.content_type)
+                response = make_response(view(*args, **kwargs))
+                if response.status_code == 200 and not session.modified and not self.__personal():
+                    expires = time.monotonic() + max_age if max_age is not None else None
+                    self.put(version, key, CachedPage(response.get_data(), response.status_code,
+                                                      response.content_type, expires))
+                return response
+            return cached_view
+        return decorator
+
+    @staticmethod
+    def __personal() -> bool:
+        return 'username' in session or '_flashes' in session
+
+
+class FragmentCache(CatalogueLruCache):
+    """ Rendered template fragments for the whole process, see FragmentCacheExtension. """
+
+    def __init__(self, name: str, max_bytes: int = 16 * 1024 * 1024):
+        super().__init__(name, max_bytes)
+
+    def get_or_render(self, key: tuple, render: Callable[[], str]) -> str:
+        repo = repository.repo_instance
+        version = repo.get_version('catalogue')
+        fragment = self.get(repo, version, key)
+        if fragment is None:
+            fragment = render()
+            self.put(version, key, fragment)
+        return fragment
+
+
+class FragmentCacheExtension(Extension):
+    """ Adds a {% cache key, ... %}...{% endcache %} tag to the templates. The body is rendered once and reused
+    for as long as the catalogue version stays the same, so the key only has to name the entities the fragment
+    shows, e.g. {% cache 'episode-row', episode.id %}. Anything that differs between users must stay outside.
+    """
+    tags = {'cache'}
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        key = [parser.parse_expression()]
+        while parser.stream.skip_if('comma'):
+            key.append(parser.parse_expression())
+        body = parser.parse_statements(('name:endcache',), drop_needle=True)
+        return nodes.CallBlock(self.call_method('_render', [nodes.List(key)]), [], [], body).set_lineno(lineno)
+
+    @staticmethod
+    def _render(key: list, caller) -> str:
+        # Lists, e.g. of ids, are made hashable
+        key = tuple(tuple(part) if isinstance(part, list) else part for part in key)
+        return fragment_cache.get_or_render(key, caller)
+
+
+# Whole pages for anonymous visitors, see PageCache.cached
+page_cache = PageCache('pages')
+# List markup shared by every visitor, see FragmentCacheExtension
+fragment_cache = FragmentCache('fragments')
+
+
+def get_cache_stats() -> Dict[str, CacheStats]:
+    """ Returns the hit, miss and eviction counts of every cache in the process. """
+    return {name: cache.stats for name, cache in _caches.items()}
+
+
+def show_cache_stats():
+    """ The view behind /debug/cache-stats, which create_app only registers in debug mode. The counts belong to
+    the serving process, so they cannot be read from a separate one such as a CLI command.
+    """
+    return jsonify({name: stats._asdict() for name, stats in get_cache_stats().items()})
@@ -1,15 +1,27 @@
 from typing import List
 
-from flask import session
+from flask import current_app, session
+from markupsafe import Markup
 
 import podcast.adapters.repository as repository
 import podcast.utilities.services as services
-from podcast.domainmodel.model import Episode, Review, Playlist
+from podcast.domainmodel.model import Episode
+from podcast.utilities.cache import VersionedCache
 
 
-def get_categories():
-    categories = services.get_categories(repository.repo_instance)
-    return {'categories': categories}
+def render_category_nav(repo: repository.AbstractRepository) -> Markup:
+    # Rendered straight from the Jinja environment, render_template would run the context processors again
+    template = current_app.jinja_env.get_template('categoryNav.html')
+    return Markup(template.render(categories=category_cache.get(repo)))
+
+
+# Every view shows the categories in the navigation bar, both stay cached until a category is added
+category_cache = VersionedCache('categories', 'categories', services.get_categories)
+category_nav_cache = VersionedCache('category_nav', 'categories', render_category_nav)
+
+
+def get_category_nav():
+    return {'category_nav': category_nav_cache.get(repository.repo_instance)}
 
 
 def get_username():
@@ -42,20 +54,3 @@ def get_episodes_pagination(all_episodes: List[Episode], episode_page: int):
 
     return paginated_episodes, next_episode_page, prev_episode_page, total_pages
 
-
-def calculate_average_rating(reviews: List[Review]):
-    if reviews:
-        average_rating = sum(review.rating for review in reviews) / len(reviews)
-    else:
-        average_rating = 0  # Set default value to 0 if there are no reviews
-    return average_rating
-
-
-def get_episodes_in_playlist(paginated_episodes: List[Episode], playlist: Playlist):
-    # Check if episodes are in the playlist using in_playlist method
-    episodes_in_playlist = set()
-    if playlist:
-        for episode in paginated_episodes:
-            if services.in_playlist(playlist, episode):
-                episodes_in_playlist.add(episode.id)
-    return episodes_in_playlist
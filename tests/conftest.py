@@ -5,6 +5,7 @@ import pytest
 import podcast.adapters.repository as repo
 from podcast import create_app
 from podcast.adapters.datareader.csvdatareader import CSVDataReader
+from podcast.adapters.episode_store import EpisodeStore
 from podcast.adapters.memory_repository import MemoryRepository
 from podcast.adapters.repository_populate import populate_data
 
@@ -25,7 +26,7 @@ def csv_reader() -> CSVDataReader:
 @pytest.fixture
 def in_memory_repo(data_path):
     repo.repo_instance = MemoryRepository()
-    populate_data(repo.repo_instance, data_path)
+    populate_data(repo.repo_instance, data_path, compact=True, episode_store=EpisodeStore())
     return repo.repo_instance
 
 
@@ -37,6 +38,7 @@ def client():
             "TEST_DATA_PATH": TEST_DATA_PATH,
             "WTF_CSRF_ENABLED": False,
             "REPOSITORY": "memory",
+            "SNAPSHOT_PATH": None,
         }
     )
     return my_app.test_client()
@@ -1,8 +1,16 @@
+from pathlib import Path
 from unittest.mock import patch
 
 import pytest
 from flask import session
 
+import podcast.adapters.repository as repository
+from podcast import create_app
+from podcast.domainmodel.model import Author, Podcast
+from podcast.utilities.cache import get_cache_stats
+
+TEST_DATA_PATH = Path(__file__).parent.parent / "data"
+
 
 def test_register(client):
     response_code = client.get("/authentication/register").status_code
@@ -112,6 +120,9 @@ def test_add_all_to_playlist(client, auth):
     response = client.post("/add_all_to_playlist", data={"podcast_id": 1})
     assert response.status_code == 302
     assert response.headers["Location"] == "/description?podcast_id=1"
+    client.post("/add_all_to_playlist", data={"podcast_id": 3})
+    response = client.get("/user/playlist")
+    assert b"Caller Of The Week Part 1." in response.data
 
 
 def test_show_user_playlist(client, auth):
@@ -141,6 +152,19 @@ def test_podcast_with_reviews(client, auth):
     assert b"Who likes this game?" in response.data
 
 
+def test_podcast_reviews_are_paged(client, auth):
+    for number in range(11):
+        auth.register(f"reviewer{number}", "Password1")
+        auth.login(f"reviewer{number}", "Password1")
+        client.post("/add_review", data={"description": f"Review number {number}", "rating": 5, "podcast_id": 1})
+        auth.logout()
+    response = client.get("/description", query_string={"podcast_id": 1})
+    assert b"Review number 9" in response.data and b"Review number 10" not in response.data
+    assert b"Reviews page 1 of 2" in response.data
+    response = client.get("/description", query_string={"podcast_id": 1, "review_page": 5})
+    assert b"Review number 10" in response.data and b"Reviews page 2 of 2" in response.data
+
+
 def test_user_delete_review(client, auth):
     auth.register()
     auth.login()
@@ -151,5 +175,86 @@ def test_user_delete_review(client, auth):
 def test_user_remove_all_episodes_from_playlist(client, auth):
     auth.register()
     auth.login()
+    client.post("/add_all_to_playlist", data={"podcast_id": 3})
     response = client.post("/user/playlist/remove_all_from_playlist")
     assert response.status_code == 302
+    response = client.get("/user/playlist")
+    assert b"Caller Of The Week" not in response.data
+
+
+def test_category_nav_is_rendered_once(client):
+    client.get("/search")
+    before = get_cache_stats()['category_nav']
+    response = client.get("/browse")
+    after = get_cache_stats()['category_nav']
+    assert b"Society &amp; Culture" in response.data
+    assert after.misses == before.misses
+    assert after.hits == before.hits + 1
+
+
+def test_anonymous_pages_are_cached_until_the_catalogue_changes(client, auth):
+    first = client.get("/description", query_string={"podcast_id": 3})
+    before = get_cache_stats()['pages']
+    second = client.get("/description", query_string={"podcast_id": 3})
+    assert second.data == first.data
+    assert get_cache_stats()['pages'].hits == before.hits + 1
+
+    auth.register()
+    auth.login()
+    client.post("/add_review", data={"description": "Great show", "rating": 5, "podcast_id": 3})
+    client.get("/authentication/logout")
+    response = client.get("/description", query_string={"podcast_id": 3})
+    assert b"Great show" in response.data
+
+
+def test_description_shows_any_existing_podcast_id(client):
+    repository.repo_instance.add_podcast(Podcast(4321, Author(4321, "Sparse Author"), "Sparse Show"))
+    response = client.get("/description", query_string={"podcast_id": 4321})
+    assert b"Sparse Show" in response.data
+    assert client.get("/description", query_string={"podcast_id": 0}).status_code == 404
+    assert client.get("/description", query_string={"podcast_id": 4322}).status_code == 404
+
+
+def test_description_is_cached_for_cookieless_visitors_with_csrf_enabled():
+    app = create_app({"TESTING": True, "TEST_DATA_PATH": TEST_DATA_PATH, "REPOSITORY": "memory",
+                      "SNAPSHOT_PATH": None})
+    crawler = app.test_client(use_cookies=False)
+    first = crawler.get("/description", query_string={"podcast_id": 2})
+    before = get_cache_stats()['pages']
+    second = crawler.get("/description", query_string={"podcast_id": 2})
+    assert "Set-Cookie" not in first.headers and "Set-Cookie" not in second.headers
+    assert second.data == first.data
+    assert get_cache_stats()['pages'].hits == before.hits + 1
+
+
+def test_memory_app_starts_from_catalogue_snapshot(tmp_path):
+    snapshot_path = tmp_path / "catalogue.snapshot"
+    test_config = {"TESTING": True, "TEST_DATA_PATH": TEST_DATA_PATH, "WTF_CSRF_ENABLED": False,
+                   "REPOSITORY": "memory", "SNAPSHOT_PATH": snapshot_path}
+    create_app(test_config)
+    assert snapshot_path.exists()
+
+    with patch('podcast.adapters.repository_populate.populate_data') as mock_populate_data:
+        response = create_app(test_config).test_client().get("/description", query_string={"podcast_id": 2})
+        mock_populate_data.assert_not_called()
+    assert response.status_code == 200
+    assert b"Brian Denny Radio" in response.data
+
+
+def test_cache_stats_route_only_in_debug_mode(client):
+    assert client.get("/debug/cache-stats").status_code == 404
+
+    debug_client = create_app({"TESTING": True, "DEBUG": True, "TEST_DATA_PATH": TEST_DATA_PATH,
+                               "REPOSITORY": "memory", "SNAPSHOT_PATH": None}).test_client()
+    debug_client.get("/browse")
+    stats = debug_client.get("/debug/cache-stats").get_json()
+    assert stats['pages'] == get_cache_stats()['pages']._asdict()
+    assert set(stats['category_nav']) == {'hits', 'misses', 'evictions'}
+
+
+def test_search_episodes(client):
+    response = client.get('/results?q=star+trek&field=episode')
+    assert response.status_code == 200
+    assert b'Episodes Matching "star trek"' in response.data
+    assert b'#05: Comixology, Runaways, and Star Trek' in response.data
+    assert b'Brian Denny Radio' in response.data
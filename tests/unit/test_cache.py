@@ -0,0 +1,138 @@
+import pytest
+from flask import Flask, request, session
+from jinja2 import DictLoader, Environment
+
+from podcast.adapters.memory_repository import MemoryRepository
+from podcast.domainmodel.model import Category
+from podcast.utilities.cache import FragmentCacheExtension, PageCache, VersionedCache, fragment_cache, get_cache_stats
+
+
+def test_versioned_cache_recomputes_when_the_version_changes(in_memory_repo):
+    computed = []
+
+    def compute(repo):
+        computed.append(repo)
+        return repo.get_categories()
+
+    cache = VersionedCache('test_categories', 'categories', compute)
+    assert cache.get(in_memory_repo) is cache.get(in_memory_repo)
+    assert len(computed) == 1
+    assert cache.stats == (1, 1, 0)
+
+    in_memory_repo.add_category(Category(99, "Zoology"))
+    assert cache.get(in_memory_repo)[-1].name == "Zoology"
+    assert cache.stats == (1, 2, 0)
+
+    # Another repository never gets the first one's value
+    assert cache.get(MemoryRepository()) == []
+    assert get_cache_stats()['test_categories'] == (1, 3, 0)
+
+
+def test_repository_version_changes_with_categories(in_memory_repo):
+    version = in_memory_repo.get_version('categories')
+    in_memory_repo.add_category(Category(99, "Zoology"))
+    assert in_memory_repo.get_version('categories') == version + 1
+    assert in_memory_repo.get_version('other') == 0
+
+
+@pytest.fixture
+def page_app(in_memory_repo):
+    app = Flask(__name__)
+    app.secret_key = "test"
+    cache = PageCache('test_pages', max_bytes=15)
+    rendered = []
+
+    @app.route('/page')
+    @cache.cached()
+    def page():
+        rendered.append(request.args.get('id'))
+        return f"page {request.args.get('id')}"
+
+    @app.route('/login')
+    def login():
+        session['username'] = "testUser1"
+        return "logged in"
+
+    return app, cache, rendered
+
+
+def test_page_cache_serves_anonymous_pages_from_memory(page_app, in_memory_repo):
+    app, cache, rendered = page_app
+    client = app.test_client()
+    assert client.get('/page?id=1&x=2').data == b"page 1"
+    assert client.get('/page?x=2&id=1').data == b"page 1"
+    assert rendered == ['1']
+    assert cache.stats == (1, 1, 0)
+
+    in_memory_repo.add_category(Category(99, "Zoology"))
+    client.get('/page?id=1&x=2')
+    assert rendered == ['1', '1']
+
+
+def test_page_cache_evicts_least_recently_used_pages(page_app):
+    app, cache, rendered = page_app
+    client = app.test_client()
+    for page_id in ('1', '2', '1', '3'):
+        client.get('/page', query_string={'id': page_id})
+    # Only two pages of 6 bytes fit, page 2 was used least recently when page 3 came in
+    assert cache.size == 12
+    assert cache.stats.evictions == 1
+    client.get('/page', query_string={'id': '1'})
+    client.get('/page', query_string={'id': '2'})
+    assert rendered == ['1', '2', '3', '2']
+
+
+def test_page_cache_is_bypassed_for_logged_in_users(page_app):
+    app, cache, rendered = page_app
+    client = app.test_client()
+    client.get('/login')
+    client.get('/page?id=1')
+    client.get('/page?id=1')
+    assert rendered == ['1', '1']
+    assert cache.stats == (0, 0, 0)
+
+
+def test_page_cache_expires_pages(in_memory_repo):
+    app = Flask(__name__)
+    app.secret_key = "test"
+    cache = PageCache('test_expiring_pages')
+    rendered = []
+
+    @app.route('/page')
+    @cache.cached(max_age=0)
+    def page():
+        rendered.append(True)
+        return "page"
+
+    client = app.test_client()
+    client.get('/page')
+    client.get('/page')
+    assert len(rendered) == 2
+
+
+def test_cache_tag_renders_fragments_once_per_key(in_memory_repo):
+    fragment_cache.clear()
+    rendered = []
+    environment = Environment(loader=DictLoader({'rows.html': (
+        "{% for episode in episodes %}"
+        "{% cache 'row', episode.id %}{{ render(episode) }}{% endcache %}"
+        "{% if episode.id in playlist %}-{% else %}+{% endif %};"
+        "{% endfor %}")}), extensions=[FragmentCacheExtension])
+    template = environment.get_template('rows.html')
+
+    def render(episode):
+        rendered.append(episode.id)
+        return episode.title
+
+    episodes = in_memory_repo.get_podcast(3).episodes
+    assert template.render(episodes=episodes, playlist=[], render=render) == \
+        "Caller Of The Week Part 1.+;Caller Of The Week Part 2.+;"
+    # Another user's playlist only changes the markup outside the tag
+    assert template.render(episodes=episodes, playlist=[4], render=render) == \
+        "Caller Of The Week Part 1.-;Caller Of The Week Part 2.+;"
+    assert rendered == [4, 3]
+
+    in_memory_repo.add_category(Category(99, "Zoology"))
+    template.render(episodes=episodes, playlist=[], render=render)
+    assert rendered == [4, 3, 4, 3]
+    assert get_cache_stats()['fragments'].hits >= 2
@@ -1,6 +1,10 @@
 from pathlib import Path
 
-from podcast.adapters.datareader.csvdatareader import CSVDataReader
+import pytest
+
+from podcast.adapters.datareader import csvdatareader
+from podcast.adapters.datareader.csvdatareader import CSVDataReader, split_csv_into_chunks, parse_episode_chunk
+from podcast.adapters.interning import InternTable
 
 
 def test_csv_data_reader_load_podcasts_authors_categories(data_path: Path, csv_reader: CSVDataReader):
@@ -55,3 +59,113 @@ def test_csv_data_reader_get_podcast_by_id(data_path: Path, csv_reader: CSVDataR
 
     podcast3 = csv_reader.get_podcast_by_id(404)
     assert podcast3 is None
+
+
+def test_csv_data_reader_iter_episode_batches(data_path: Path, csv_reader: CSVDataReader):
+    csv_reader.load_podcasts_authors_categories(data_path)
+    batches = list(csv_reader.iter_episode_batches(data_path, batch_size=3))
+    assert [len(batch) for batch in batches] == [3, 1]
+    assert batches[0][0] == (1, 404, "Choir", "https://anchor.fm/s/12e5a58/podcast/download/66596/https%3A%2F%2Fs3-us-"
+                                              "west-2.amazonaws.com%2Fanchor-data%2Fstationexports%2Fpodcasts%2FChoir-"
+                                              "140563529b196.m4a", 266, "Choir", "2017-12-01 10:03:18")
+
+
+def test_csv_data_reader_build_episodes_matches_load_episodes(data_path: Path, csv_reader: CSVDataReader):
+    csv_reader.load_podcasts_authors_categories(data_path)
+    streamed_episodes = []
+    for batch in csv_reader.iter_episode_batches(data_path):
+        streamed_episodes.extend(csv_reader.build_episodes(batch))
+
+    loaded_reader = CSVDataReader()
+    loaded_reader.load_podcasts_authors_categories(data_path)
+    loaded_reader.load_episodes(data_path)
+
+    assert streamed_episodes == loaded_reader.dataset_of_episodes
+    assert csv_reader.dataset_of_episodes == streamed_episodes
+    for streamed, loaded in zip(streamed_episodes, loaded_reader.dataset_of_episodes):
+        assert (streamed.title, streamed.url, streamed.length, streamed.date) == \
+               (loaded.title, loaded.url, loaded.length, loaded.date)
+    assert csv_reader.get_podcast_by_id(2).episodes == [streamed_episodes[1]]
+
+
+def test_split_csv_into_chunks_keeps_quoted_newlines_together(tmp_path: Path):
+    episodes_file = tmp_path / "episodes.csv"
+    rows = [f'{i},1,Title {i},http://audio/{i},{i},"Line one\nline, ""two"" of {i}",2017-12-01 10:03:18+00'
+            for i in range(1, 41)]
+    episodes_file.write_text("id,podcast_id,title,audio,audio_length,description,pub_date\n" + "\n".join(rows),
+                             encoding="utf-8")
+
+    chunks = split_csv_into_chunks(str(episodes_file), 6)
+    assert len(chunks) == 6
+    parsed = [row for start, end in chunks for row in parse_episode_chunk(str(episodes_file), start, end)]
+    assert [row[0] for row in parsed] == list(range(1, 41))
+    assert parsed[-1][5] == 'Line one\nline, "two" of 40'
+
+
+def test_csv_data_reader_iter_episode_batches_in_process_pool(tmp_path: Path, monkeypatch):
+    episodes_file = tmp_path / "episodes.csv"
+    rows = [f'{i},1,Title {i},http://audio/{i},{i},"Multi\nline {i}",2017-12-01 10:03:18+00' for i in range(1, 101)]
+    episodes_file.write_text("id,podcast_id,title,audio,audio_length,description,pub_date\n" + "\n".join(rows),
+                             encoding="utf-8")
+    monkeypatch.setattr(csvdatareader, "MIN_CHUNK_BYTES", 256)
+
+    batches = list(CSVDataReader().iter_episode_batches(tmp_path, workers=3, batch_size=30))
+    assert [row[0] for batch in batches for row in batch] == list(range(1, 101))
+    assert all(len(batch) <= 30 for batch in batches)
+
+
+def test_intern_table_shares_repeated_values():
+    intern = InternTable()
+    first, second = "".join(["Eng", "lish"]), "".join(["Engl", "ish"])
+    assert first is not second
+    assert intern(first) is first and intern(second) is first
+    assert intern(100_000) == 100_000
+    assert (len(intern), intern.repeats) == (2, 1)
+    assert intern.saved_bytes > 0
+
+
+def test_csv_data_reader_shares_repeated_values(data_path: Path, csv_reader: CSVDataReader):
+    csv_reader.load_podcasts_authors_categories(data_path)
+    csv_reader.load_episodes(data_path)
+    languages = {podcast.language for podcast in csv_reader.dataset_of_podcasts}
+    assert len({id(podcast.language) for podcast in csv_reader.dataset_of_podcasts}) == len(languages)
+
+
+def test_csv_data_reader_rejects_unexpected_columns(tmp_path: Path):
+    (tmp_path / "episodes.csv").write_text("id,podcast_id,title\n1,1,Title\n")
+    with pytest.raises(ValueError):
+        list(CSVDataReader(compact=True).iter_episode_batches(tmp_path))
+
+
+def test_csv_data_reader_joins_sparse_unordered_ids(data_path: Path, tmp_path: Path):
+    podcast_lines = (data_path / "podcasts.csv").read_text(encoding='utf-8-sig').splitlines(keepends=True)
+    # The last podcast first, with an id far past the number of rows
+    (tmp_path / "podcasts.csv").write_text(podcast_lines[0] + podcast_lines[-1].replace("4,", "404,", 1)
+                                           + "".join(podcast_lines[1:-1]), encoding='utf-8')
+    (tmp_path / "episodes.csv").write_text((data_path / "episodes.csv").read_text(encoding='utf-8-sig'),
+                                           encoding='utf-8')
+    for compact in (False, True):
+        reader = CSVDataReader(compact)
+        reader.load_podcasts_authors_categories(tmp_path)
+        reader.load_episodes(tmp_path)
+        assert reader.get_podcast_by_id(4) is None
+        assert reader.get_podcast_by_id(404).title == "Tallin Messages"
+        assert [episode.id for episode in reader.get_podcast_by_id(404).episodes] == [1]
+        assert [episode.id for episode in reader.get_podcast_by_id(3).episodes] == [4, 3]
+
+
+def test_csv_data_reader_rejects_empty_titles_on_both_paths(data_path: Path, tmp_path: Path):
+    podcast_lines = (data_path / "podcasts.csv").read_text(encoding='utf-8-sig').splitlines(keepends=True)
+    episode_lines = (data_path / "episodes.csv").read_text(encoding='utf-8-sig').splitlines(keepends=True)
+    empty_podcast_title = podcast_lines[1].replace("D-Hour Radio Network", " ", 1)
+    empty_category = podcast_lines[1].replace("Professional", "|", 1)
+    empty_episode_title = "1,1, ,http://audio,10,Description,2017-12-01 10:03:18+00\n"
+    for podcast_line, episode_line in ((empty_podcast_title, ""), (empty_category, ""),
+                                       (podcast_lines[1], empty_episode_title)):
+        (tmp_path / "podcasts.csv").write_text(podcast_lines[0] + podcast_line, encoding='utf-8')
+        (tmp_path / "episodes.csv").write_text(episode_lines[0] + episode_line, encoding='utf-8')
+        for compact in (False, True):
+            reader = CSVDataReader(compact)
+            with pytest.raises(ValueError):
+                reader.load_podcasts_authors_categories(tmp_path)
+                reader.load_episodes(tmp_path)
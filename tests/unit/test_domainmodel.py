@@ -1,6 +1,8 @@
 import pytest
 
 from podcast.domainmodel.model import Author, Podcast, Category, User, PodcastSubscription, Episode, Review, Playlist
+from podcast.domainmodel.model import IndexedCollection, RatingSummary, format_timestamp, parse_timestamp
+from podcast.domainmodel.model import CompactAuthor, CompactPodcast, CompactEpisode
 
 
 def test_author_initialization():
@@ -714,3 +716,152 @@ def test_playlist_add_remove_episode(my_playlist, my_podcast):
 
     with pytest.raises(TypeError):
         my_playlist.delete_episode("This is a string not an Episode")
+
+
+def test_parse_and_format_timestamp():
+    assert parse_timestamp("2017-12-01 10:03:18") == 1512122598
+    assert parse_timestamp("2017-12-01 10:03:18+00") == 1512122598
+    assert parse_timestamp("2017-12-01 12:03:18+02") == 1512122598
+    assert format_timestamp(1512122598) == "2017-12-01 10:03:18"
+    assert parse_timestamp("Unspecified") is None
+    assert parse_timestamp(None) is None
+
+
+def test_episode_timestamp():
+    podcast = Podcast(1, Author(1, "Venus"), "Test1")
+    assert Episode(1, podcast, "Dated", length=10, date="2017-12-27 00:50:29+00").timestamp == 1514335829
+    episode = Episode(2, podcast, "Undated", length=10)
+    assert episode.timestamp is None
+    episode.date = "2020-01-01 00:00:00"
+    assert episode.timestamp == 1577836800
+    assert CompactEpisode.from_row(3, podcast, "Row", "", "", 10, "2020-01-01 00:00:00").timestamp == 1577836800
+
+
+def test_podcast_keeps_episodes_in_publication_order():
+    podcast = Podcast(1, Author(1, "Venus"), "Test1")
+    episode1 = Episode(1, podcast, "Second", length=10, date="2018-01-01 00:00:00")
+    episode2 = Episode(2, podcast, "First", length=10, date="2017-01-01 00:00:00")
+    episode3 = Episode(3, podcast, "Undated", length=10)
+    episode4 = Episode(4, podcast, "Also second", length=10, date="2018-01-01 00:00:00")
+    for episode in (episode3, episode1, episode4, episode2, episode1):
+        podcast.add_episode(episode)
+    assert podcast.episodes == [episode2, episode1, episode4, episode3]
+
+
+def test_rating_summary():
+    summary = RatingSummary().with_rating(5).with_rating(4).with_rating(5)
+    assert summary == RatingSummary(0, 0, 0, 1, 2)
+    assert summary.review_count == 3
+    assert summary.rating_sum == 14
+    assert summary.average_rating == 14 / 3
+    assert summary.without_rating(5).without_rating(5) == RatingSummary(0, 0, 0, 1, 0)
+    assert RatingSummary().average_rating == 0
+    with pytest.raises(ValueError):
+        summary.without_rating(5).without_rating(5).without_rating(5)
+
+    with pytest.raises(ValueError):
+        summary.with_rating(6)
+    with pytest.raises(ValueError):
+        summary.without_rating(0)
+
+
+def test_podcast_reviews_update_rating_summary(my_podcast):
+    user = User(1, "Shyamli", "pw12345")
+    review1 = Review(1, my_podcast, user, 4, "Good")
+    review2 = Review(2, my_podcast, user, 2, "Meh")
+    my_podcast.add_review(review1)
+    my_podcast.add_review(review2)
+    my_podcast.add_review(review1)
+    assert my_podcast.rating_summary == RatingSummary(0, 1, 0, 1, 0)
+    assert my_podcast.rating_summary.average_rating == 3
+
+    my_podcast.remove_review(review2)
+    my_podcast.remove_review(review2)
+    assert my_podcast.rating_summary == RatingSummary(0, 0, 0, 1, 0)
+
+
+def test_podcast_reviews_are_kept_in_rating_order(my_podcast):
+    user = User(1, "Shyamli", "pw12345")
+    for review_id, rating in enumerate([2, 5, 3, 5, 1], start=1):
+        my_podcast.add_review(Review(review_id, my_podcast, user, rating, "Review"))
+    assert [(review.rating, review.id) for review in my_podcast.reviews] == [(5, 2), (5, 4), (3, 3), (2, 1), (1, 5)]
+    my_podcast.add_review(Review(6, my_podcast, user, 4, "Review"))
+    assert [review.id for review in my_podcast.reviews[:3]] == [2, 4, 6]
+
+    my_podcast.reviews[0].rating = 1
+    assert [review.id for review in my_podcast.reviews] == [4, 6, 3, 1, 2, 5]
+    assert my_podcast.rating_summary == RatingSummary(2, 1, 1, 1, 1)
+    with pytest.raises(ValueError):
+        my_podcast.reviews[0].rating = 6
+    assert my_podcast.rating_summary == RatingSummary(2, 1, 1, 1, 1)
+
+
+def test_indexed_collection():
+    collection = IndexedCollection(["b", "a", "c", "a"])
+    assert collection == ["b", "a", "c"]
+    assert "a" in collection and "d" not in collection
+    assert len(collection) == 3
+    assert collection[0] == "b" and collection[1:] == ["a", "c"]
+
+    collection.remove("a")
+    collection.append("d")
+    assert collection == ["b", "c", "d"]
+    assert list(reversed(collection)) == ["d", "c", "b"]
+
+    with pytest.raises(ValueError):
+        collection.remove("a")
+
+    collection.clear()
+    assert collection == [] and not collection
+
+
+def test_indexed_collection_with_key():
+    collection = IndexedCollection([5, 1, 4], key=lambda number: -number)
+    collection.append(3)
+    assert collection == [5, 4, 3, 1]
+    collection.remove(4)
+    assert collection == [5, 3, 1]
+    assert 4 not in collection
+
+
+def test_indexed_collection_with_key_keeps_order_through_many_appends():
+    collection = IndexedCollection(range(0, 200, 2), key=lambda number: number)
+    assert collection[:2] == [0, 2]
+    collection.append(3)
+    assert collection[:4] == [0, 2, 3, 4]
+    collection.extend(range(199, 0, -2))
+    assert collection == list(range(200))
+    collection.append(-1)
+    collection.remove(-1)
+    assert collection[0] == 0 and len(collection) == 200
+
+
+def test_compact_entities_behave_like_regular_ones():
+    author = CompactAuthor(1, "Joe Toste")
+    podcast = CompactPodcast(100, author, "Joe Toste Podcast")
+    episode = CompactEpisode(1, podcast, "Episode 1", length=60, date="2020-01-01 00:00:00")
+    author.add_podcast(podcast)
+    podcast.add_episode(episode)
+    assert not hasattr(episode, '__dict__')
+    assert isinstance(podcast, Podcast) and isinstance(episode, Episode)
+    assert episode == Episode(1, podcast, "Another title", length=60) and Podcast(100, author) == podcast
+    assert repr(episode) == "<Episode 1: 'Episode 1' in Podcast: Joe Toste Podcast>"
+    assert podcast.episodes == [episode] and author.podcast_list == [podcast]
+
+    playlist = Playlist(1, User(1, "shyamli", "pw12345"), "My Playlist")
+    playlist.add_episode(episode)
+    assert episode in playlist.episodes
+    with pytest.raises(ValueError):
+        CompactEpisode(2, podcast, "", length=60)
+
+
+def test_compact_from_row_matches_the_validated_constructors():
+    author = CompactAuthor.from_row(1, "Joe Toste")
+    podcast = CompactPodcast.from_row(100, author, "Joe Toste Podcast", None, "", "", 42, "English")
+    episode = CompactEpisode.from_row(1, podcast, "Episode 1", "http://audio", "", 60, "2020-01-01 00:00:00")
+    podcast.episodes.append(episode)
+    assert author == CompactAuthor(1, "Joe Toste") and podcast == CompactPodcast(100, author)
+    assert (podcast.title, podcast.itunes_id, podcast.language) == ("Joe Toste Podcast", 42, "English")
+    assert episode == CompactEpisode(1, podcast, "Episode 1", length=60)
+    assert (episode.title, episode.length, episode.timestamp) == ("Episode 1", 60, 1577836800)
+    assert podcast.episodes == [episode] and not hasattr(episode, '__dict__')
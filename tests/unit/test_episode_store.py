@@ -0,0 +1,87 @@
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+from podcast.adapters import snapshot
+from podcast.adapters.episode_store import EpisodeStore, EpisodeView, add_episode_view
+from podcast.adapters.memory_repository import MemoryRepository
+from podcast.adapters.search_index import InvertedIndex, search_indexes
+from podcast.domainmodel.model import Author, Episode, Podcast
+
+
+def test_episode_store_reads_texts_before_and_after_sealing(tmp_path: Path):
+    store = EpisodeStore(tmp_path / "episodes.store")
+    podcast = Podcast(1, Author(1, "Author"), "Podcast")
+    episode = add_episode_view(store, 7, podcast, " Ünïcode title ", "http://audio", "A description", 60,
+                               "2020-01-01 00:00:00")
+    assert episode.title == "Ünïcode title"
+    store.seal()
+    assert (episode.title, episode.url, episode.description) == ("Ünïcode title", "http://audio", "A description")
+    assert (episode.id, episode.podcast, episode.length, episode.date) == (7, podcast, 60, "2020-01-01 00:00:00")
+    assert len(store) == 1
+    with pytest.raises(ValueError):
+        store.append(8, "Another", "", "")
+    store.close()
+
+
+def test_episode_views_are_read_only_episodes():
+    store = EpisodeStore()
+    podcast = Podcast(1, Author(1, "Author"), "Podcast")
+    episode = add_episode_view(store, 1, podcast, "Title", "", "", 60, "2020-01-01 00:00:00")
+    store.seal()
+    assert isinstance(episode, Episode) and type(episode) is EpisodeView
+    assert episode == Episode(1, podcast, "Other title", length=60)
+    assert not hasattr(episode, '__dict__')
+    with pytest.raises(AttributeError):
+        episode.title = "New title"
+    with pytest.raises(ValueError):
+        add_episode_view(EpisodeStore(), 2, podcast, " ", "", "", 60, "2020-01-01 00:00:00")
+
+
+def test_empty_episode_store_can_be_sealed():
+    store = EpisodeStore()
+    store.seal()
+    assert len(store) == 0
+
+
+def test_sealed_episode_store_is_searched_like_an_inverted_index():
+    store = EpisodeStore()
+    index = InvertedIndex()
+    podcast = Podcast(1, Author(1, "Author"), "Podcast")
+    texts = [(3, "Radio days", "A show about radio"), (1, "Radio radio", ""), (2, "News", "Today's néws on the radio"),
+             (3, "Duplicate id", "Indexed once, like the repository keeps the first episode")]
+    for episode_id, title, description in texts:
+        add_episode_view(store, episode_id, podcast, title, "", description, 60, "2020-01-01 00:00:00")
+        if index.document_length(episode_id) is None:
+            index.add(episode_id, title, description)
+    store.seal()
+    for query in ("radio", "news", "radio news", "duplicate", "zebra", ""):
+        assert search_indexes([store.search_index], query) == index.search(query)
+    assert search_indexes([store.search_index], "radio", 1, 1) == index.search("radio", 1, 1)
+    assert len(store.search_index) == 3 and store.search_index.total_length == index.total_length
+
+
+def test_memory_repository_episodes_are_views(in_memory_repo):
+    episode = in_memory_repo.get_episode(1)
+    assert type(episode) is EpisodeView
+    assert (episode.title, episode.length, episode.date) == ("Choir", 266, "2017-12-01 10:03:18")
+    assert all(type(episode) is EpisodeView for episode in in_memory_repo.get_podcast(3).episodes)
+
+
+def test_memory_repository_searches_episode_views_without_reading_their_texts(in_memory_repo):
+    with patch.object(EpisodeStore, 'text', side_effect=AssertionError("episode text read")):
+        episodes, total = in_memory_repo.search_episodes("star trek")
+    assert [episode.id for episode in episodes] == [2] and total == 1
+
+
+def test_snapshot_episodes_are_moved_into_the_store(in_memory_repo, data_path: Path, tmp_path: Path):
+    snapshot_path = tmp_path / "catalogue.snapshot"
+    fingerprint = snapshot.source_fingerprint(data_path)
+    in_memory_repo.write_snapshot(snapshot_path, fingerprint)
+
+    store = EpisodeStore()
+    repo = MemoryRepository()
+    assert repo.load_snapshot(snapshot_path, fingerprint, store) is True
+    assert len(store) == in_memory_repo.get_number_of_episodes()
+    assert repo.get_episode(3).description == in_memory_repo.get_episode(3).description
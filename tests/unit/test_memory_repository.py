@@ -1,4 +1,8 @@
-from podcast.domainmodel.model import Podcast, Author, Episode, User, Playlist
+import pytest
+
+from podcast.adapters.memory_repository import MemoryRepository
+from podcast.adapters.repository import AbstractRepository
+from podcast.domainmodel.model import Podcast, Author, Category, Episode, User, Playlist
 
 
 def test_memory_repository_can_retrieve_podcasts(in_memory_repo):
@@ -97,6 +101,16 @@ def test_memory_repository_add_episode(in_memory_repo):
     assert in_memory_repo.get_episode(5) == episode
 
 
+def test_memory_repository_lookups_with_sparse_unordered_ids(in_memory_repo):
+    podcast = Podcast(900, Author(9, "Author"), "Sparse")
+    in_memory_repo.add_podcast(podcast)
+    episode = Episode(7000, podcast, "Sparse episode", length=20)
+    in_memory_repo.add_episode(episode)
+    assert in_memory_repo.get_podcast(900) == podcast
+    assert in_memory_repo.get_episode(7000) == episode
+    assert in_memory_repo.get_podcast(5) is None and in_memory_repo.get_episode(6) is None
+
+
 def test_csv_data_reader_retrieve_category_podcasts(in_memory_repo):
     category = in_memory_repo.get_categories()[-1]
     assert category.name == "Society & Culture"
@@ -141,6 +155,29 @@ def test_repository_can_make_and_add_to_playlist(in_memory_repo):
     assert len(user1.playlist.episodes) == 1
 
 
+def test_repository_add_episodes_to_playlist_and_clear_playlist(in_memory_repo):
+    in_memory_repo.add_user('test5', 'abcdE12')
+    in_memory_repo.add_to_playlist('test5', in_memory_repo.get_episode(3))
+    assert in_memory_repo.add_episodes_to_playlist('test5', [4, 3, 999, 2]) == 2
+    playlist = in_memory_repo.get_users_playlist('test5')
+    assert [episode.id for episode in playlist.episodes] == [3, 4, 2]
+
+    in_memory_repo.clear_playlist('test5')
+    assert len(playlist.episodes) == 0
+
+    with pytest.raises(ValueError):
+        in_memory_repo.add_episodes_to_playlist('nobody', [1])
+
+
+def test_repository_add_podcast_to_playlist(in_memory_repo):
+    in_memory_repo.add_user('test6', 'abcdE12')
+    in_memory_repo.add_to_playlist('test6', in_memory_repo.get_episode(3))
+    assert in_memory_repo.add_podcast_to_playlist('test6', 3) == 1
+    assert [episode.id for episode in in_memory_repo.get_users_playlist('test6').episodes] == [3, 4]
+    with pytest.raises(ValueError):
+        in_memory_repo.add_podcast_to_playlist('test6', 999)
+
+
 def test_repository_can_get_users_preexisting_playlist(in_memory_repo):
     in_memory_repo.add_user('test3', 'abcdE12')
     user1 = in_memory_repo.get_user('test3')
@@ -156,20 +193,20 @@ def test_repository_can_make_and_get_users_playlist(in_memory_repo):
 
 
 def test_repository_get_podcasts_by_category(in_memory_repo):
-    podcasts = in_memory_repo.get_podcasts_by_category('comedy')
+    podcasts, total = in_memory_repo.get_podcasts_by_category('comedy')
     assert 2 == len(podcasts)
     assert "<Podcast 2: 'Brian Denny Radio' by Brian Denny>" == repr(podcasts[0])
     assert "<Podcast 4: 'Tallin Messages' by Tallin Country Church>" == repr(podcasts[1])
 
 
 def test_repository_get_podcasts_by_author(in_memory_repo):
-    podcasts = in_memory_repo.get_podcasts_by_author('Brian')
+    podcasts, total = in_memory_repo.get_podcasts_by_author('Brian')
     assert "<Podcast 2: 'Brian Denny Radio' by Brian Denny>" == repr(podcasts[0])
     assert "<Podcast 3: 'Onde Road - Radio Popolare' by Brian Denny>" == repr(podcasts[1])
 
 
 def test_repository_get_podcasts_by_title(in_memory_repo):
-    podcasts = in_memory_repo.get_podcasts_by_title('Messages')
+    podcasts, total = in_memory_repo.get_podcasts_by_title('Messages')
     assert "<Podcast 4: 'Tallin Messages' by Tallin Country Church>" == repr(podcasts[0])
 
 
@@ -210,3 +247,173 @@ def test_repository_delete_review(in_memory_repo):
     in_memory_repo.delete_review(1)
     assert len(podcast.reviews) == 0
     assert len(user.reviews) == 0
+
+
+def test_repository_get_podcast_reviews(in_memory_repo):
+    podcast = in_memory_repo.get_podcast(3)
+    for number, rating in enumerate([3, 5, 1, 5], start=1):
+        in_memory_repo.add_user(f'reviewer{number}', 'Password1')
+        in_memory_repo.add_review(podcast, in_memory_repo.get_user(f'reviewer{number}'), rating, 'A review')
+    reviews, total = in_memory_repo.get_podcast_reviews(3, 1, 2)
+    assert [(review.rating, review.reviewer.username) for review in reviews] == [(5, 'reviewer4'), (3, 'reviewer1')]
+    assert total == 4
+    assert len(in_memory_repo.get_podcast_reviews(3)[0]) == 4
+    assert in_memory_repo.get_podcast_reviews(3, 4, 2) == ([], 4)
+    assert in_memory_repo.get_podcast_reviews(999) == ([], 0)
+
+
+def test_repository_reviews_update_rating_summary(in_memory_repo):
+    in_memory_repo.add_user('Bob', 'cars23')
+    user = in_memory_repo.get_user('Bob')
+    in_memory_repo.add_user('Alice', 'bikes45')
+    podcast = in_memory_repo.get_podcast(1)
+    in_memory_repo.add_review(podcast, user, 5, 'Intriguing!')
+    in_memory_repo.add_review(podcast, in_memory_repo.get_user('Alice'), 3, 'Fine')
+    assert podcast.rating_summary.review_count == 2
+    assert podcast.rating_summary.average_rating == 4
+
+    in_memory_repo.delete_review(podcast.reviews[0].id)
+    assert podcast.rating_summary.review_count == 1
+
+    with pytest.raises(ValueError):
+        in_memory_repo.add_review(podcast, user, 6, 'Off the scale')
+    assert len(podcast.reviews) == 1
+
+
+def test_repository_get_user_is_case_sensitive_by_default(in_memory_repo):
+    in_memory_repo.add_user("Dave", "123456789")
+    assert in_memory_repo.get_user("Dave").username == "Dave"
+    assert in_memory_repo.get_user("dave") is None
+    assert in_memory_repo.get_user(None) is None
+
+
+def test_repository_get_user_in_case_insensitive_mode():
+    repo = MemoryRepository(case_insensitive_usernames=True)
+    repo.add_user("Dave", "123456789")
+    repo.add_user("DAVE", "987654321")
+    assert repo.get_user("dave").id == 1
+    assert repo.get_user("DaVe").password == "123456789"
+    assert repo.get_user("prince") is None
+
+
+def test_repository_category_index_follows_add_podcast(in_memory_repo):
+    comedy = next(category for category in in_memory_repo.get_categories() if category.name == "Comedy")
+    podcast = Podcast(5, Author(5, "Shakespear"), "A Comedy Of Errors", "", "", "", 52, "")
+    podcast.add_category(comedy)
+    in_memory_repo.add_podcast(podcast)
+    assert in_memory_repo.get_podcasts_ids_for_category("Comedy") == [5, 2, 4]
+    assert in_memory_repo.get_podcasts_ids_for_category("Drama") == []
+
+
+def test_repository_get_podcasts_by_category_matching_several_categories(in_memory_repo):
+    podcasts, total = in_memory_repo.get_podcasts_by_category('o')
+    assert [podcast.id for podcast in podcasts] == [2, 1, 3, 4]
+
+
+def test_memory_repository_get_podcasts_after(in_memory_repo):
+    assert [podcast.id for podcast in in_memory_repo.get_podcasts_after(None, 2)] == [2, 1]
+    assert [podcast.id for podcast in in_memory_repo.get_podcasts_after(1, 2)] == [3, 4]
+    assert in_memory_repo.get_podcasts_after(4, 2) == []
+    assert in_memory_repo.get_podcasts_after(404, 2) == []
+    podcast = Podcast(5, Author(5, "Shakespear"), "brian denny radio", "", "", "", 52, "")
+    in_memory_repo.add_podcast(podcast)
+    assert in_memory_repo.get_podcasts_after(2, 1) == [podcast]
+
+
+def test_memory_repository_get_page(in_memory_repo):
+    page = in_memory_repo.get_page(1, 3)
+    assert [podcast.id for podcast in page.podcasts] == [2, 1, 3]
+    assert page.total == 4
+    assert page.has_next is True and page.next_page == 2
+    assert page.has_previous is False and page.previous_page == 1
+    assert page.last_page == 2
+    page = in_memory_repo.get_page(2, 3)
+    assert [podcast.id for podcast in page.podcasts] == [4]
+    assert page.has_next is False and page.next_page == 2
+
+
+def test_memory_repository_search_podcasts(in_memory_repo):
+    podcasts, total = in_memory_repo.search_podcasts("radio")
+    assert [podcast.id for podcast in podcasts] == [1, 3, 2]
+    assert total == 3
+    podcasts, total = in_memory_repo.search_podcasts("radio", 1, 1)
+    assert [podcast.id for podcast in podcasts] == [3]
+    assert total == 3
+    assert in_memory_repo.search_podcasts("network radio")[1] == 1
+    assert in_memory_repo.search_podcasts("") == ([], 0)
+
+
+def test_memory_repository_search_indexes_podcasts_and_episodes_added_later(in_memory_repo):
+    assert in_memory_repo.search_podcasts("phoenix") == ([], 0)
+    podcast = Podcast(5, Author(5, "Shakespear"), "Phoenix Rising", "", "", "", 52, "")
+    in_memory_repo.add_podcast(podcast)
+    assert in_memory_repo.search_podcasts("phoenix") == ([podcast], 1)
+    assert in_memory_repo.search_episodes("phoenix") == ([], 0)
+    episode = Episode(5, podcast, "The phoenix returns", "", "", 10, "2024-01-01 00:00:00")
+    in_memory_repo.add_episode(episode)
+    assert in_memory_repo.search_episodes("phoenix") == ([episode], 1)
+
+
+def test_memory_repository_search_episodes(in_memory_repo):
+    episodes, total = in_memory_repo.search_episodes("star trek")
+    assert [episode.id for episode in episodes] == [2]
+    assert total == 1
+    episodes, total = in_memory_repo.search_episodes("the", 0, 2)
+    assert [episode.id for episode in episodes] == [3, 4]
+    assert total == 3
+
+
+def test_memory_repository_searches_return_one_page_and_the_total(in_memory_repo):
+    podcasts, total = in_memory_repo.get_podcasts_by_title('radio', 1, 1)
+    assert [podcast.id for podcast in podcasts] == [1]
+    assert total == 3
+    podcasts, total = in_memory_repo.get_podcasts_by_author('brian', 0, 1)
+    assert [podcast.id for podcast in podcasts] == [2]
+    assert total == 2
+    podcasts, total = in_memory_repo.get_podcasts_by_category('o', 2, 10)
+    assert [podcast.id for podcast in podcasts] == [3, 4]
+    assert total == 4
+    assert in_memory_repo.get_podcasts_by_language('english', 10, 10) == ([], 3)
+    assert in_memory_repo.get_podcasts_by_title('no such title') == ([], 0)
+
+
+def test_memory_repository_get_podcast_detail(in_memory_repo):
+    in_memory_repo.add_user('listener', 'Password1')
+    in_memory_repo.add_to_playlist('listener', in_memory_repo.get_episode(3))
+    detail = in_memory_repo.get_podcast_detail(3, 1, 'listener')
+    assert detail.podcast.id == 3
+    assert [episode.id for episode in detail.episodes] == [4, 3]
+    assert detail.episodes_in_playlist == {3}
+    assert (detail.total_pages, detail.prev_episode_page, detail.next_episode_page) == (1, None, None)
+    detail = in_memory_repo.get_podcast_detail(3, 0, page_size=1)
+    assert [episode.id for episode in detail.episodes] == [4]
+    assert (detail.episode_page, detail.next_episode_page, detail.episodes_in_playlist) == (1, 2, set())
+    assert in_memory_repo.get_podcast_detail(404, 1) is None
+
+
+def test_memory_repository_holds_compact_entities(in_memory_repo):
+    podcast = in_memory_repo.get_podcast(3)
+    assert not hasattr(podcast, '__dict__') and not hasattr(podcast.episodes[0], '__dict__')
+    assert not hasattr(podcast.author, '__dict__') and not hasattr(podcast.categories[0], '__dict__')
+
+
+def test_memory_repository_bulk_load_matches_adding_one_by_one():
+    author = Author(1, "Author")
+    comedy, news = Category(1, "Comedy"), Category(2, "News")
+    podcasts = [Podcast(podcast_id, author, title) for podcast_id, title in
+                [(4, "beta"), (2, "Alpha"), (3, "alpha"), (1, "Beta"), (2, "Duplicate")]]
+    for podcast in podcasts[:3]:
+        podcast.add_category(comedy)
+    podcasts[3].add_category(news)
+    episodes = [Episode(episode_id, podcasts[0], f"Episode {episode_id}", length=60) for episode_id in (2, 1, 2)]
+
+    one_by_one, bulk = MemoryRepository(), MemoryRepository()
+    AbstractRepository.bulk_load(one_by_one, [author], podcasts, [comedy, news], episodes)
+    bulk.bulk_load([author], podcasts, [comedy, news], episodes)
+
+    assert [podcast.id for podcast in bulk.get_podcasts_by_page(1, 10)] == [2, 3, 1, 4]
+    assert bulk.get_podcasts_by_page(1, 10) == one_by_one.get_podcasts_by_page(1, 10)
+    assert bulk.get_podcasts_ids_for_category("Comedy") == one_by_one.get_podcasts_ids_for_category("Comedy")
+    assert bulk.get_number_of_episodes() == one_by_one.get_number_of_episodes() == 2
+    assert bulk.get_categories() == one_by_one.get_categories()
+    assert [podcast.id for podcast in bulk.search_podcasts("alpha")[0]] == [2, 3]
@@ -0,0 +1,51 @@
+from podcast.adapters.search_index import InvertedIndex, tokenize
+
+
+def test_tokenize_lower_cases_and_strips_punctuation_and_diacritics():
+    assert tokenize("#05: Comixology, Runaways & Star-Trek") == ['05', 'comixology', 'runaways', 'star', 'trek']
+    assert tokenize("Café Déjà Vu") == ['cafe', 'deja', 'vu']
+    assert tokenize("snake_case") == ['snake', 'case']
+    assert tokenize(None) == []
+
+
+def test_inverted_index_matches_documents_with_every_query_token():
+    index = InvertedIndex()
+    index.add(1, "Radio Network", "Talk radio")
+    index.add(2, "Brian Denny Radio", None)
+    index.add(3, "Tallin Messages", "Church")
+    assert index.search("radio network") == ([1], 1)
+    assert index.search("RADIO")[1] == 2
+    assert index.search("radio church") == ([], 0)
+    assert index.search("!!!") == ([], 0)
+
+
+def test_inverted_index_ranks_with_bm25():
+    index = InvertedIndex()
+    index.add(1, "radio", "a long description about something else entirely")
+    index.add(2, "radio radio", None)
+    index.add(3, "news", None)
+    # More occurrences in a shorter document rank higher, equal scores are ordered by id
+    assert index.search("radio") == ([2, 1], 2)
+    index.add(4, "radio radio", None)
+    assert index.search("radio") == ([2, 4, 1], 3)
+
+
+def test_inverted_index_paginates_and_reports_the_total():
+    index = InvertedIndex()
+    for document_id in range(1, 8):
+        index.add(document_id, "episode", str(document_id))
+    assert index.search("episode", 0, 3) == ([1, 2, 3], 7)
+    assert index.search("episode", 6, 3) == ([7], 7)
+    assert index.search("episode", 9, 3) == ([], 7)
+
+
+def test_inverted_index_replaces_and_removes_documents():
+    index = InvertedIndex()
+    index.add(1, "old title", None)
+    index.add(1, "new title", None)
+    assert index.search("old") == ([], 0)
+    assert index.search("new") == ([1], 1)
+    index.remove(1)
+    index.remove(1)
+    assert index.search("title") == ([], 0)
+    assert len(index) == 0
@@ -3,10 +3,12 @@ import pytest
 from podcast.browse import services as browse_services
 from podcast.description import services as description_services
 from podcast.home import services as home_services
+from podcast.home.feed import HomeFeed
 from podcast.user import services as user_services
 from podcast.utilities import services as utilities_services
 from podcast.authentication import services as authentication_services
 from podcast.authentication.services import AuthenticationException
+from podcast.adapters.memory_repository import MemoryRepository
 from podcast.domainmodel.model import Podcast, Author, Episode, User
 from podcast.search import services as search_services
 
@@ -54,6 +56,52 @@ def test_get_random_podcasts_info(in_memory_repo):
     assert (dict3[0]['id'] == 1 or dict3[0]['id'] == 2 or dict3[0]['id'] == 3 or dict3[0]['id'] == 4)
 
 
+def test_build_feed_pool_samples_existing_ids_in_one_fetch():
+    repo = MemoryRepository()
+    author = Author(1, "Joe")
+    for podcast_id in (5, 10, 20):
+        repo.add_podcast(Podcast(podcast_id, author, f"Podcast {podcast_id}"))
+    with patch.object(repo, 'get_podcasts_by_id', wraps=repo.get_podcasts_by_id) as get_podcasts_by_id:
+        feeds = home_services.build_feed_pool(repo, 4)
+    assert get_podcasts_by_id.call_count == 1
+    assert len(feeds) == 4
+    for feed in feeds:
+        assert sorted(podcast['id'] for podcast in feed) == [5, 10, 20]
+        assert all(podcast['author_name'] == "Joe" for podcast in feed)
+
+
+def test_home_feed_rotates_through_its_pool(in_memory_repo):
+    builds = []
+
+    def build_pool(repo, pool_size):
+        builds.append(repo)
+        return [[{'id': len(builds) * 10 + feed}] for feed in range(pool_size)]
+
+    home_feed = HomeFeed(build_pool, pool_size=2, refresh_interval=60)
+    assert home_feed.next_feed(in_memory_repo) == [{'id': 10}]
+    assert home_feed.next_feed(in_memory_repo) == [{'id': 11}]
+    assert home_feed.next_feed(in_memory_repo) == [{'id': 10}]
+    assert len(builds) == 1
+
+    # Another repository gets a pool of its own straight away
+    assert home_feed.next_feed(MemoryRepository()) == [{'id': 20}]
+
+
+def test_home_feed_refreshes_a_stale_pool_in_the_background(in_memory_repo):
+    builds = []
+
+    def build_pool(repo, pool_size):
+        builds.append(repo)
+        return [[{'id': len(builds)}]]
+
+    home_feed = HomeFeed(build_pool, pool_size=1, refresh_interval=0)
+    assert home_feed.next_feed(in_memory_repo) == [{'id': 1}]
+    # The stale pool is still served while the new one is built
+    assert home_feed.next_feed(in_memory_repo) in ([{'id': 1}], [{'id': 2}])
+    home_feed.wait_for_refresh()
+    assert len(builds) == 2
+
+
 def test_get_categories(in_memory_repo):
     categories = utilities_services.get_categories(in_memory_repo)
     assert len(categories) == 3
@@ -222,24 +270,51 @@ def test_add_invalid_review(in_memory_repo):
 def test_get_podcasts_filtered_by_category(in_memory_repo):
     search_field = 'category'
     search_query = 'comedy'
-    assert 2 == len(search_services.get_podcasts_filtered(in_memory_repo, search_field, search_query))
-    assert "<Podcast 2: 'Brian Denny Radio' by Brian Denny>" == repr(
-        (search_services.get_podcasts_filtered(in_memory_repo, search_field, search_query))[0])
-    assert "<Podcast 4: 'Tallin Messages' by Tallin Country Church>" == repr(
-        ((search_services.get_podcasts_filtered(in_memory_repo, search_field, search_query))[1]))
+    podcasts, total = search_services.get_podcasts_filtered(in_memory_repo, search_field, search_query)
+    assert 2 == len(podcasts) == total
+    assert "<Podcast 2: 'Brian Denny Radio' by Brian Denny>" == repr(podcasts[0])
+    assert "<Podcast 4: 'Tallin Messages' by Tallin Country Church>" == repr(podcasts[1])
 
 
 def test_get_podcasts_filtered_by_title(in_memory_repo):
     search_field = 'title'
     search_query = 'radio'
-    assert 3 == len(search_services.get_podcasts_filtered(in_memory_repo, search_field, search_query))
+    podcasts, total = search_services.get_podcasts_filtered(in_memory_repo, search_field, search_query)
+    assert 3 == len(podcasts) == total
+    podcasts, total = search_services.get_podcasts_filtered(in_memory_repo, search_field, search_query, 1, 1)
+    assert [podcast.id for podcast in podcasts] == [1]
+    assert total == 3
 
 
 def test_get_podcasts_filtered_by_author(in_memory_repo):
     search_field = 'author'
     search_query = 'BriAn DeNNY'
-    assert 2 == len(search_services.get_podcasts_filtered(in_memory_repo, search_field, search_query))
-    assert "<Podcast 2: 'Brian Denny Radio' by Brian Denny>" == repr(
-        (search_services.get_podcasts_filtered(in_memory_repo, search_field, search_query))[0])
-    assert "<Podcast 3: 'Onde Road - Radio Popolare' by Brian Denny>" == repr(
-        ((search_services.get_podcasts_filtered(in_memory_repo, search_field, search_query))[1]))
+    podcasts, total = search_services.get_podcasts_filtered(in_memory_repo, search_field, search_query)
+    assert 2 == len(podcasts) == total
+    assert "<Podcast 2: 'Brian Denny Radio' by Brian Denny>" == repr(podcasts[0])
+    assert "<Podcast 3: 'Onde Road - Radio Popolare' by Brian Denny>" == repr(podcasts[1])
+
+
+def test_get_search_results_by_keyword(in_memory_repo):
+    results = search_services.get_search_results(in_memory_repo, 'keyword', 'radio', 1, page_size=2)
+    assert [podcast.id for podcast in results['results']] == [1, 3]
+    assert results['result_type'] == 'podcasts'
+    assert results['total_pages'] == 2
+    assert results['has_next'] is True
+    assert results['next_page'] == 2
+    results = search_services.get_search_results(in_memory_repo, 'keyword', 'radio', 2, page_size=2)
+    assert [podcast.id for podcast in results['results']] == [2]
+    assert results['has_next'] is False
+
+
+def test_get_search_results_by_episode(in_memory_repo):
+    results = search_services.get_search_results(in_memory_repo, 'episode', 'comixology', 1)
+    assert [episode.id for episode in results['results']] == [2]
+    assert results['result_type'] == 'episodes'
+    assert results['total_pages'] == 1
+
+
+def test_get_search_results_by_field(in_memory_repo):
+    results = search_services.get_search_results(in_memory_repo, 'title', 'radio', 1, page_size=2)
+    assert len(results['results']) == 2
+    assert results['total_pages'] == 2
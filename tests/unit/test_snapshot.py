@@ -0,0 +1,63 @@
+from pathlib import Path
+
+from podcast.adapters import snapshot
+from podcast.adapters.memory_repository import MemoryRepository
+
+
+def test_snapshot_round_trip(in_memory_repo, data_path: Path, tmp_path: Path):
+    snapshot_path = tmp_path / "catalogue.snapshot"
+    fingerprint = snapshot.source_fingerprint(data_path)
+    in_memory_repo.write_snapshot(snapshot_path, fingerprint)
+
+    repo = MemoryRepository()
+    assert repo.load_snapshot(snapshot_path, fingerprint) is True
+    assert repo.get_number_of_podcasts() == in_memory_repo.get_number_of_podcasts()
+    assert repo.get_number_of_episodes() == in_memory_repo.get_number_of_episodes()
+    assert [category.name for category in repo.get_categories()] == \
+           [category.name for category in in_memory_repo.get_categories()]
+
+    podcast = repo.get_podcast(3)
+    original = in_memory_repo.get_podcast(3)
+    assert (podcast.title, podcast.image, podcast.description, podcast.language, podcast.website,
+            podcast.itunes_id) == (original.title, original.image, original.description, original.language,
+                                   original.website, original.itunes_id)
+    assert podcast.author.name == "Brian Denny"
+    assert len(podcast.author.podcast_list) == 2
+    assert podcast.categories == original.categories
+    assert podcast.episodes == original.episodes
+    assert podcast.episodes[0].podcast is podcast
+
+    episode = repo.get_episode(1)
+    assert episode.podcast is None
+    assert (episode.title, episode.length, episode.date) == ("Choir", 266, "2017-12-01 10:03:18")
+
+
+def test_snapshot_is_rejected_when_the_csv_files_change(in_memory_repo, data_path: Path, tmp_path: Path):
+    snapshot_path = tmp_path / "catalogue.snapshot"
+    in_memory_repo.write_snapshot(snapshot_path, snapshot.source_fingerprint(data_path))
+
+    changed_data_path = tmp_path / "data"
+    changed_data_path.mkdir()
+    (changed_data_path / "podcasts.csv").write_bytes((data_path / "podcasts.csv").read_bytes())
+    (changed_data_path / "episodes.csv").write_bytes((data_path / "episodes.csv").read_bytes() + b"\n")
+
+    repo = MemoryRepository()
+    assert repo.load_snapshot(snapshot_path, snapshot.source_fingerprint(changed_data_path)) is False
+    assert repo.get_number_of_podcasts() == 0
+
+
+def test_snapshot_is_rejected_when_missing_or_corrupt(data_path: Path, tmp_path: Path):
+    fingerprint = snapshot.source_fingerprint(data_path)
+    assert snapshot.read_snapshot(tmp_path / "missing.snapshot", fingerprint) is None
+
+    corrupt_path = tmp_path / "corrupt.snapshot"
+    corrupt_path.write_bytes(b"PODSNAP")
+    assert snapshot.read_snapshot(corrupt_path, fingerprint) is None
+
+
+def test_snapshot_is_rejected_from_another_version(in_memory_repo, data_path: Path, tmp_path: Path, monkeypatch):
+    snapshot_path = tmp_path / "catalogue.snapshot"
+    fingerprint = snapshot.source_fingerprint(data_path)
+    in_memory_repo.write_snapshot(snapshot_path, fingerprint)
+    monkeypatch.setattr(snapshot, "SNAPSHOT_VERSION", snapshot.SNAPSHOT_VERSION + 1)
+    assert snapshot.read_snapshot(snapshot_path, fingerprint) is None
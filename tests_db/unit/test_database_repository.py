@@ -1,7 +1,12 @@
+import pytest
+
+from sqlalchemy import event, text
 from sqlalchemy.orm.exc import NoResultFound
 
 from podcast.adapters.database_repository import SqlAlchemyRepository
-from podcast.domainmodel.model import Podcast, User, Episode, Author
+from podcast.adapters.orm import podcast_table
+from podcast.domainmodel.model import Podcast, User, Episode, Author, Category
+from podcast.home.services import build_feed_pool
 
 
 def test_database_repository_can_add_and_get_podcast(session_factory):
@@ -89,6 +94,16 @@ def test_database_repository_get_episode(session_factory):
     assert episode.date == "2017-12-01 10:03:18"
 
 
+def test_database_repository_get_episode_with_sparse_id(session_factory):
+    repo = SqlAlchemyRepository(session_factory)
+    podcast = Podcast(5, Author(1, "Shakespear"), "Untitled", "", "", "", 52, "")
+    repo.add_podcast(podcast)
+    episode = Episode(9000, podcast, "Untitled", "", "", 20, "2007-08-09::")
+    repo.add_episode(episode)
+    assert repo.get_episode(9000) == episode
+    assert repo.get_episode(5) is None
+
+
 def test_database_repository_add_episode(session_factory):
     repo = SqlAlchemyRepository(session_factory)
     podcast1 = Podcast(5, Author(1, "Shakespear"), "Untitled", "", "", "", 52, "")
@@ -103,9 +118,9 @@ def test_database_repository_retrieve_category_podcasts(session_factory):
     category = repo.get_categories()[1]
     assert category.name == "Professional"
 
-    # Check that the query returned 2 podcasts in Category Professional
+    # Check that the query returned 2 podcasts in Category Professional, in title order
     podcast_ids_by_category = repo.get_podcasts_ids_for_category("Professional")
-    assert podcast_ids_by_category == [1, 2]
+    assert podcast_ids_by_category == [2, 1]
 
 
 def test_database_repository_can_add_to_playlist(session_factory):
@@ -127,6 +142,31 @@ def test_repository_can_make_and_add_to_playlist(session_factory):
     assert user1.playlist.episodes == [episode1]
 
 
+def test_repository_add_episodes_to_playlist_and_clear_playlist(session_factory):
+    repo = SqlAlchemyRepository(session_factory)
+    repo.add_user('test5', 'abcdE123')
+    assert repo.add_episodes_to_playlist('test5', [4, 3, 999, 4]) == 2
+    assert repo.add_episodes_to_playlist('test5', [3, 2]) == 1
+    playlist = repo.get_users_playlist('test5')
+    assert [episode.id for episode in playlist.episodes] == [4, 3, 2]
+
+    repo.clear_playlist('test5')
+    assert len(repo.get_users_playlist('test5').episodes) == 0
+
+    with pytest.raises(ValueError):
+        repo.clear_playlist('nobody')
+
+
+def test_repository_add_podcast_to_playlist(session_factory):
+    repo = SqlAlchemyRepository(session_factory)
+    repo.add_user('test6', 'abcdE123')
+    assert repo.add_podcast_to_playlist('test6', 3) == 2
+    assert repo.add_podcast_to_playlist('test6', 3) == 0
+    assert [episode.id for episode in repo.get_users_playlist('test6').episodes] == [4, 3]
+    with pytest.raises(ValueError):
+        repo.add_podcast_to_playlist('test6', 999)
+
+
 def test_repository_can_get_users_playlist(session_factory):
     repo = SqlAlchemyRepository(session_factory)
     repo.add_user('test3', 'abcdE123')
@@ -143,6 +183,33 @@ def test_repository_can_make_and_get_users_playlist(session_factory):
     assert user1.playlist == playlist1
 
 
+def test_database_repository_get_podcast_ids(session_factory):
+    repo = SqlAlchemyRepository(session_factory)
+    assert sorted(repo.get_podcast_ids()) == [1, 2, 3, 4]
+    assert [podcast.id for podcast in repo.get_podcasts_by_id([4, 2, 99])] == [2, 4]
+
+
+def test_database_repository_category_version(session_factory):
+    repo = SqlAlchemyRepository(session_factory)
+    version = repo.get_version('categories')
+    repo.add_category(Category(99, "Zoology"))
+    assert repo.get_version('categories') == version + 1
+
+
+def test_database_repository_versions_are_shared_through_the_database(session_factory):
+    # Two repositories on one database, as two worker processes would have
+    repo, other_repo = SqlAlchemyRepository(session_factory), SqlAlchemyRepository(session_factory)
+    version = other_repo.get_version('catalogue')
+    repo.add_user('reviewer', 'Password1')
+    repo.add_review(repo.get_podcast(1), repo.get_user('reviewer'), 5, 'Great show')
+    assert repo.get_version('catalogue') == version + 1
+
+    # The other repository reads the new version once its next request resets its session
+    assert other_repo.get_version('catalogue') == version
+    other_repo.reset_session()
+    assert other_repo.get_version('catalogue') == version + 1
+
+
 def test_database_repository_add_review(session_factory):
     repo = SqlAlchemyRepository(session_factory)
     repo.add_user('Bobby', 'Bobby1234')
@@ -155,6 +222,33 @@ def test_database_repository_add_review(session_factory):
             == repr(podcast.reviews[0]))
 
 
+def test_database_repository_reviews_update_rating_counts(session_factory):
+    repo = SqlAlchemyRepository(session_factory)
+    repo.add_user('Bobby', 'Bobby1234')
+    user = repo.get_user('Bobby')
+    repo.add_user('Jenny', 'Jenny1234')
+    podcast = repo.get_podcast(1)
+    repo.add_review(podcast, user, 5, "Interesting")
+    repo.add_review(podcast, repo.get_user('Jenny'), 2, "Dull")
+    with session_factory() as session:
+        counts = session.execute(select_rating_counts(1)).one()
+    assert tuple(counts) == (0, 1, 0, 0, 1)
+    assert repo.get_podcast(1).rating_summary.review_count == 2
+    assert repo.get_podcast(1).rating_summary.average_rating == 3.5
+
+    repo.delete_review(repo.get_podcast(1).reviews[0].id)
+    assert repo.get_podcast(1).rating_summary.review_count == 1
+
+    with pytest.raises(ValueError):
+        repo.add_review(podcast, user, 0, "Off the scale")
+    assert repo.get_podcast(1).rating_summary.review_count == 1
+
+
+def select_rating_counts(podcast_id):
+    columns = [podcast_table.c[f'ratings_{rating}'] for rating in range(1, 6)]
+    return podcast_table.select().with_only_columns(*columns).where(podcast_table.c.podcast_id == podcast_id)
+
+
 def test_database_repository_get_users_reviews(session_factory):
     repo = SqlAlchemyRepository(session_factory)
     repo.add_user('Bobby', 'Bobby1234')
@@ -193,7 +287,7 @@ def test_database_repository_delete_review(session_factory):
 
 def test_repository_get_podcasts_by_category(session_factory):
     repo = SqlAlchemyRepository(session_factory)
-    podcasts = repo.get_podcasts_by_category('Comedy')
+    podcasts, total = repo.get_podcasts_by_category('Comedy')
     assert 2 == len(podcasts)
     assert "<Podcast 2: 'Brian Denny Radio' by Brian Denny>" == repr(podcasts[0])
     assert "<Podcast 4: 'Tallin Messages' by Tallin Country Church>" == repr(podcasts[1])
@@ -201,18 +295,225 @@ def test_repository_get_podcasts_by_category(session_factory):
 
 def test_repository_get_podcasts_by_author(session_factory):
     repo = SqlAlchemyRepository(session_factory)
-    podcasts = repo.get_podcasts_by_author('Brian')
+    podcasts, total = repo.get_podcasts_by_author('Brian')
     assert "<Podcast 2: 'Brian Denny Radio' by Brian Denny>" == repr(podcasts[0])
     assert "<Podcast 3: 'Onde Road - Radio Popolare' by Brian Denny>" == repr(podcasts[1])
 
 
 def test_repository_get_podcasts_by_title(session_factory):
     repo = SqlAlchemyRepository(session_factory)
-    podcasts = repo.get_podcasts_by_title('Messages')
+    podcasts, total = repo.get_podcasts_by_title('Messages')
     assert "<Podcast 4: 'Tallin Messages' by Tallin Country Church>" == repr(podcasts[0])
 
 
 def test_repository_get_episodes_by_language(session_factory):
     repo = SqlAlchemyRepository(session_factory)
-    podcasts = repo.get_podcasts_by_language("English")
-    assert "<Podcast 1: 'D-Hour Radio Network' by D Hour Radio Network>" == repr(podcasts[0])
+    podcasts, total = repo.get_podcasts_by_language("English")
+    assert "<Podcast 2: 'Brian Denny Radio' by Brian Denny>" == repr(podcasts[0])
+    assert total == 3
+
+
+def test_database_repository_bulk_load(session_factory):
+    repo = SqlAlchemyRepository(session_factory)
+    author = Author(10, "Bulk Author")
+    category = Category(10, "Bulk Category")
+    podcast = Podcast(10, author, "Bulk Podcast", "", "", "", 52, "English")
+    podcast.add_category(category)
+    podcast.add_category(repo.get_categories()[0])
+    episodes = (Episode(episode_id, podcast, f"Bulk Episode {episode_id}", "", "", 20, "2018-01-01 10:00:00")
+                for episode_id in range(10, 15))
+    repo.bulk_load([author], [podcast], [category], episodes, batch_size=2)
+
+    assert repo.get_number_of_podcasts() == 5
+    assert repo.get_number_of_episodes() == 9
+    loaded_podcast = repo.get_podcast(10)
+    assert loaded_podcast.author.name == "Bulk Author"
+    assert sorted(category.name for category in loaded_podcast.categories) == ["Bulk Category", "Comedy"]
+    assert len(loaded_podcast.episodes) == 5
+    assert all(episode.podcast == loaded_podcast for episode in loaded_podcast.episodes)
+
+
+def test_repository_get_podcasts_by_category_matching_several_categories(session_factory):
+    repo = SqlAlchemyRepository(session_factory)
+    podcasts, total = repo.get_podcasts_by_category('o')
+    assert [podcast.id for podcast in podcasts] == [2, 1, 3, 4]
+
+
+def test_database_repository_pages_are_in_title_order(session_factory):
+    repo = SqlAlchemyRepository(session_factory)
+    assert [podcast.id for podcast in repo.get_podcasts_by_page(1, 3)] == [2, 1, 3]
+    assert [podcast.id for podcast in repo.get_podcasts_by_page(2, 3)] == [4]
+
+
+def test_database_repository_get_podcasts_after(session_factory):
+    repo = SqlAlchemyRepository(session_factory)
+    assert [podcast.id for podcast in repo.get_podcasts_after(None, 2)] == [2, 1]
+    assert [podcast.id for podcast in repo.get_podcasts_after(1, 2)] == [3, 4]
+    assert repo.get_podcasts_after(4, 2) == []
+    assert repo.get_podcasts_after(404, 2) == []
+    repo.add_podcast(Podcast(5, Author(5, "Shakespear"), "brian denny radio", "", "", "", 52, ""))
+    assert [podcast.id for podcast in repo.get_podcasts_after(2, 1)] == [5]
+
+
+def test_database_repository_get_page_runs_one_query(session_factory):
+    repo = SqlAlchemyRepository(session_factory)
+    statements = []
+    engine = session_factory.kw['bind']
+    event.listen(engine, 'before_cursor_execute', lambda *args: statements.append(args[2]))
+
+    page = repo.get_page(1, 3)
+    assert [podcast.id for podcast in page.podcasts] == [2, 1, 3]
+    assert (page.total, page.has_next, page.next_page, page.last_page) == (4, True, 2, 2)
+    assert len(statements) == 1
+
+    # The total is cached until podcasts are added
+    statements.clear()
+    assert repo.get_page(2, 3).total == 4
+    assert repo.get_number_of_podcasts() == 4
+    assert not any('count' in statement.lower() for statement in statements)
+    repo.add_podcast(Podcast(5, Author(5, "Shakespear"), "Untitled", "", "", "", 52, ""))
+    page = repo.get_page(2, 3)
+    assert [podcast.id for podcast in page.podcasts] == [4, 5]
+    assert page.total == 5
+
+
+def test_database_repository_feed_pool_runs_two_queries(session_factory):
+    repo = SqlAlchemyRepository(session_factory)
+    statements = []
+    event.listen(session_factory.kw['bind'], 'before_cursor_execute', lambda *args: statements.append(args[2]))
+
+    feeds = build_feed_pool(repo, 8, 3)
+    assert len(feeds) == 8
+    assert all(feed['title'] and feed['author_name'] for sample in feeds for feed in sample)
+    # The podcast ids, then the sampled podcasts with their authors
+    assert len(statements) == 2
+
+
+def test_database_repository_get_page_past_the_end(session_factory):
+    repo = SqlAlchemyRepository(session_factory)
+    page = repo.get_page(5, 3)
+    assert page.podcasts == []
+    assert (page.total, page.has_next, page.previous_page) == (4, False, 4)
+
+
+def test_database_repository_search_podcasts(session_factory):
+    repo = SqlAlchemyRepository(session_factory)
+    podcasts, total = repo.search_podcasts("radio")
+    assert [podcast.id for podcast in podcasts] == [1, 3, 2]
+    assert total == 3
+    podcasts, total = repo.search_podcasts("radio", 1, 1)
+    assert [podcast.id for podcast in podcasts] == [3]
+    assert total == 3
+    assert repo.search_podcasts("radio", 5, 1) == ([], 3)
+    assert repo.search_podcasts("network radio")[1] == 1
+    assert repo.search_podcasts('"radio OR (') == repo.search_podcasts("radio or")
+    assert repo.search_podcasts("") == ([], 0)
+
+
+def test_database_repository_search_episodes(session_factory):
+    repo = SqlAlchemyRepository(session_factory)
+    episodes, total = repo.search_episodes("star trek")
+    assert [episode.id for episode in episodes] == [2]
+    assert total == 1
+    episodes, total = repo.search_episodes("the", 0, 2)
+    assert [episode.id for episode in episodes] == [3, 4]
+    assert total == 3
+
+
+def test_database_repository_search_index_follows_table_changes(session_factory):
+    repo = SqlAlchemyRepository(session_factory)
+    podcast = Podcast(5, Author(5, "Shakespear"), "Phoenix Rising", "", "", "", 52, "")
+    repo.add_podcast(podcast)
+    assert [podcast.id for podcast in repo.search_podcasts("phoenix")[0]] == [5]
+    session = session_factory()
+    session.execute(podcast_table.update().where(podcast_table.c.podcast_id == 5).values(title="Ashes"))
+    session.commit()
+    assert repo.search_podcasts("phoenix") == ([], 0)
+    assert [podcast.id for podcast in repo.search_podcasts("ashes")[0]] == [5]
+    session.execute(podcast_table.delete().where(podcast_table.c.podcast_id == 5))
+    session.commit()
+    assert repo.search_podcasts("ashes") == ([], 0)
+
+
+def test_database_repository_searches_return_one_page_and_the_total(session_factory):
+    repo = SqlAlchemyRepository(session_factory)
+    podcasts, total = repo.get_podcasts_by_title('radio', 1, 1)
+    assert [podcast.id for podcast in podcasts] == [1]
+    assert total == 3
+    podcasts, total = repo.get_podcasts_by_author('brian', 0, 1)
+    assert [podcast.id for podcast in podcasts] == [2]
+    assert total == 2
+    podcasts, total = repo.get_podcasts_by_category('o', 2, 10)
+    assert [podcast.id for podcast in podcasts] == [3, 4]
+    assert total == 4
+    assert repo.get_podcasts_by_language('english', 10, 10) == ([], 3)
+    assert repo.get_podcasts_by_title('no such title') == ([], 0)
+
+
+def test_database_repository_get_podcast_detail_runs_a_fixed_number_of_queries(session_factory):
+    repo = SqlAlchemyRepository(session_factory)
+    repo.add_user('reviewer', 'Password1')
+    repo.add_user('other', 'Password1')
+    podcast = repo.get_podcast(3)
+    repo.add_review(podcast, repo.get_user('reviewer'), 4, 'Great show')
+    repo.add_review(podcast, repo.get_user('other'), 2, 'Not for me')
+    repo.add_to_playlist('reviewer', repo.get_episode(4))
+    repo.reset_session()
+
+    statements = []
+    event.listen(session_factory.kw['bind'], 'before_cursor_execute', lambda *args: statements.append(args[2]))
+    detail = repo.get_podcast_detail(3, 1, 'reviewer')
+    # Podcast with author and episode count, categories, episode page, playlist ids
+    assert len(statements) == 4
+
+    assert detail.podcast.author.name == 'Brian Denny'
+    assert [category.name for category in detail.podcast.categories] == ['Society & Culture']
+    assert [episode.id for episode in detail.episodes] == [4, 3]
+    assert detail.episodes_in_playlist == {4}
+    assert len(statements) == 4
+
+    # The number of reviews, and a page of them with their reviewers
+    reviews, total = repo.get_podcast_reviews(3, 0, 10)
+    assert [review.reviewer.username for review in reviews] == ['reviewer', 'other'] and total == 2
+    assert len(statements) == 6
+
+
+def test_database_repository_get_podcast_reviews_pages_by_rating(session_factory):
+    repo = SqlAlchemyRepository(session_factory)
+    podcast = repo.get_podcast(3)
+    for number, rating in enumerate([3, 5, 1, 5], start=1):
+        repo.add_user(f'reviewer{number}', 'Password1')
+        repo.add_review(podcast, repo.get_user(f'reviewer{number}'), rating, 'A review')
+    with pytest.raises(ValueError):
+        repo.add_review(podcast, repo.get_user('reviewer1'), 4, 'Again')
+    reviews, total = repo.get_podcast_reviews(3, 1, 2)
+    assert [(review.rating, review.reviewer.username) for review in reviews] == [(5, 'reviewer4'), (3, 'reviewer1')]
+    assert total == 4
+    assert repo.get_podcast_reviews(3, 4, 2) == ([], 4)
+    assert repo.get_podcast_reviews(999) == ([], 0)
+
+
+def test_database_repository_get_podcast_detail_pages_episodes(session_factory):
+    repo = SqlAlchemyRepository(session_factory)
+    detail = repo.get_podcast_detail(3, 2, page_size=1)
+    assert [episode.id for episode in detail.episodes] == [3]
+    assert (detail.episode_page, detail.total_pages, detail.total_episodes) == (2, 2, 2)
+    assert (detail.prev_episode_page, detail.next_episode_page) == (1, None)
+    assert repo.get_podcast_detail(3, 10, page_size=1).episode_page == 2
+    detail = repo.get_podcast_detail(1, 1)
+    assert (detail.episodes, detail.episode_page, detail.total_pages) == ([], 1, 0)
+    assert detail.episodes_in_playlist == set()
+    assert repo.get_podcast_detail(404, 1) is None
+
+
+def test_database_repository_stores_publication_dates_as_timestamps(session_factory):
+    repo = SqlAlchemyRepository(session_factory)
+    session = session_factory()
+    rows = session.execute(text("SELECT episode_id, typeof(pub_date), pub_date FROM episodes ORDER BY episode_id"))
+    assert list(rows)[0] == (1, 'integer', 1512122598)
+    assert repo.get_episode(1).date == '2017-12-01 10:03:18'
+    podcast = repo.get_podcast(3)
+    assert [episode.id for episode in podcast.episodes] == [4, 3]
+    plan = session.execute(text("EXPLAIN QUERY PLAN SELECT episode_id FROM episodes WHERE podcast_id = 3 "
+                                "ORDER BY pub_date LIMIT 10")).all()
+    assert any('ix_episodes_podcast_pub_date' in row[-1] for row in plan)
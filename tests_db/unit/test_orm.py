@@ -1,4 +1,6 @@
-from podcast.domainmodel.model import User, Podcast, Episode, Author, Review, Category
+from podcast.adapters.orm import episode_table, full_text_search_ddl, mapper_registry, upgrade_schema
+from podcast.domainmodel.model import User, Podcast, Episode, Author, Review, Category, Playlist
+from sqlalchemy import create_engine, event
 from sqlalchemy.sql import text
 import pytest
 from sqlalchemy.exc import IntegrityError
@@ -204,7 +206,7 @@ def test_multiple_episodes_in_podcast(empty_session):
     empty_session.execute(text('INSERT INTO episodes (episode_id, podcast_id, title, audio_url, description, pub_date) VALUES '
                                '(:episode_id, :podcast_id, :title, :audio_url, :description, :pub_date)'),
                                {'episode_id': 2, 'podcast_id': podcast_key, 'title': "Title 2", 'audio_url': "Audio URL 2", 'description': "Description 2", 'pub_date': "12/12/2024"})
-    episodes = empty_session.query(Episode).filter_by(podcast_id=podcast_key).all()
+    episodes = empty_session.query(Episode).filter_by(podcast_id=podcast_key).order_by(Episode._id).all()
     assert len(episodes) == 2
     assert episodes[0]._title == "Podcast 1"
     assert episodes[1]._title == "Title 2"
@@ -261,3 +263,91 @@ def test_saving_of_author(empty_session):
     fetched_author = empty_session.query(Author).one()
     assert expected_author == fetched_author
     assert author_key == fetched_author.id
+
+
+def test_loaded_episodes_read_their_timestamp_from_the_stored_date(empty_session):
+    podcast = Podcast(1, Author(1, "Author"), "Podcast")
+    empty_session.add(Episode(1, podcast, "Episode", length=60, date="2020-01-01 00:00:00"))
+    empty_session.add(Episode(2, podcast, "Undated", length=60, date="Unspecified"))
+    empty_session.commit()
+    empty_session.expunge_all()
+    episodes = empty_session.query(Episode).order_by(Episode._id).all()
+    assert [(episode.date, episode.timestamp) for episode in episodes] == [("2020-01-01 00:00:00", 1577836800),
+                                                                          ("Unspecified", None)]
+
+
+def test_upgrade_schema_adds_missing_indexes():
+    engine = create_engine('sqlite://')
+    mapper_registry.metadata.create_all(engine)
+    with engine.begin() as connection:
+        for index_name in ('ix_podcasts_title_key', 'ix_episodes_podcast_pub_date', 'ix_reviews_podcast_rating'):
+            connection.execute(text(f"DROP INDEX {index_name}"))
+    upgrade_schema(engine)
+    with engine.connect() as connection:
+        index_names = set(connection.scalars(text("SELECT name FROM sqlite_master WHERE type = 'index'")))
+    assert {'ix_podcasts_title_key', 'ix_episodes_podcast_pub_date', 'ix_reviews_podcast_rating'} <= index_names
+
+
+def test_upgrade_schema_fills_full_text_indexes_it_creates():
+    engine = create_engine('sqlite://')
+    mapper_registry.metadata.create_all(engine)
+    with engine.begin() as connection:
+        # As created before the full text indexes existed
+        connection.execute(text("DROP TABLE podcasts_fts"))
+        for trigger in ('insert', 'delete', 'update'):
+            connection.execute(text(f"DROP TRIGGER podcasts_fts_{trigger}"))
+        connection.execute(text("INSERT INTO podcasts (podcast_id, title) VALUES (1, 'Radio Days')"))
+    statements = []
+    event.listen(engine, 'before_cursor_execute', lambda *args: statements.append(args[2]))
+    upgrade_schema(engine)
+    with engine.connect() as connection:
+        assert list(connection.scalars(text("SELECT rowid FROM podcasts_fts WHERE podcasts_fts MATCH 'radio'"))) == [1]
+    # Only the index that was just created is rebuilt, and only once
+    assert [statement for statement in statements if 'rebuild' in statement] == \
+           ["INSERT INTO podcasts_fts(podcasts_fts) VALUES ('rebuild')"]
+
+    statements.clear()
+    mapper_registry.metadata.create_all(engine)
+    upgrade_schema(engine)
+    assert not any('rebuild' in statement for statement in statements)
+
+
+def test_upgrade_schema_converts_episode_dates_stored_as_text():
+    engine = create_engine('sqlite://')
+    mapper_registry.metadata.create_all(engine)
+    with engine.begin() as connection:
+        connection.execute(text("DROP TABLE episodes"))
+        connection.execute(text("CREATE TABLE episodes (episode_id INTEGER NOT NULL PRIMARY KEY, podcast_id INTEGER, "
+                                "title TEXT, audio_url TEXT, description VARCHAR(255), pub_date TEXT)"))
+        # The full text index is kept up to date by triggers on the old table
+        for statement in full_text_search_ddl('episodes_fts', episode_table, 'episode_id'):
+            connection.execute(text(statement))
+        connection.execute(text("INSERT INTO podcasts (podcast_id, title) VALUES (1, 'Podcast')"))
+        connection.execute(text("INSERT INTO episodes VALUES (1, 1, 'First', '', 'Opening', '2017-12-01 10:03:18'), "
+                                "(2, 1, 'Second', '', 'Later', 'Unspecified')"))
+    upgrade_schema(engine)
+
+    with engine.begin() as connection:
+        rows = list(connection.execute(text("SELECT episode_id, pub_date FROM episodes ORDER BY episode_id")))
+        assert rows == [(1, 1512122598), (2, 'Unspecified')]
+        # The rebuilt table keeps its index and full text triggers
+        connection.execute(text("UPDATE episodes SET title = 'Renamed' WHERE episode_id = 2"))
+        matches = connection.scalars(text("SELECT rowid FROM episodes_fts WHERE episodes_fts MATCH 'renamed'"))
+        assert list(matches) == [2]
+        index_names = set(connection.scalars(text("SELECT name FROM sqlite_master WHERE type = 'index'")))
+    assert 'ix_episodes_podcast_pub_date' in index_names
+
+
+def test_clearing_a_playlist_is_saved(empty_session):
+    user = User(1, "John", "Passw0rd")
+    playlist = Playlist(1, user, "My Playlist")
+    podcast = Podcast(1, Author(1, "Author"), "Podcast")
+    for episode_id in (1, 2):
+        playlist.add_episode(Episode(episode_id, podcast, f"Episode {episode_id}", length=60))
+    empty_session.add_all([user, playlist])
+    empty_session.commit()
+
+    playlist.clear()
+    empty_session.commit()
+    assert list(empty_session.execute(text('SELECT episode_id FROM playlist_episodes'))) == []
+    assert len(empty_session.get(Playlist, 1).episodes) == 0
@@ -1,12 +1,15 @@
-from sqlalchemy import inspect, select
+from sqlalchemy import inspect, select, text
 from podcast.adapters.orm import mapper_registry
 
 
 def test_database_populate_inspect_table_names(database_engine):
     # Get table information
     inspector = inspect(database_engine)
-    assert inspector.get_table_names() == ['authors', 'categories', 'episodes', 'playlist_episodes', 'playlists',
-                                           'podcast_categories', 'podcasts', 'reviews', 'users']
+    assert inspector.get_table_names() == ['authors', 'categories', 'data_versions', 'episodes', 'episodes_fts',
+                                           'episodes_fts_config', 'episodes_fts_data', 'episodes_fts_docsize', 'episodes_fts_idx',
+                                           'playlist_episodes', 'playlists', 'podcast_categories', 'podcasts',
+                                           'podcasts_fts', 'podcasts_fts_config', 'podcasts_fts_data',
+                                           'podcasts_fts_docsize', 'podcasts_fts_idx', 'reviews', 'users']
 
 
 def test_database_populate_select_all_authors(database_engine):
@@ -53,7 +56,7 @@ def test_database_populate_select_all_categories(database_engine):
 def test_database_populate_select_all_episodes(database_engine):
     # Get table information
     inspector = inspect(database_engine)
-    name_of_episodes_table = inspector.get_table_names()[2]
+    name_of_episodes_table = inspector.get_table_names()[3]
 
     with database_engine.connect() as connection:
         # query for records in table episodes
@@ -80,7 +83,7 @@ def test_database_populate_select_all_episodes(database_engine):
 def test_database_populate_select_all_playlist_episodes(database_engine):
     # Get table information
     inspector = inspect(database_engine)
-    name_of_playlist_episodes_table = inspector.get_table_names()[3]
+    name_of_playlist_episodes_table = inspector.get_table_names()[9]
 
     with database_engine.connect() as connection:
         # query for records in table playlist_episodes
@@ -97,7 +100,7 @@ def test_database_populate_select_all_playlist_episodes(database_engine):
 def test_database_populate_select_all_playlists(database_engine):
     # Get table information
     inspector = inspect(database_engine)
-    name_of_playlist_table = inspector.get_table_names()[4]
+    name_of_playlist_table = inspector.get_table_names()[10]
 
     with database_engine.connect() as connection:
         # query for records in table playlists
@@ -114,7 +117,7 @@ def test_database_populate_select_all_playlists(database_engine):
 def test_database_populate_select_all_podcast_categories(database_engine):
     # Get table information
     inspector = inspect(database_engine)
-    name_of_podcasts_categories_table = inspector.get_table_names()[5]
+    name_of_podcasts_categories_table = inspector.get_table_names()[11]
 
     with database_engine.connect() as connection:
         # query for records in table podcast_categories
@@ -135,7 +138,7 @@ def test_database_populate_select_all_podcast_categories(database_engine):
 def test_database_populate_select_all_podcasts(database_engine):
     # Get table information
     inspector = inspect(database_engine)
-    name_of_podcasts_table = inspector.get_table_names()[6]
+    name_of_podcasts_table = inspector.get_table_names()[12]
 
     with database_engine.connect() as connection:
         # query for records in table podcasts
@@ -169,7 +172,7 @@ def test_database_populate_select_all_podcasts(database_engine):
 def test_database_populate_select_all_reviews(database_engine):
     # Get table information
     inspector = inspect(database_engine)
-    name_of_reviews_table = inspector.get_table_names()[7]
+    name_of_reviews_table = inspector.get_table_names()[18]
 
     with database_engine.connect() as connection:
         # query for records in table reviews
@@ -186,7 +189,7 @@ def test_database_populate_select_all_reviews(database_engine):
 def test_database_populate_select_all_users(database_engine):
     # Get table information
     inspector = inspect(database_engine)
-    name_of_users_table = inspector.get_table_names()[8]
+    name_of_users_table = inspector.get_table_names()[19]
 
     with database_engine.connect() as connection:
         # query for records in table users
@@ -198,3 +201,12 @@ def test_database_populate_select_all_users(database_engine):
         all_users.append((row[0], row[1]))
 
     assert len(all_users) == 0
+
+
+def test_database_populate_fills_full_text_indexes(database_engine):
+    with database_engine.connect() as connection:
+        podcast_ids = connection.execute(text("SELECT rowid FROM podcasts_fts WHERE podcasts_fts MATCH 'radio' "
+                                              "ORDER BY rowid")).scalars().all()
+        episode_ids = connection.execute(text("SELECT rowid FROM episodes_fts WHERE episodes_fts MATCH 'trek'"))
+        assert podcast_ids == [1, 2, 3]
+        assert episode_ids.scalars().all() == [2]